@@ -0,0 +1,197 @@
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class BatchQueueFull(RuntimeError):
+    """
+    Raised when a request arrives while `max_queue` requests are waiting
+    """
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-window predictions into batches.
+
+    Callers `await predict(window)` with one (timesteps, features) window.
+    A worker task takes the first waiting request, keeps collecting for up
+    to `max_wait_ms` or until `max_batch_size` requests, stacks the windows
+    and runs one forward pass off the event loop; requests that arrive
+    meanwhile form the next batch. Each caller's future gets its own row of
+    the output, so a burst of N requests costs about N / max_batch_size
+    forward passes. Windows of different shapes go in separate passes.
+
+    A batcher serves one event loop at a time; synchronous callers use
+    `predict_blocking`, which runs it on a private background loop. Stop it
+    with `await aclose()` on its loop (or `close()` from a thread) so the
+    worker task and the background loop do not outlive their owner.
+    """
+
+    def __init__(self, predict_fn: Callable[[np.ndarray], np.ndarray], max_batch_size: int = None,
+                 max_wait_ms: float = None, max_queue: int = None, timeout: float = None):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size or int(os.getenv('AI_BATCH_MAX_SIZE', 32))
+        self.max_wait_ms = max_wait_ms if max_wait_ms is not None else float(os.getenv('AI_BATCH_MAX_WAIT_MS', 5))
+        self.max_queue = max_queue or int(os.getenv('AI_BATCH_QUEUE_DEPTH', 1024))
+        # Default wait of `predict_blocking`, so a stuck model cannot hang its caller
+        self.timeout = timeout if timeout is not None else float(os.getenv('AI_BATCH_TIMEOUT_S', 30))
+        self._loop = None
+        self._queue = None
+        self._worker = None
+        self._lock = threading.Lock()
+        self._background = None
+        self._background_thread = None
+        self.requests = 0
+        self.rejected = 0
+        self.batches = 0
+        self.batched = 0
+        self.largest_batch = 0
+        self.wait_seconds = 0.0
+
+    async def predict(self, window: np.ndarray) -> float:
+        """
+        Model output for one window, computed in a batch with concurrent calls
+        """
+        queue = self._attach(asyncio.get_running_loop())
+        future = self._loop.create_future()
+        try:
+            queue.put_nowait((np.asarray(window, dtype=np.float32), future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise BatchQueueFull(f"Prediction queue is full ({self.max_queue} waiting)") from None
+        self.requests += 1
+        return await future
+
+    def predict_blocking(self, window: np.ndarray, timeout: Optional[float] = None) -> float:
+        """
+        `predict` for threads without an event loop (e.g. Flask handlers);
+        waits at most `timeout` seconds (default `self.timeout`), then drops
+        the request and raises TimeoutError
+        """
+        with self._lock:
+            if self._background is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name='predict-batcher', daemon=True)
+                thread.start()
+                self._background, self._background_thread = loop, thread
+            future = asyncio.run_coroutine_threadsafe(self.predict(window), self._background)
+        try:
+            return future.result(self.timeout if timeout is None else timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    async def aclose(self):
+        """
+        Stop the worker task on the running loop, cancelling the requests it
+        has not answered, then the background loop of `predict_blocking`
+        """
+        await self._stop_worker()
+        if self._background is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def close(self, timeout: float = 5.0):
+        """
+        Stop the background loop of `predict_blocking` and its worker. A
+        worker on another event loop is stopped with `aclose` on that loop.
+        """
+        with self._lock:
+            loop, thread = self._background, self._background_thread
+            self._background = self._background_thread = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._stop_worker(), loop).result(timeout)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+            if not thread.is_alive():
+                loop.close()
+
+    async def _stop_worker(self):
+        # Only the loop the worker runs on can cancel and await it
+        worker, queue = self._worker, self._queue
+        if worker is None or self._loop is not asyncio.get_running_loop():
+            return
+        self._worker = None
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+        while not queue.empty():
+            _, future, _ = queue.get_nowait()
+            future.cancel()
+
+    def _attach(self, loop: asyncio.AbstractEventLoop) -> asyncio.Queue:
+        # The queue and worker belong to one loop; a new loop starts over
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._worker = loop.create_task(self._run(self._queue))
+        return self._queue
+
+    async def _run(self, queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch = [await queue.get()]
+                deadline = loop.time() + self.max_wait_ms / 1000
+                while len(batch) < self.max_batch_size:
+                    if not queue.empty():
+                        batch.append(queue.get_nowait())
+                        continue
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                await self._dispatch(loop, batch)
+        except asyncio.CancelledError:
+            # Stopped mid-batch: its callers are cancelled rather than left waiting
+            for _, future, _ in batch:
+                future.cancel()
+            raise
+
+    async def _dispatch(self, loop: asyncio.AbstractEventLoop, batch: List[Tuple]):
+        self.batches += 1
+        self.batched += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+        groups: Dict[tuple, List[Tuple]] = {}
+        for item in batch:
+            groups.setdefault(item[0].shape, []).append(item)
+        for items in groups.values():
+            windows = np.stack([window for window, _, _ in items])
+            try:
+                # Off the loop, so new requests keep queueing for the next batch
+                outputs = await loop.run_in_executor(None, self.predict_fn, windows)
+                outputs = np.asarray(outputs, dtype=np.float64).reshape(len(items), -1)[:, 0]
+            except Exception as exc:
+                for _, future, _ in items:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            now = time.perf_counter()
+            for (_, future, queued), output in zip(items, outputs.tolist()):
+                self.wait_seconds += now - queued
+                if not future.done():
+                    future.set_result(output)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'requests': self.requests,
+            'rejected': self.rejected,
+            'batches': self.batches,
+            'mean_batch_size': self.batched / self.batches if self.batches else 0.0,
+            'largest_batch': self.largest_batch,
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'mean_latency_ms': 1000 * self.wait_seconds / self.batched if self.batched else 0.0,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait_ms,
+            'max_queue': self.max_queue
+        }
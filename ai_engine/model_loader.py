@@ -1,9 +1,25 @@
+import hashlib
 import os
+import threading
+import time
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from pathlib import Path
 from typing import List, Tuple
 
-from tensorflow.keras.models import load_model
+from utils.cache import TTLCache
+from .batching import MicroBatcher
+from .numpy_lstm import NumpyLSTMModel
+
+# 'auto' uses TensorFlow when it is installed and the NumPy engine otherwise;
+# 'numpy' never imports TensorFlow
+MODEL_BACKENDS = ('auto', 'tensorflow', 'numpy')
+
+# Seconds a prediction waits for a model still loading in the background
+MODEL_WAIT_SECONDS = float(os.getenv('AI_MODEL_WAIT_SECONDS', 60))
+
+# Decimals kept of a normalized feature window in prediction cache keys
+FEATURE_DECIMALS = 6
 
 
 class ModelLoader:
@@ -11,25 +27,136 @@ class ModelLoader:
     Loads and manages the AI model
     """
     
-    def __init__(self, model_path: str = None):
+    def __init__(self, model_path: str = None, backend: str = None, load: bool = True):
         self.model_path = model_path or Path(__file__).resolve().parent.parent / 'models' / 'model.h5'
+        # Inference backend (default: AI_MODEL_BACKEND, else 'auto')
+        self.backend = backend or os.getenv('AI_MODEL_BACKEND', 'auto')
+        if self.backend not in MODEL_BACKENDS:
+            raise ValueError(f"Unknown model backend '{self.backend}', expected one of {MODEL_BACKENDS}")
         self.model = None
-        self._load_model()
+        # Backend that actually loaded the model: 'tensorflow' or 'numpy'
+        self.engine = None
+        # Content hash of the loaded model file, for caches of its outputs
+        self.version = None
+        # (mtime, size) of the model file when it was loaded
+        self._file_stamp = None
+        # Set once the first load (and warmup) finished, model or fallback
+        self.ready = threading.Event()
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self._load_lock = threading.Lock()
+        if load:
+            self._load_model()
+    
+    def load_in_background(self) -> threading.Thread:
+        """
+        Load and warm up the model on a daemon thread, so a server can
+        answer requests that don't need it meanwhile. `ready` is set when done.
+        """
+        thread = threading.Thread(target=self._load_model, name='model-loader', daemon=True)
+        thread.start()
+        return thread
+    
+    def wait_ready(self, timeout: float = MODEL_WAIT_SECONDS) -> bool:
+        """
+        Block until the first load finished (or `timeout` seconds passed)
+        """
+        return self.ready.wait(timeout)
+    
+    @property
+    def status(self) -> str:
+        if not self.ready.is_set():
+            return 'loading'
+        return 'ready' if self.model is not None else 'fallback'
     
     def _load_model(self):
         """
         Load the trained model from file
         """
-        if os.path.exists(self.model_path):
+        with self._load_lock:
+            self._load_locked()
+    
+    def _load_locked(self):
+        start = time.perf_counter()
+        stamp = self._stamp(self.model_path)
+        model, engine, version = None, None, None
+        if stamp is not None:
             try:
-                self.model = load_model(self.model_path)
-                print(f"AI Model loaded successfully from {self.model_path}")
+                model, engine = self._load(self.model_path)
+                version = self._file_version(self.model_path)
+                self._warmup(model)
+                print(f"AI Model loaded successfully from {self.model_path} ({engine})")
             except Exception as e:
                 print(f"Failed to load model: {e}. Using fallback mode.")
-                self.model = None
+                model, engine, version = None, None, None
         else:
             print(f"Model file not found at {self.model_path}. Using fallback mode.")
-            self.model = None
+        self.model, self.engine, self.version, self._file_stamp = model, engine, version, stamp
+        self.load_seconds = time.perf_counter() - start
+        self.ready.set()
+    
+    def _warmup(self, model):
+        # One synthetic prediction, so the first request doesn't pay for
+        # graph tracing and first-call allocations
+        start = time.perf_counter()
+        timesteps = (getattr(model, 'input_shape', None) or (None, 20, 1))[1] or 20
+        model.predict(np.zeros((1, timesteps, 1), dtype=np.float32), verbose=0)
+        self.warmup_seconds = time.perf_counter() - start
+    
+    def reload_if_changed(self) -> bool:
+        """
+        Reload the model if its file was replaced, modified or removed since
+        it was loaded (one stat call otherwise). Returns whether it reloaded.
+        The previous model keeps serving until the new one is ready.
+        """
+        if not self.ready.is_set() or self._stamp(self.model_path) == self._file_stamp:
+            return False
+        # Only one thread reloads, the others keep using the current model
+        if not self._load_lock.acquire(blocking=False):
+            return False
+        try:
+            if self._stamp(self.model_path) == self._file_stamp:
+                return False
+            self._load_locked()
+            return True
+        finally:
+            self._load_lock.release()
+    
+    def stats(self) -> dict:
+        return {
+            'status': self.status,
+            'engine': self.engine,
+            'version': self.version,
+            'load_seconds': self.load_seconds,
+            'warmup_seconds': self.warmup_seconds
+        }
+    
+    @staticmethod
+    def _stamp(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    @staticmethod
+    def _file_version(path) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _load(self, path):
+        if self.backend != 'numpy':
+            try:
+                from tensorflow.keras.models import load_model
+            except ImportError:
+                if self.backend == 'tensorflow':
+                    raise
+            else:
+                return load_model(path), 'tensorflow'
+        return NumpyLSTMModel.load(path), 'numpy'
     
     def get_model(self):
         """
@@ -64,6 +191,23 @@ class FeatureBuilder:
         
         # Reshape for LSTM input (batch_size, timesteps, features)
         return normalized.reshape(1, sequence_length, 1)
+    
+    def build_series_features(self, closes, sequence_length: int = 20) -> np.ndarray:
+        """
+        Features of every full window closes[i - sequence_length + 1 : i + 1],
+        normalized like `build_features`: (len - sequence_length + 1,
+        sequence_length, 1). The windows are a strided view of one float32
+        copy of the closes; only the normalized output is materialized.
+        """
+        closes_array = np.asarray(closes, dtype=np.float32)
+        if len(closes_array) < sequence_length:
+            return np.empty((0, sequence_length, 1), dtype=np.float32)
+        windows = sliding_window_view(closes_array, sequence_length)
+        mean = windows.mean(axis=1, keepdims=True)
+        std = windows.std(axis=1, keepdims=True)
+        std[std == 0] = 1.0
+        normalized = (windows - mean) / std
+        return normalized[:, :, None]
 
 
 class AIPredictor:
@@ -71,15 +215,39 @@ class AIPredictor:
     Makes predictions using the AI model
     """
     
-    def __init__(self, model_loader: ModelLoader):
+    def __init__(self, model_loader: ModelLoader, batcher: MicroBatcher = None, cache_size: int = None):
         self.model_loader = model_loader
+        # Concurrent requests (e.g. Flask threads) share forward passes
+        self.batcher = batcher or MicroBatcher(self._forward)
+        # Requests with the same last window (status polling, retries) reuse
+        # its prediction (AI_PREDICTION_CACHE_SIZE entries, 0 disables)
+        if cache_size is None:
+            cache_size = int(os.getenv('AI_PREDICTION_CACHE_SIZE', 1024))
+        self.cache = TTLCache(maxsize=cache_size, ttl=float('inf')) if cache_size > 0 else None
+        self._cache_version = model_loader.version
+    
+    def _forward(self, windows: np.ndarray) -> np.ndarray:
+        return self.model_loader.get_model().predict(windows, verbose=0)
     
     def predict(self, closes: List[float]) -> Tuple[str, float, float]:
         """
         Make a prediction using the AI model
         Returns: (signal, confidence, raw_prediction)
         """
+        signal, confidence, raw_prediction, _ = self.predict_checked(closes)
+        return signal, confidence, raw_prediction
+    
+    def predict_checked(self, closes: List[float]) -> Tuple[str, float, float, bool]:
+        """
+        `predict` plus whether it fell back to a random prediction (no model,
+        still loading after the wait, or a failed forward pass)
+        Returns: (signal, confidence, raw_prediction, fallback)
+        """
+        # A model still loading in the background is waited for
+        self.model_loader.wait_ready()
+        self._refresh_model()
         model = self.model_loader.get_model()
+        fallback = model is None
         
         if model is None:
             # Fallback: return neutral with random prediction
@@ -87,15 +255,69 @@ class AIPredictor:
         else:
             try:
                 features = FeatureBuilder().build_features(closes)
-                raw_prediction = float(model.predict(features, verbose=0).squeeze())
+                raw_prediction = self._predict_window(features[0])
             except Exception as e:
                 print(f"Failed to run AI prediction: {e}")
                 raw_prediction = np.random.normal(0, 0.1)
+                fallback = True
         
         signal = self.map_prediction_to_signal(raw_prediction)
         confidence = min(1.0, abs(raw_prediction))
         
-        return signal, confidence, raw_prediction
+        return signal, confidence, raw_prediction, fallback
+    
+    def _refresh_model(self):
+        # Entries of a replaced model can never match again (the version is
+        # part of the key), drop them to free the space
+        self.model_loader.reload_if_changed()
+        if self.model_loader.version != self._cache_version:
+            self._cache_version = self.model_loader.version
+            if self.cache is not None:
+                self.cache.clear()
+    
+    def _predict_window(self, window: np.ndarray) -> float:
+        if self.cache is None:
+            return float(self.batcher.predict_blocking(window))
+        # Only the key is rounded; the model gets the window as built, like
+        # uncached calls and predict_series
+        rounded = np.round(window, FEATURE_DECIMALS) + 0.0  # + 0.0 folds -0.0 into 0.0
+        key = (self.model_loader.version, rounded.tobytes())
+        return self.cache.get_or_compute(key, lambda: float(self.batcher.predict_blocking(window)))
+    
+    def cache_stats(self) -> dict:
+        """
+        Prediction cache counters and hit ratio
+        """
+        if self.cache is None:
+            return {'enabled': False}
+        return {'enabled': True, 'model_version': self._cache_version, **self.cache.stats()}
+    
+    def predict_series(self, closes, sequence_length: int = 20, batch_size: int = 4096) -> np.ndarray:
+        """
+        Raw prediction at every bar from the window ending there, run in
+        batches of `batch_size` windows. The first sequence_length - 1 bars
+        have no full window and get NaN.
+        """
+        n = len(closes)
+        raw_predictions = np.full(n, np.nan)
+        model = self.model_loader.get_model()
+        if model is None:
+            # Fallback: random predictions, as in `predict`
+            raw_predictions[sequence_length - 1:] = np.random.normal(0, 0.1, max(n - sequence_length + 1, 0))
+            return raw_predictions
+        
+        features = FeatureBuilder().build_series_features(closes, sequence_length)
+        for start in range(0, len(features), batch_size):
+            chunk = features[start:start + batch_size]
+            outputs = np.asarray(model.predict(chunk, verbose=0), dtype=np.float64).reshape(len(chunk), -1)[:, 0]
+            raw_predictions[sequence_length - 1 + start:sequence_length - 1 + start + len(chunk)] = outputs
+        return raw_predictions
+    
+    def map_predictions_to_signals(self, predictions: np.ndarray) -> np.ndarray:
+        """
+        `map_prediction_to_signal` for an array of raw predictions
+        """
+        return np.where(predictions > 0.6, 'BUY', np.where(predictions < -0.6, 'SELL', 'NEUTRAL'))
     
     def map_prediction_to_signal(self, prediction: float) -> str:
         """
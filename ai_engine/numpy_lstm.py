@@ -0,0 +1,168 @@
+import json
+import numpy as np
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Union
+
+if TYPE_CHECKING:
+    import h5py
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    # Same function as 1 / (1 + exp(-x)), without overflow and faster
+    return 0.5 * np.tanh(0.5 * x) + 0.5
+
+
+def _hard_sigmoid(x: np.ndarray) -> np.ndarray:
+    # Keras 2 definition, used by older LSTM configs
+    return np.clip(0.2 * x + 0.5, 0.0, 1.0)
+
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    None: lambda x: x,
+    'tanh': np.tanh,
+    'sigmoid': _sigmoid,
+    'hard_sigmoid': _hard_sigmoid,
+    'relu': lambda x: np.maximum(x, 0.0),
+}
+
+
+def _activation(name: str):
+    if name not in ACTIVATIONS:
+        raise ValueError(f"Unsupported activation '{name}'")
+    return ACTIVATIONS[name]
+
+
+class LSTMLayer:
+    """
+    Keras LSTM forward pass. Keras packs the gates as (input, forget, cell,
+    output) along the last axis of kernel/recurrent/bias; they are reordered
+    to (input, forget, output, cell) so each step applies the recurrent
+    activation once to a contiguous block. The input projection of every
+    timestep is one matmul up front, so the recurrence only does the
+    (batch, units) x (units, 4 units) product.
+    """
+
+    def __init__(self, kernel: np.ndarray, recurrent_kernel: np.ndarray, bias: np.ndarray,
+                 activation: str = 'tanh', recurrent_activation: str = 'sigmoid', return_sequences: bool = False,
+                 go_backwards: bool = False):
+        self.units = units = recurrent_kernel.shape[0]
+        order = np.r_[0:2 * units, 3 * units:4 * units, 2 * units:3 * units]
+        self.kernel = np.ascontiguousarray(kernel[:, order])
+        self.recurrent_kernel = np.ascontiguousarray(recurrent_kernel[:, order])
+        self.bias = bias[order]
+        self.activation = _activation(activation)
+        self.recurrent_activation = _activation(recurrent_activation)
+        self.return_sequences = return_sequences
+        self.go_backwards = go_backwards
+
+    def __call__(self, inputs: np.ndarray) -> np.ndarray:
+        batch, steps = inputs.shape[:2]
+        if self.go_backwards:
+            inputs = inputs[:, ::-1]
+        # Timestep-major, so each step reads one contiguous block
+        projected = np.ascontiguousarray(np.swapaxes(inputs, 0, 1)) @ self.kernel + self.bias
+        units = self.units
+        h = np.zeros((batch, units), dtype=projected.dtype)
+        c = np.zeros_like(h)
+        outputs = []
+        for t in range(steps):
+            z = projected[t] + h @ self.recurrent_kernel
+            gates = self.recurrent_activation(z[:, :3 * units])
+            c = gates[:, units:2 * units] * c + gates[:, :units] * self.activation(z[:, 3 * units:])
+            h = gates[:, 2 * units:] * self.activation(c)
+            if self.return_sequences:
+                outputs.append(h)
+        return np.stack(outputs, axis=1) if self.return_sequences else h
+
+
+class DenseLayer:
+    """
+    Keras Dense forward pass
+    """
+
+    def __init__(self, kernel: np.ndarray, bias: np.ndarray = None, activation: str = 'linear'):
+        self.kernel = kernel
+        self.bias = bias
+        self.activation = _activation(activation)
+
+    def __call__(self, inputs: np.ndarray) -> np.ndarray:
+        outputs = inputs @ self.kernel
+        if self.bias is not None:
+            outputs = outputs + self.bias
+        return self.activation(outputs)
+
+
+def _layer_weights(group: 'h5py.Group') -> Dict[str, np.ndarray]:
+    # Weights keyed by their last name component ('kernel', 'bias', ...),
+    # Keras 2 names end with ':0'
+    weights = {}
+    for name in group.attrs['weight_names']:
+        name = name.decode() if isinstance(name, bytes) else name
+        weights[name.split('/')[-1].split(':')[0]] = np.asarray(group[name], dtype=np.float32)
+    return weights
+
+
+class NumpyLSTMModel:
+    """
+    Inference-only copy of a Keras Sequential LSTM/Dense model saved as
+    HDF5 (train_model.create_model), running the forward pass in NumPy
+    float32 like Keras. `predict` has the Keras signature, so it drops in
+    wherever the Keras model was used, without importing TensorFlow.
+    """
+
+    def __init__(self, layers: List, input_shape=None):
+        self.layers = layers
+        self.input_shape = input_shape
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'NumpyLSTMModel':
+        # Imported here, so importing the servers stays cheap
+        import h5py
+
+        with h5py.File(path, 'r') as f:
+            config = f.attrs['model_config']
+            config = json.loads(config.decode() if isinstance(config, bytes) else config)
+            if config['class_name'] != 'Sequential':
+                raise ValueError(f"Unsupported model type '{config['class_name']}'")
+            weights = f['model_weights']
+
+            layers, input_shape = [], None
+            for layer in config['config']['layers']:
+                kind, layer_config = layer['class_name'], layer['config']
+                if kind == 'InputLayer':
+                    input_shape = tuple(layer_config.get('batch_shape') or layer_config.get('batch_input_shape'))
+                elif kind == 'LSTM':
+                    params = _layer_weights(weights[layer_config['name']])
+                    layers.append(LSTMLayer(params['kernel'], params['recurrent_kernel'],
+                                            params.get('bias', np.zeros(params['kernel'].shape[1], np.float32)),
+                                            layer_config.get('activation', 'tanh'),
+                                            layer_config.get('recurrent_activation', 'sigmoid'),
+                                            layer_config.get('return_sequences', False),
+                                            layer_config.get('go_backwards', False)))
+                elif kind == 'Dense':
+                    params = _layer_weights(weights[layer_config['name']])
+                    layers.append(DenseLayer(params['kernel'], params.get('bias'),
+                                             layer_config.get('activation', 'linear')))
+                elif kind == 'Activation':
+                    layers.append(_activation(layer_config['activation']))
+                elif kind != 'Dropout':
+                    # Dropout is the identity at inference time
+                    raise ValueError(f"Unsupported layer '{kind}'")
+        return cls(layers, input_shape)
+
+    def __call__(self, inputs: np.ndarray) -> np.ndarray:
+        outputs = np.asarray(inputs, dtype=np.float32)
+        for layer in self.layers:
+            outputs = layer(outputs)
+        return outputs
+
+    def predict(self, inputs: np.ndarray, batch_size: int = None, verbose=0) -> np.ndarray:
+        """
+        Model outputs for a (batch, timesteps, features) array, computed
+        in chunks of `batch_size` rows when given
+        """
+        inputs = np.asarray(inputs, dtype=np.float32)
+        if not batch_size or len(inputs) <= batch_size:
+            return self(inputs)
+        return np.concatenate([self(inputs[k:k + batch_size]) for k in range(0, len(inputs), batch_size)])
@@ -1,24 +1,95 @@
+import os
+import numpy as np
+from pathlib import Path
 from typing import List, Dict
+
+from utils.cache import fingerprint
 from .model_loader import AIPredictor, ModelLoader
 
+# Closes per model input window (train_model.create_model)
+SEQUENCE_LENGTH = 20
+
 
 class PredictionEngine:
     """
     Main interface for the AI prediction system
     """
     
-    def __init__(self, model_path: str = None):
-        self.model_loader = ModelLoader(model_path)
+    def __init__(self, model_path: str = None, series_cache_dir: str = None, background: bool = False):
+        # With background=True the model loads on a thread, predictions wait for it
+        self.model_loader = ModelLoader(model_path, load=not background)
+        if background:
+            self.model_loader.load_in_background()
         self.ai_predictor = AIPredictor(self.model_loader)
+        # Whole-series predictions, per model version and dataset
+        # (default: AI_SERIES_CACHE_DIR, else series_cache/ next to the model)
+        cache_dir = series_cache_dir or os.getenv('AI_SERIES_CACHE_DIR')
+        self.series_cache_dir = (Path(cache_dir) if cache_dir
+                                 else Path(self.model_loader.model_path).parent / 'series_cache')
     
     def get_prediction(self, closes: List[float]) -> dict:
         """
-        Get prediction from the AI model
+        Get prediction from the AI model; `fallback` is True when no model
+        answered and the prediction is random
         """
-        signal, confidence, raw_prediction = self.ai_predictor.predict(closes)
+        signal, confidence, raw_prediction, fallback = self.ai_predictor.predict_checked(closes)
         
         return {
             'signal': signal,
             'confidence': confidence,
-            'raw_prediction': raw_prediction
-        }
\ No newline at end of file
+            'raw_prediction': raw_prediction,
+            'fallback': fallback
+        }
+    
+    def predict_series(self, closes, batch_size: int = 4096, use_cache: bool = True) -> Dict[str, np.ndarray]:
+        """
+        What `get_prediction` would have said at every bar of a history,
+        from the closes up to that bar, as arrays aligned with `closes`.
+        The first SEQUENCE_LENGTH - 1 bars have NaN raw predictions and
+        confidences and a NEUTRAL signal.
+        
+        Raw predictions are stored on disk under the model version and a
+        hash of the closes, so repeated backtests of one dataset run the
+        model once. Fallback-mode (random) predictions are never cached.
+        """
+        closes = np.asarray(closes, dtype=np.float64)
+        self.model_loader.wait_ready()
+        self.model_loader.reload_if_changed()
+        version = self.model_loader.version
+        path = None
+        raw_predictions = None
+        if use_cache and version is not None:
+            key = fingerprint(closes, version, SEQUENCE_LENGTH)
+            path = self.series_cache_dir / f'{key}.npy'
+            raw_predictions = self._load_series(path)
+        
+        if raw_predictions is None:
+            raw_predictions = self.ai_predictor.predict_series(closes, SEQUENCE_LENGTH, batch_size)
+            if path is not None:
+                self._save_series(path, raw_predictions)
+        
+        return {
+            'signal': self.ai_predictor.map_predictions_to_signals(raw_predictions),
+            'confidence': np.minimum(1.0, np.abs(raw_predictions)),
+            'raw_prediction': raw_predictions
+        }
+    
+    @staticmethod
+    def _load_series(path: Path):
+        try:
+            return np.load(path)
+        except (OSError, ValueError):
+            # Missing or unreadable entries are recomputed
+            return None
+    
+    @staticmethod
+    def _save_series(path: Path, raw_predictions: np.ndarray) -> None:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Written aside and renamed, so readers never see a partial file
+            partial = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+            with open(partial, 'wb') as f:
+                np.save(f, raw_predictions)
+            os.replace(partial, path)
+        except OSError as e:
+            print(f"Failed to cache series predictions: {e}")
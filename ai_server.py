@@ -8,25 +8,36 @@ from typing import List
 
 import numpy as np
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
 import pydantic
 from pydantic.v1 import BaseModel, Field, validator
 
+from ai_engine.batching import BatchQueueFull, MicroBatcher
+from ai_engine.model_loader import ModelLoader
 from utils.preprocessing import normalize_series, reshape_for_lstm
 
 MODEL_PATH = Path(os.getenv('AI_MODEL_PATH', Path(__file__).resolve().parent / 'models' / 'model.h5'))
-if MODEL_PATH.exists():
-    try:
-        from tensorflow.keras.models import load_model
-        model = load_model(MODEL_PATH)
-    except Exception as e:
-        print(f"Failed to load model: {e}. Using fallback mode.")
-        model = None
-else:
-    model = None
-    print("No model file found. Using fallback mode.")
+# TensorFlow when installed, else the NumPy engine (AI_MODEL_BACKEND selects);
+# loaded in the background once the app starts, see /ready
+model_loader = ModelLoader(MODEL_PATH, load=False)
+
+# Concurrent predictions share forward passes (AI_BATCH_MAX_SIZE / _MAX_WAIT_MS / _QUEUE_DEPTH)
+predict_batcher = MicroBatcher(lambda windows: model_loader.get_model().predict(windows, verbose=0))
 app = FastAPI(title="XAU/USD LSTM Inference API", version="1.0.0")
 
 
+@app.on_event('startup')
+async def start_model_loading():
+    # Off the import path: /health is served while the model loads
+    model_loader.load_in_background()
+
+
+@app.on_event('shutdown')
+async def stop_predict_batcher():
+    # Cancels the batching worker instead of leaving it pending at exit
+    await predict_batcher.aclose()
+
+
 class PredictPayload(BaseModel):
     closes: List[float] = Field(..., min_items=20, description="Chronological close prices")
     normalize: bool = Field(default=True, description="Whether to z-score normalize inputs before inference")
@@ -56,6 +67,9 @@ def map_signal(prediction: float) -> str:
 
 @app.post('/predict', response_model=PredictResponse)
 async def predict(payload: PredictPayload):
+    if not model_loader.ready.is_set():
+        raise HTTPException(status_code=503, detail="AI model is still loading")
+    model = model_loader.get_model()
     if model is None:
         prediction = np.random.normal(0, 0.5)
     else:
@@ -65,9 +79,10 @@ async def predict(payload: PredictPayload):
             if payload.normalize:
                 closes, _, _ = normalize_series(closes)
                 print("Normalized Data:", closes)  # Log normalized data
-            reshaped = reshape_for_lstm(closes)
-            prediction = float(model.predict(reshaped, verbose=0).squeeze())
+            prediction = await predict_batcher.predict(reshape_for_lstm(closes)[0])
             print("Raw Model Prediction:", prediction)  # Log raw prediction
+        except BatchQueueFull as exc:
+            raise HTTPException(status_code=503, detail=str(exc)) from exc
         except Exception as exc:
             raise HTTPException(status_code=400, detail=f"Failed to run inference: {exc}") from exc
 
@@ -89,7 +104,15 @@ async def predict(payload: PredictPayload):
 
 @app.get('/health')
 async def health():
-    return {'status': 'ok'}
+    # Liveness: answers as soon as the process serves requests
+    return {'status': 'ok', 'ai_model': model_loader.stats(), 'predict_batching': predict_batcher.stats()}
+
+
+@app.get('/ready')
+async def ready():
+    # Readiness: 503 until the model finished loading (or fell back)
+    status_code = 200 if model_loader.ready.is_set() else 503
+    return JSONResponse({'ready': status_code == 200, 'ai_model': model_loader.stats()}, status_code=status_code)
 
 
 if __name__ == '__main__':
@@ -240,7 +240,9 @@ async function analyzeWithStrategyServer(data, symbol = 'XAU/USD') {
             high: data.high,
             low: data.low,
             close: data.close,
-            volume: data.volume
+            volume: data.volume,
+            // Only the SMC details shown in formatSignalMessage
+            smc_fields: ['trend', 'bias', 'bos', 'fvgZones', 'orderBlocks']
         };
 
         const response = await axios.post(STRATEGY_SERVER_URL, payload, {
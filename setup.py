@@ -10,6 +10,7 @@ setup(
         "numpy",
         "matplotlib",
         "tensorflow",
+        "h5py",
         "scikit-learn",
         "yfinance",
         "tqdm",
@@ -0,0 +1,193 @@
+import os
+import warnings
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+from . import kernels
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """
+        Stand-in decorator: without Numba the loops stay plain Python
+        """
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda function: function
+
+
+# Sequential kernels. With Numba these compile to native code once and are
+# cached on disk (cache=True), so new workers load them without JIT cost.
+
+@njit(cache=True)
+def _extrema_masks_loop(highs, lows, lookback):
+    count = max(len(highs) - 2 * lookback, 0)
+    is_high = np.ones(count, dtype=np.bool_)
+    is_low = np.ones(count, dtype=np.bool_)
+    for k in range(count):
+        i = k + lookback
+        for j in range(i - lookback, i + lookback + 1):
+            if highs[i] < highs[j]:
+                is_high[k] = False
+                break
+        for j in range(i - lookback, i + lookback + 1):
+            if lows[i] > lows[j]:
+                is_low[k] = False
+                break
+    return is_high, is_low
+
+
+@njit(cache=True)
+def _touched_after_loop(values, start, levels, below):
+    # One reverse pass keeps the extreme of every suffix (NaNs skipped), then
+    # each level is a single lookup: O(n + levels) like the NumPy kernel
+    count = len(values)
+    extreme = np.empty(count + 1)
+    extreme[count] = np.inf if below else -np.inf
+    for k in range(count - 1, -1, -1):
+        value = extreme[k + 1]
+        if (values[k] < value) if below else (values[k] > value):
+            value = values[k]
+        extreme[k] = value
+    touched = np.zeros(len(levels), dtype=np.bool_)
+    for g in range(len(levels)):
+        reach = extreme[min(start[g], count)]
+        touched[g] = (reach <= levels[g]) if below else (reach >= levels[g])
+    return touched
+
+
+@njit(cache=True)
+def _prior_overlap_counts_loop(highs, lows, indices, lookback):
+    counts = np.zeros(len(indices), dtype=np.int64)
+    for g in range(len(indices)):
+        s = indices[g]
+        if s < lookback:
+            continue
+        for i in range(s - lookback, s):
+            if highs[i] > lows[s] and lows[i] < highs[s]:
+                counts[g] += 1
+    return counts
+
+
+@njit(cache=True)
+def _trailing_run_lengths_loop(mask):
+    runs = np.zeros(len(mask), dtype=np.int64)
+    run = 0
+    for k in range(len(mask)):
+        run = run + 1 if mask[k] else 0
+        runs[k] = run
+    return runs
+
+
+def _touched_after_numpy(values, start, levels, below: bool) -> np.ndarray:
+    # The extreme of each suffix decides every level in one lookup; a start
+    # past the end sees the padding and is never touched
+    values = kernels._as_float_array(values)
+    if below:
+        extreme = np.append(kernels.suffix_min(values), np.inf)
+        return extreme[start] <= levels
+    extreme = np.append(kernels.suffix_max(values), -np.inf)
+    return extreme[start] >= levels
+
+
+class KernelBackend:
+    """
+    One implementation of the SMC array kernels.
+
+    `numpy` is the vectorized path from smc_engine.kernels; `numba` runs the
+    sequential loops above, compiled when Numba is installed. Both return
+    identical results. Backends with `range_queries` answer swing and touch
+    queries from a RangeExtremaIndex (`rmq`) when the caller has one; the
+    others ignore it and run their own kernels.
+    """
+
+    def __init__(self, name: str, extrema_masks, touched_after, prior_overlap_counts, trailing_run_lengths,
+                 range_queries: bool = False):
+        self.name = name
+        self.range_queries = range_queries
+        self._extrema_masks = extrema_masks
+        self._touched_after = touched_after
+        self._prior_overlap_counts = prior_overlap_counts
+        self._trailing_run_lengths = trailing_run_lengths
+
+    @property
+    def compiled(self) -> bool:
+        return self.name == 'numba' and NUMBA_AVAILABLE
+
+    def swing_indices(self, highs, lows, lookback: int = 5, rmq=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Indices of swing highs and swing lows, in ascending order
+        """
+        if rmq is not None and self.range_queries:
+            return rmq.swing_indices(lookback)
+        is_high, is_low = self._extrema_masks(kernels._as_float_array(highs), kernels._as_float_array(lows),
+                                              lookback)
+        return np.flatnonzero(is_high) + lookback, np.flatnonzero(is_low) + lookback
+
+    def fractal_indices(self, highs, lows, lookback: int = 2, rmq=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Fractals share the swing masks (see kernels.fractal_indices)
+        """
+        return self.swing_indices(highs, lows, lookback, rmq)
+
+    def nested_swing_indices(self, highs, lows, lookbacks, rmq=None) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Swing indices for several lookbacks: one multi-scale pass over `rmq`
+        (RangeExtremaIndex.nested_swing_indices), or one scan per lookback
+        """
+        if rmq is not None and self.range_queries:
+            return rmq.nested_swing_indices(lookbacks)
+        return {lookback: self.swing_indices(highs, lows, lookback) for lookback in sorted(set(lookbacks))}
+
+    def touched_after(self, values, start, levels, below: bool, rmq=None) -> np.ndarray:
+        """
+        For every level, whether values[start:] ever reaches it: at or below
+        the level when `below`, at or above it otherwise. NaNs never touch.
+        `values` are the lows when `below`, else the highs, of `rmq`'s bars.
+        """
+        if rmq is not None and self.range_queries:
+            return rmq.touched_after(start, levels, below)
+        return self._touched_after(kernels._as_float_array(values), np.asarray(start, dtype=np.int64),
+                                   kernels._as_float_array(levels), below)
+
+    def prior_overlap_counts(self, highs, lows, indices, lookback: int) -> np.ndarray:
+        return self._prior_overlap_counts(kernels._as_float_array(highs), kernels._as_float_array(lows),
+                                          np.asarray(indices, dtype=np.int64), lookback)
+
+    def trailing_run_lengths(self, mask) -> np.ndarray:
+        return self._trailing_run_lengths(np.asarray(mask, dtype=np.bool_))
+
+    def __repr__(self) -> str:
+        return f"KernelBackend({self.name!r}, compiled={self.compiled})"
+
+
+NUMPY_KERNELS = KernelBackend('numpy', kernels.centered_extrema_masks, _touched_after_numpy,
+                              kernels.prior_overlap_counts, kernels.trailing_run_lengths, range_queries=True)
+NUMBA_KERNELS = KernelBackend('numba', _extrema_masks_loop, _touched_after_loop,
+                              _prior_overlap_counts_loop, _trailing_run_lengths_loop)
+
+BACKENDS = ('auto', 'numpy', 'numba')
+
+
+def get_backend(name: Optional[str] = None) -> KernelBackend:
+    """
+    Kernel backend by name, defaulting to the SMC_KERNEL_BACKEND environment
+    variable ('auto' when unset). 'auto' picks Numba when it is installed;
+    asking for 'numba' without it falls back to NumPy.
+    """
+    if isinstance(name, KernelBackend):
+        return name
+    name = (name or os.getenv('SMC_KERNEL_BACKEND', 'auto')).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown SMC kernel backend '{name}', expected one of {BACKENDS}")
+    if name == 'numpy':
+        return NUMPY_KERNELS
+    if NUMBA_AVAILABLE:
+        return NUMBA_KERNELS
+    if name == 'numba':
+        warnings.warn("Numba is not installed. Using the NumPy SMC kernels.", RuntimeWarning, stacklevel=2)
+    return NUMPY_KERNELS
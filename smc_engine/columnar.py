@@ -0,0 +1,315 @@
+import numpy as np
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# Every detection type name used by the detectors, stored as an int8 code
+TYPE_NAMES = (
+    'swing_high',
+    'swing_low',
+    'bullish',
+    'bearish',
+    'bullish_bos',
+    'bearish_bos',
+    'bullish_choch',
+    'bearish_choch',
+    'bullish_fvg',
+    'bearish_fvg',
+    'bullish_order_block',
+    'bearish_order_block',
+    'liquidity_sweep_high',
+    'liquidity_sweep_low',
+    'bullish_liquidity_sweep',
+    'bearish_liquidity_sweep',
+    'bullish_impulse_pullback',
+    'bearish_impulse_pullback',
+    'inside_bar',
+    'mother_bar',
+    'upper_liquidity_zone',
+    'lower_liquidity_zone',
+    'unusual_volume',
+    'equal_highs',
+    'equal_lows',
+)
+TYPE_CODES = {name: code for code, name in enumerate(TYPE_NAMES)}
+
+# Legacy dict layouts shared by both engines
+SWING_LAYOUT = (('index', 'index'), ('price', 'price'), ('high', 'high'), ('low', 'low'), ('time', 'index'))
+FRACTAL_LAYOUT = (('index', 'index'), ('price', 'price'), ('type', 'type'), ('high', 'high'), ('low', 'low'))
+BREAK_LAYOUT = (('index', 'index'), ('price', 'price'), ('previous_price', 'previous_price'), ('type', 'type'))
+
+
+class Constant:
+    """
+    Layout source for a dict key that has the same value on every row
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+
+class Nullable:
+    """
+    Layout source for a column that is None on rows where the boolean
+    `present` column is False (e.g. the break of a level that never broke)
+    """
+    __slots__ = ('source', 'present')
+
+    def __init__(self, source: str, present: str):
+        self.source = source
+        self.present = present
+
+
+# BOS/CHOCH with the bar whose close actually crossed the previous level
+CROSSING_BREAK_LAYOUT = BREAK_LAYOUT + (('break_index', Nullable('break_index', 'broken')),
+                                        ('break_close', Nullable('break_close', 'broken')))
+
+
+class DetectionColumns:
+    """
+    Struct-of-arrays container for one kind of SMC detection.
+
+    Each field is a NumPy array with one element per detection. `layout`
+    lists the (dict key, source) pairs of the legacy dict shape, where the
+    source is a column name ('index', 'price', 'high', 'low', 'type' or an
+    `extra` column), a `Constant` or a `Nullable`. Dicts are only built by `to_dicts()`.
+    """
+    __slots__ = ('index', 'price', 'high', 'low', 'type_code', 'extra', 'layout')
+
+    def __init__(self, index: np.ndarray, type_code: np.ndarray, layout: Sequence[Tuple[str, Any]],
+                 price: Optional[np.ndarray] = None, high: Optional[np.ndarray] = None,
+                 low: Optional[np.ndarray] = None, extra: Optional[Dict[str, np.ndarray]] = None):
+        self.index = np.asarray(index, dtype=np.int64)
+        self.type_code = np.asarray(type_code, dtype=np.int8)
+        self.price = price
+        self.high = high
+        self.low = low
+        self.extra = extra or {}
+        self.layout = tuple(layout)
+
+    @classmethod
+    def of_type(cls, type_name: str, index: np.ndarray, layout: Sequence[Tuple[str, Any]], **columns) -> 'DetectionColumns':
+        """
+        Build columns where every row has the same detection type
+        """
+        index = np.asarray(index, dtype=np.int64)
+        type_code = np.full(len(index), TYPE_CODES[type_name], dtype=np.int8)
+        return cls(index, type_code, layout, **columns)
+
+    @classmethod
+    def empty(cls, layout: Sequence[Tuple[str, Any]]) -> 'DetectionColumns':
+        return cls(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int8), layout)
+
+    @classmethod
+    def concatenate(cls, parts: Sequence['DetectionColumns']) -> 'DetectionColumns':
+        """
+        Stack detections that share a layout, keeping their order
+        """
+        parts = [part for part in parts if len(part)] or list(parts[:1])
+        if len(parts) == 1:
+            return parts[0]
+        first = parts[0]
+
+        def stack(name):
+            values = [getattr(part, name) for part in parts]
+            return None if values[0] is None else np.concatenate(values)
+
+        extra = {key: np.concatenate([part.extra[key] for part in parts]) for key in first.extra}
+        return cls(stack('index'), stack('type_code'), first.layout, price=stack('price'),
+                   high=stack('high'), low=stack('low'), extra=extra)
+
+    def with_type(self, type_name: str) -> 'DetectionColumns':
+        """
+        Same rows under another type (e.g. CHOCH sharing the BOS arrays)
+        """
+        type_code = np.full(len(self.index), TYPE_CODES[type_name], dtype=np.int8)
+        return DetectionColumns(self.index, type_code, self.layout, price=self.price,
+                                high=self.high, low=self.low, extra=self.extra)
+
+    def take(self, rows) -> 'DetectionColumns':
+        """
+        Select rows by slice, mask or integer positions
+        """
+        def pick(values):
+            return None if values is None else values[rows]
+
+        return DetectionColumns(self.index[rows], self.type_code[rows], self.layout, price=pick(self.price),
+                                high=pick(self.high), low=pick(self.low),
+                                extra={key: values[rows] for key, values in self.extra.items()})
+
+    def column(self, name: str) -> np.ndarray:
+        if name == 'type':
+            return self.type_code
+        if name in self.extra:
+            return self.extra[name]
+        values = getattr(self, name)
+        if values is None:
+            raise KeyError(name)
+        return values
+
+    def keys(self) -> List[str]:
+        return [key for key, _ in self.layout]
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return self.take(row)
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("detection index out of range")
+        return DetectionRecord(self, row)
+
+    def __iter__(self) -> Iterator['DetectionRecord']:
+        for row in range(len(self)):
+            yield DetectionRecord(self, row)
+
+    def __repr__(self) -> str:
+        return f"DetectionColumns({len(self)} rows, keys={self.keys()})"
+
+    def to_dicts(self) -> List[Dict]:
+        """
+        Materialize the legacy list-of-dicts shape
+        """
+        n = len(self)
+        if n == 0:
+            return []
+        keys = []
+        columns = []
+        for key, source in self.layout:
+            keys.append(key)
+            if isinstance(source, Constant):
+                columns.append([source.value] * n)
+            elif isinstance(source, Nullable):
+                columns.append([value if present else None for value, present in
+                                zip(self.column(source.source).tolist(), self.column(source.present).tolist())])
+            elif source == 'type':
+                columns.append([TYPE_NAMES[code] for code in self.type_code.tolist()])
+            else:
+                columns.append(self.column(source).tolist())
+        return [dict(zip(keys, row)) for row in zip(*columns)]
+
+
+class DetectionRecord:
+    """
+    Read-only view of one row of a DetectionColumns, usable like the old dict
+    """
+    __slots__ = ('_columns', '_row')
+
+    def __init__(self, columns: DetectionColumns, row: int):
+        self._columns = columns
+        self._row = row
+
+    def __getitem__(self, key: str) -> Any:
+        for name, source in self._columns.layout:
+            if name == key:
+                if isinstance(source, Constant):
+                    return source.value
+                if isinstance(source, Nullable):
+                    if not self._columns.column(source.present)[self._row]:
+                        return None
+                    source = source.source
+                if source == 'type':
+                    return self.type
+                return self._columns.column(source)[self._row].item()
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self) -> List[str]:
+        return self._columns.keys()
+
+    def to_dict(self) -> Dict:
+        return {key: self[key] for key in self.keys()}
+
+    @property
+    def index(self) -> int:
+        return int(self._columns.index[self._row])
+
+    @property
+    def type(self) -> str:
+        return TYPE_NAMES[self._columns.type_code[self._row]]
+
+    @property
+    def price(self) -> float:
+        return self._columns.column('price')[self._row].item()
+
+    @property
+    def high(self) -> float:
+        return self._columns.column('high')[self._row].item()
+
+    @property
+    def low(self) -> float:
+        return self._columns.column('low')[self._row].item()
+
+    def __repr__(self) -> str:
+        return f"DetectionRecord({self.to_dict()})"
+
+
+def swing_columns(highs: np.ndarray, lows: np.ndarray, high_idx: np.ndarray,
+                  low_idx: np.ndarray) -> Tuple[DetectionColumns, DetectionColumns]:
+    """
+    Swing highs and lows at the given bar indices
+    """
+    swing_highs = DetectionColumns.of_type('swing_high', high_idx, SWING_LAYOUT, price=highs[high_idx],
+                                           high=highs[high_idx], low=lows[high_idx])
+    swing_lows = DetectionColumns.of_type('swing_low', low_idx, SWING_LAYOUT, price=lows[low_idx],
+                                          high=highs[low_idx], low=lows[low_idx])
+    return swing_highs, swing_lows
+
+
+def fractal_columns(highs: np.ndarray, lows: np.ndarray, high_idx: np.ndarray,
+                    low_idx: np.ndarray) -> Tuple[DetectionColumns, DetectionColumns]:
+    """
+    High fractals (typed 'bearish') and low fractals (typed 'bullish')
+    """
+    high_fractals = DetectionColumns.of_type('bearish', high_idx, FRACTAL_LAYOUT, price=highs[high_idx],
+                                             high=highs[high_idx], low=lows[high_idx])
+    low_fractals = DetectionColumns.of_type('bullish', low_idx, FRACTAL_LAYOUT, price=lows[low_idx],
+                                            high=highs[low_idx], low=lows[low_idx])
+    return high_fractals, low_fractals
+
+
+def break_columns(swings: DetectionColumns, type_name: str, crossings=None) -> DetectionColumns:
+    """
+    Consecutive swings where the later one is higher ('bullish_*') or
+    lower ('bearish_*') than the previous one. With a CloseCrossingIndex
+    over the closes, each event also carries the first bar after the
+    previous swing that closed beyond its price, and that close.
+    """
+    layout = BREAK_LAYOUT if crossings is None else CROSSING_BREAK_LAYOUT
+    price = swings.price
+    if price is None or len(price) < 2:
+        index, price = np.zeros(0, dtype=np.int64), np.zeros(0)
+    else:
+        index = swings.index
+    bullish = type_name.startswith('bullish')
+    previous, current = price[:-1], price[1:]
+    broke = current > previous if bullish else current < previous
+    extra = {'previous_price': previous[broke]}
+    if crossings is not None:
+        break_index, break_close = crossings.breaks(index[:-1][broke] + 1, previous[broke], bullish)
+        extra.update(break_index=break_index, break_close=break_close, broken=break_index >= 0)
+    return DetectionColumns.of_type(type_name, index[1:][broke], layout, price=current[broke], extra=extra)
+
+
+def materialize(result: Any) -> Any:
+    """
+    Convert every DetectionColumns inside a result (dicts/lists nested
+    arbitrarily) to lists of dicts, and lazy results to plain dicts. Call
+    this at the API boundary only.
+    """
+    if isinstance(result, DetectionColumns):
+        return result.to_dicts()
+    if isinstance(result, Mapping):
+        return {key: materialize(value) for key, value in result.items()}
+    if isinstance(result, (list, tuple)):
+        return [materialize(value) for value in result]
+    return result
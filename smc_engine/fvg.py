@@ -1,5 +1,15 @@
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional, Union
+
+from .backend import get_backend
+from .columnar import DetectionColumns, TYPE_CODES
+from .zones import ZoneStore
+
+FVG_LAYOUT = (('index', 'index'), ('type', 'type'), ('high', 'high'), ('low', 'low'), ('entry', 'entry'),
+              ('gap_size', 'gap_size'))
+IMPULSE_PULLBACK_LAYOUT = (('index', 'index'), ('type', 'type'), ('impulse_start', 'impulse_start'),
+                           ('impulse_end', 'index'), ('pullback_start', 'pullback_start'),
+                           ('pullback_end', 'pullback_end'))
 
 
 class FVGDetector:
@@ -8,67 +18,43 @@ class FVGDetector:
     FVG is a gap between candles that gets filled
     """
     
-    def detect_fvg(self, opens: np.ndarray, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray) -> List[Dict]:
+    def detect_fvg(self, opens: np.ndarray, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray,
+                   columnar: bool = False, store: Optional[ZoneStore] = None) -> Union[List[Dict], DetectionColumns]:
         """
-        Detect Fair Value Gaps in the price data
+        Detect Fair Value Gaps in the price data.
+        Every three-candle window is tested at once with shifted arrays.
+        The gaps are also added to `store` when one is given.
         """
-        fvg_zones = []
+        highs = np.asarray(highs, dtype=np.float64)
+        lows = np.asarray(lows, dtype=np.float64)
+        
+        # Previous, middle and next candle of every window whose next
+        # candle is not the last bar
+        count = max(len(highs) - 3, 0)
+        prev_high, prev_low = highs[:count], lows[:count]
+        middle_high, middle_low = highs[1:count + 1], lows[1:count + 1]
+        next_high, next_low = highs[2:count + 2], lows[2:count + 2]
+        
+        # Bullish FVG: previous candle's high < next candle's low,
+        # and middle candle doesn't fill the gap
+        bullish = (prev_high < next_low) & (middle_high <= next_low) & (middle_low >= prev_high)
+        
+        # Bearish FVG: previous candle's low > next candle's high,
+        # and middle candle doesn't fill the gap
+        bearish = ~bullish & (prev_low > next_high) & (middle_high <= prev_low) & (middle_low >= next_high)
         
-        # Look for FVGs by checking gaps between candles
-        for i in range(2, len(highs) - 1):
-            # Define the three candles involved in potential FVG
-            prev_candle = {
-                'high': highs[i-2],
-                'low': lows[i-2],
-                'open': opens[i-2],
-                'close': closes[i-2]
-            }
-            
-            middle_candle = {
-                'high': highs[i-1],
-                'low': lows[i-1],
-                'open': opens[i-1],
-                'close': closes[i-1]
-            }
-            
-            next_candle = {
-                'high': highs[i],
-                'low': lows[i],
-                'open': opens[i],
-                'close': closes[i]
-            }
-            
-            # Check for Bullish FVG: previous candle's low < next candle's high, 
-            # and middle candle doesn't fill the gap
-            if (prev_candle['high'] < next_candle['low'] and 
-                middle_candle['high'] <= next_candle['low'] and 
-                middle_candle['low'] >= prev_candle['high']):
-                
-                fvg_zones.append({
-                    'index': i-1,
-                    'type': 'bullish_fvg',
-                    'high': next_candle['low'],  # Upper bound of the gap
-                    'low': prev_candle['high'],  # Lower bound of the gap
-                    'entry': (next_candle['low'] + prev_candle['high']) / 2,
-                    'gap_size': next_candle['low'] - prev_candle['high']
-                })
-            
-            # Check for Bearish FVG: previous candle's high > next candle's low,
-            # and middle candle doesn't fill the gap
-            elif (prev_candle['low'] > next_candle['high'] and 
-                  middle_candle['high'] <= prev_candle['low'] and 
-                  middle_candle['low'] >= next_candle['high']):
-                
-                fvg_zones.append({
-                    'index': i-1,
-                    'type': 'bearish_fvg',
-                    'high': prev_candle['low'],  # Upper bound of the gap
-                    'low': next_candle['high'],  # Lower bound of the gap
-                    'entry': (prev_candle['low'] + next_candle['high']) / 2,
-                    'gap_size': prev_candle['low'] - next_candle['high']
-                })
+        rows = np.flatnonzero(bullish | bearish)
+        is_bullish = bullish[rows]
+        # Upper and lower bound of the gap
+        upper = np.where(is_bullish, next_low[rows], prev_low[rows])
+        lower = np.where(is_bullish, prev_high[rows], next_high[rows])
+        type_code = np.where(is_bullish, TYPE_CODES['bullish_fvg'], TYPE_CODES['bearish_fvg'])
         
-        return fvg_zones
+        fvg_zones = DetectionColumns(rows + 1, type_code, FVG_LAYOUT, high=upper, low=lower,
+                                     extra={'entry': (upper + lower) / 2, 'gap_size': upper - lower})
+        if store is not None:
+            store.add(fvg_zones)
+        return fvg_zones if columnar else fvg_zones.to_dicts()
 
 
 class ImpulsePullbackDetector:
@@ -76,44 +62,41 @@ class ImpulsePullbackDetector:
     Detects impulse and pullback patterns in price action
     """
     
-    def detect_impulse_pullback(self, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray) -> List[Dict]:
+    def __init__(self, backend: Optional[str] = None):
+        self.kernels = get_backend(backend)
+    
+    def detect_impulse_pullback(self, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray,
+                                columnar: bool = False) -> Union[List[Dict], DetectionColumns]:
         """
-        Detect impulse moves followed by pullbacks
+        Detect impulse moves followed by pullbacks.
+        An impulse is 5+ consecutive momentum moves in one direction, read
+        off the run lengths of the momentum sign.
         """
-        patterns = []
-        
+        closes = np.asarray(closes, dtype=np.float64)
         if len(closes) < 10:
-            return patterns
+            patterns = DetectionColumns.empty(IMPULSE_PULLBACK_LAYOUT)
+            return patterns if columnar else patterns.to_dicts()
         
         # Calculate simple momentum
         momentum = np.diff(closes)
+        rising, falling = momentum > 0, momentum < 0
+        rising_run = self.kernels.trailing_run_lengths(rising)
+        falling_run = self.kernels.trailing_run_lengths(falling)
+        
+        # Candidate impulse ends i in [5, len(momentum) - 5)
+        i = np.arange(5, len(momentum) - 5)
+        
+        # Bullish impulse (5 rising moves after a falling one) followed by two falling moves
+        bullish = (rising_run[i] >= 5) & falling[i - 5] & falling[i + 1] & falling[i + 2]
         
-        # Look for potential impulse moves (strong consecutive moves in one direction)
-        for i in range(5, len(momentum) - 5):
-            # Check for bullish impulse (4+ consecutive positive moves)
-            if all(m > 0 for m in momentum[i-4:i+1]) and momentum[i-5] < 0:
-                # Check for pullback (opposite direction move)
-                if momentum[i+1] < 0 and momentum[i+2] < 0:
-                    patterns.append({
-                        'index': i,
-                        'type': 'bullish_impulse_pullback',
-                        'impulse_start': i-4,
-                        'impulse_end': i,
-                        'pullback_start': i+1,
-                        'pullback_end': i+2
-                    })
-            
-            # Check for bearish impulse (4+ consecutive negative moves)
-            elif all(m < 0 for m in momentum[i-4:i+1]) and momentum[i-5] > 0:
-                # Check for pullback (opposite direction move)
-                if momentum[i+1] > 0 and momentum[i+2] > 0:
-                    patterns.append({
-                        'index': i,
-                        'type': 'bearish_impulse_pullback',
-                        'impulse_start': i-4,
-                        'impulse_end': i,
-                        'pullback_start': i+1,
-                        'pullback_end': i+2
-                    })
+        # Bearish impulse (5 falling moves after a rising one) followed by two rising moves
+        bearish = (falling_run[i] >= 5) & rising[i - 5] & rising[i + 1] & rising[i + 2]
         
-        return patterns
\ No newline at end of file
+        found = bullish | bearish
+        index = i[found]
+        type_code = np.where(bullish[found], TYPE_CODES['bullish_impulse_pullback'],
+                             TYPE_CODES['bearish_impulse_pullback'])
+        patterns = DetectionColumns(index, type_code, IMPULSE_PULLBACK_LAYOUT,
+                                    extra={'impulse_start': index - 4, 'pullback_start': index + 1,
+                                           'pullback_end': index + 2})
+        return patterns if columnar else patterns.to_dicts()
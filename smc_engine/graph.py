@@ -0,0 +1,117 @@
+import threading
+import time
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class GraphRun:
+    """
+    Values of one DetectorGraph run (inputs included) and the seconds
+    spent in each node it computed
+    """
+    __slots__ = ('values', 'timings')
+
+    def __init__(self, values: Dict[str, Any], timings: Dict[str, float]):
+        self.values = values
+        self.timings = timings
+
+    def __getitem__(self, name: str) -> Any:
+        return self.values[name]
+
+
+class DetectorGraph:
+    """
+    Small DAG of named analysis steps. Each node is a function of the
+    values of the nodes (or inputs) it depends on, given as positional
+    arguments. A run computes every node needed for its targets exactly
+    once, in dependency order; with an executor, nodes whose inputs are
+    ready are submitted together so independent branches overlap (useful
+    when the kernels release the GIL). Inputs that already carry a node's
+    name (e.g. a prebuilt range index) replace that node.
+    """
+
+    def __init__(self):
+        self._nodes: Dict[str, Tuple[Callable, Tuple[str, ...]]] = {}
+        self._lock = threading.Lock()
+        self._calls: Dict[str, int] = {}
+        self._seconds: Dict[str, float] = {}
+
+    def add(self, name: str, function: Callable, *dependencies: str) -> 'DetectorGraph':
+        if name in self._nodes:
+            raise ValueError(f"Node '{name}' already defined")
+        self._nodes[name] = (function, dependencies)
+        return self
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def _plan(self, targets: Iterable[str], values: Dict[str, Any]) -> List[str]:
+        # Nodes to compute for the targets, each after its dependencies
+        order, visiting, visited = [], set(), set()
+
+        def visit(name):
+            if name in visited or name in values:
+                return
+            if name not in self._nodes:
+                raise KeyError(f"Missing input '{name}'")
+            if name in visiting:
+                raise ValueError(f"Cycle through node '{name}'")
+            visiting.add(name)
+            for dependency in self._nodes[name][1]:
+                visit(dependency)
+            visiting.discard(name)
+            visited.add(name)
+            order.append(name)
+
+        for target in targets:
+            visit(target)
+        return order
+
+    def _compute(self, name: str, values: Dict[str, Any]) -> Tuple[Any, float]:
+        function, dependencies = self._nodes[name]
+        start = time.perf_counter()
+        value = function(*(values[dependency] for dependency in dependencies))
+        return value, time.perf_counter() - start
+
+    def run(self, inputs: Dict[str, Any], targets: Optional[Iterable[str]] = None,
+            executor: Optional[Executor] = None) -> GraphRun:
+        """
+        Compute `targets` (default: every node) from `inputs`
+        """
+        values = dict(inputs)
+        plan = self._plan(self._nodes if targets is None else targets, values)
+        timings = {}
+
+        if executor is None:
+            for name in plan:
+                values[name], timings[name] = self._compute(name, values)
+        else:
+            remaining, running = plan, {}
+            while remaining or running:
+                ready = [name for name in remaining
+                         if all(dependency in values for dependency in self._nodes[name][1])]
+                remaining = [name for name in remaining if name not in ready]
+                for name in ready:
+                    # Snapshot of the inputs, the dict keeps changing here
+                    running[executor.submit(self._compute, name, dict(values))] = name
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    values[name], timings[name] = future.result()
+
+        with self._lock:
+            for name, seconds in timings.items():
+                self._calls[name] = self._calls.get(name, 0) + 1
+                self._seconds[name] = self._seconds.get(name, 0.0) + seconds
+        return GraphRun(values, timings)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Calls and mean milliseconds of every node run so far
+        """
+        with self._lock:
+            return {
+                name: {'calls': self._calls[name], 'mean_ms': 1000 * self._seconds[name] / self._calls[name]}
+                for name in self._nodes if self._calls.get(name)
+            }
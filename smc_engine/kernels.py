@@ -0,0 +1,148 @@
+import numpy as np
+from typing import Tuple
+
+
+def _as_float_array(values) -> np.ndarray:
+    """
+    View any sequence/buffer of prices as a contiguous float64 array
+    """
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Max over every full window of `window` bars (van Herk/Gil-Werman).
+    Element k is the max of values[k:k + window]; NaNs are ignored.
+    Runs in O(n) regardless of the window size.
+    """
+    return _van_herk(values, window, np.fmax, -np.inf)
+
+
+def rolling_min(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Min over every full window of `window` bars, NaNs ignored
+    """
+    return _van_herk(values, window, np.fmin, np.inf)
+
+
+def _van_herk(values: np.ndarray, window: int, op, fill: float) -> np.ndarray:
+    values = _as_float_array(values)
+    n = len(values)
+    if window <= 0 or n < window:
+        return np.empty(0, dtype=np.float64)
+    if window == 1:
+        return values.copy()
+
+    # Split the series into blocks of `window` bars and take running
+    # extrema forwards and backwards inside each block. Any window then
+    # spans at most two blocks: the tail of one and the head of the next.
+    blocks = -(-n // window)
+    padded = np.full(blocks * window, fill)
+    padded[:n] = values
+    padded = padded.reshape(blocks, window)
+
+    forward = op.accumulate(padded, axis=1).ravel()
+    backward = op.accumulate(padded[:, ::-1], axis=1)[:, ::-1].ravel()
+
+    count = n - window + 1
+    return op(backward[:count], forward[window - 1:window - 1 + count])
+
+
+def centered_extrema_masks(highs, lows, lookback: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Flag bars whose high (low) is the extreme of the centered window
+    [i - lookback, i + lookback].
+
+    Ties are accepted, exactly like the reference loops: a bar only fails
+    when some neighbour is strictly higher (lower), so equal highs on a
+    plateau are all flagged. NaN neighbours never disqualify a bar and a
+    NaN bar is never disqualified, mirroring `<`/`>` against NaN.
+
+    The masks cover bars lookback .. n - lookback - 1 (the only bars that
+    have a full window); element k refers to bar k + lookback.
+    """
+    highs = _as_float_array(highs)
+    lows = _as_float_array(lows)
+    window = 2 * lookback + 1
+
+    window_high = rolling_max(highs, window)
+    window_low = rolling_min(lows, window)
+    if len(window_high) == 0:
+        empty = np.zeros(0, dtype=bool)
+        return empty, empty.copy()
+
+    center = slice(lookback, lookback + len(window_high))
+    is_high = ~(highs[center] < window_high)
+    is_low = ~(lows[center] > window_low)
+    return is_high, is_low
+
+
+def swing_indices(highs, lows, lookback: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indices of swing highs and swing lows, in ascending order
+    """
+    is_high, is_low = centered_extrema_masks(highs, lows, lookback)
+    return np.flatnonzero(is_high) + lookback, np.flatnonzero(is_low) + lookback
+
+
+def fractal_indices(highs, lows, lookback: int = 2) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indices of high (bearish) and low (bullish) fractals, in ascending order.
+
+    The fractal loops skip the middle bar when comparing, the swing loops
+    compare it against itself; both reduce to "no neighbour is strictly
+    more extreme", so fractals share the swing masks.
+    """
+    return swing_indices(highs, lows, lookback)
+
+
+def suffix_min(values) -> np.ndarray:
+    """
+    Element k is the min of values[k:], NaNs ignored
+    """
+    values = _as_float_array(values)
+    return np.fmin.accumulate(values[::-1])[::-1]
+
+
+def suffix_max(values) -> np.ndarray:
+    """
+    Element k is the max of values[k:], NaNs ignored
+    """
+    values = _as_float_array(values)
+    return np.fmax.accumulate(values[::-1])[::-1]
+
+
+def prior_overlap_counts(highs, lows, indices, lookback: int) -> np.ndarray:
+    """
+    For every bar s in `indices`, the number of bars in [s - lookback, s)
+    whose range strictly overlaps the range of bar s. Bars with fewer than
+    `lookback` predecessors get 0.
+
+    Each bar is tested against its own range, so a single cumulative count
+    cannot be shared between bars; instead the `lookback` shifted comparisons
+    are evaluated for all bars at once, O(len(indices) * lookback) in NumPy.
+    """
+    highs = _as_float_array(highs)
+    lows = _as_float_array(lows)
+    indices = np.asarray(indices, dtype=np.int64)
+    counts = np.zeros(len(indices), dtype=np.int64)
+    valid = indices >= lookback
+    bars = indices[valid]
+    top, bottom = highs[bars], lows[bars]
+    tested = np.zeros(len(bars), dtype=np.int64)
+    for shift in range(1, lookback + 1):
+        tested += (highs[bars - shift] > bottom) & (lows[bars - shift] < top)
+    counts[valid] = tested
+    return counts
+
+
+def trailing_run_lengths(mask) -> np.ndarray:
+    """
+    Run-length encoding of a boolean series, read per element: element k is
+    the number of consecutive True values ending at k (0 where mask is False)
+    """
+    mask = np.asarray(mask, dtype=bool)
+    positions = np.arange(len(mask))
+    # Position of the latest False at or before each element
+    last_break = np.maximum.accumulate(np.where(mask, -1, positions)) if len(mask) else positions
+    return positions - last_break
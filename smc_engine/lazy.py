@@ -0,0 +1,126 @@
+import threading
+from collections.abc import Mapping
+from typing import Any, Dict, FrozenSet, Iterator, Optional
+
+
+class lazy_field:
+    """
+    Memoized field of a LazyResult. The method runs on first access and the
+    fields it reads while running are recorded as its dependencies. Fields
+    with a `key` are part of the result's mapping, the others are internal.
+    """
+
+    def __init__(self, key: Optional[str] = None):
+        self.key = key
+        self.name = None
+        self.method = None
+
+    def __call__(self, method):
+        self.method = method
+        self.name = method.__name__
+        return self
+
+    def __get__(self, result, owner=None):
+        if result is None:
+            return self
+        return result._value(self)
+
+
+class LazyResult(Mapping):
+    """
+    Read-only mapping whose values are lazy_fields computed on first
+    access, so reading one key only runs what that key depends on. Fields
+    can be seeded with precomputed values by name. Setting a key overrides
+    its value and drops every memoized field computed from it; keys that
+    are not fields are kept as extras after the field keys.
+    """
+
+    _fields = ()
+    _by_key: Dict[str, lazy_field] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        fields = {}
+        for klass in reversed(cls.__mro__):
+            for value in vars(klass).values():
+                if isinstance(value, lazy_field):
+                    fields[value.name] = value
+        cls._fields = tuple(fields.values())
+        cls._by_key = {field.key: field for field in cls._fields if field.key is not None}
+
+    def __init__(self, **known):
+        names = {field.name for field in self._fields}
+        unknown = set(known) - names
+        if unknown:
+            raise TypeError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        self._values = dict(known)
+        self._dependencies: Dict[str, set] = {}
+        self._extra = {}
+        self._stack = []
+        self._lock = threading.RLock()
+
+    def _value(self, field: lazy_field) -> Any:
+        with self._lock:
+            if self._stack:
+                self._dependencies.setdefault(self._stack[-1], set()).add(field.name)
+            if field.name not in self._values:
+                self._stack.append(field.name)
+                try:
+                    self._values[field.name] = field.method(self)
+                finally:
+                    self._stack.pop()
+            return self._values[field.name]
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._extra:
+            return self._extra[key]
+        return self._by_key[key].__get__(self)
+
+    def __setitem__(self, key: str, value: Any):
+        field = self._by_key.get(key)
+        with self._lock:
+            if field is None:
+                self._extra[key] = value
+                return
+            self._invalidate(field.name)
+            self._values[field.name] = value
+
+    def _invalidate(self, name: str):
+        # Drop every computed field that read `name`, directly or not
+        for dependent, reads in list(self._dependencies.items()):
+            if name in reads and dependent in self._values:
+                del self._values[dependent]
+                self._invalidate(dependent)
+        self._values.pop(name, None)
+        self._dependencies.pop(name, None)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._by_key
+        yield from (key for key in self._extra if key not in self._by_key)
+
+    def __len__(self) -> int:
+        return len(self._by_key) + len(self._extra)
+
+    @property
+    def computed(self) -> FrozenSet[str]:
+        """
+        Names of the fields evaluated (or seeded) so far
+        """
+        with self._lock:
+            return frozenset(self._values)
+
+    def dependencies(self, name: str) -> FrozenSet[str]:
+        """
+        Fields read by field `name` when it was computed
+        """
+        with self._lock:
+            return frozenset(self._dependencies.get(name, ()))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Every key with its value, computing the missing ones
+        """
+        return {key: self[key] for key in self}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(computed={sorted(self.computed)})"
@@ -1,5 +1,28 @@
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional, Union
+
+from .columnar import DetectionColumns, Nullable, TYPE_CODES
+from .rmq import RangeExtremaIndex
+
+LIQUIDITY_SWEEP_LAYOUT = (('index', 'index'), ('type', 'type'), ('level', 'price'), ('candle_index', 'index'),
+                          ('wick_size', 'wick_size'))
+LIQUIDITY_ZONE_LAYOUT = (('index', 'index'), ('type', 'type'), ('level', 'price'), ('strength', 'strength'))
+UNUSUAL_VOLUME_LAYOUT = (('index', 'index'), ('volume', 'volume'), ('avg_volume', 'avg_volume'),
+                         ('ratio', 'ratio'), ('type', 'type'))
+LIQUIDITY_POOL_LAYOUT = (('index', 'index'), ('type', 'type'), ('level', 'price'), ('high', 'high'), ('low', 'low'),
+                         ('touches', 'touches'), ('first_index', 'first_index'), ('swept', 'swept'),
+                         ('sweep_index', Nullable('sweep_index', 'swept')))
+
+# Bars scanned around each swing: [index - 5, index + 5)
+SWEEP_OFFSETS = np.arange(-5, 5)
+
+
+def _swing_arrays(swings: Union[List[Dict], DetectionColumns]):
+    if isinstance(swings, DetectionColumns):
+        return swings.index, swings.price
+    index = np.array([swing['index'] for swing in swings], dtype=np.int64)
+    price = np.array([swing['price'] for swing in swings], dtype=np.float64)
+    return index, price
 
 
 class LiquidityDetector:
@@ -7,72 +30,176 @@ class LiquidityDetector:
     Detects liquidity sweeps in price action
     """
     
-    def detect_liquidity_sweeps(self, highs: np.ndarray, lows: np.ndarray, swing_highs: List[Dict], swing_lows: List[Dict]) -> List[Dict]:
+    def detect_liquidity_sweeps(self, highs: np.ndarray, lows: np.ndarray,
+                                swing_highs: Union[List[Dict], DetectionColumns],
+                                swing_lows: Union[List[Dict], DetectionColumns],
+                                columnar: bool = False) -> Union[List[Dict], DetectionColumns]:
         """
         Detect liquidity sweeps at swing points
         Liquidity sweeps happen when price moves to grab stop losses at key levels
+        
+        A candle within 5 bars of several swings produces one event per side,
+        against the furthest level it swept (highest swing high above /
+        lowest swing low below). Events are ordered by candle.
         """
-        liquidity_sweeps = []
-        
-        # Check for liquidity sweeps at swing highs (bullish sweeps)
-        for swing in swing_highs:
-            # Look for wicks extending above the swing high (potential liquidity grab)
-            for i in range(max(0, swing['index'] - 5), min(len(highs), swing['index'] + 5)):
-                if highs[i] > swing['price'] and lows[i] < swing['price']:
-                    # This candle formed a wick above the swing high, possibly sweeping liquidity
-                    liquidity_sweeps.append({
-                        'index': i,
-                        'type': 'bullish_liquidity_sweep',
-                        'level': swing['price'],
-                        'candle_index': i,
-                        'wick_size': highs[i] - swing['price']
-                    })
-        
-        # Check for liquidity sweeps at swing lows (bearish sweeps)
-        for swing in swing_lows:
-            # Look for wicks extending below the swing low (potential liquidity grab)
-            for i in range(max(0, swing['index'] - 5), min(len(lows), swing['index'] + 5)):
-                if lows[i] < swing['price'] and highs[i] > swing['price']:
-                    # This candle formed a wick below the swing low, possibly sweeping liquidity
-                    liquidity_sweeps.append({
-                        'index': i,
-                        'type': 'bearish_liquidity_sweep',
-                        'level': swing['price'],
-                        'candle_index': i,
-                        'wick_size': swing['price'] - lows[i]
-                    })
-        
-        return liquidity_sweeps
+        highs = np.asarray(highs, dtype=np.float64)
+        lows = np.asarray(lows, dtype=np.float64)
+        
+        # Wicks extending above the swing highs (bullish sweeps)
+        bullish = self._sweeps('bullish_liquidity_sweep', highs, lows, *_swing_arrays(swing_highs))
+        
+        # Wicks extending below the swing lows (bearish sweeps)
+        bearish = self._sweeps('bearish_liquidity_sweep', highs, lows, *_swing_arrays(swing_lows))
+        
+        liquidity_sweeps = DetectionColumns.concatenate([bullish, bearish])
+        return liquidity_sweeps if columnar else liquidity_sweeps.to_dicts()
     
-    def detect_liquidity_zones(self, highs: np.ndarray, lows: np.ndarray, lookback: int = 20) -> List[Dict]:
+    def _sweeps(self, type_name: str, highs: np.ndarray, lows: np.ndarray, swing_index: np.ndarray,
+                swing_price: np.ndarray) -> DetectionColumns:
+        # (swings x offsets) candle grid, clipped to the series
+        candles = swing_index[:, None] + SWEEP_OFFSETS[None, :]
+        inside = (candles >= 0) & (candles < len(highs))
+        candles = np.where(inside, candles, 0)
+        levels = np.broadcast_to(swing_price[:, None], candles.shape)
+        swept = inside & (highs[candles] > levels) & (lows[candles] < levels)
+        
+        candles, levels = candles[swept], levels[swept]
+        bullish = type_name.startswith('bullish')
+        # Keep the furthest level per candle: sort by candle, then level
+        order = np.lexsort((-levels if bullish else levels, candles))
+        candles, levels = candles[order], levels[order]
+        first = np.ones(len(candles), dtype=bool)
+        first[1:] = candles[1:] != candles[:-1]
+        candles, levels = candles[first], levels[first]
+        
+        wick_size = highs[candles] - levels if bullish else levels - lows[candles]
+        return DetectionColumns.of_type(type_name, candles, LIQUIDITY_SWEEP_LAYOUT, price=levels,
+                                        extra={'wick_size': wick_size})
+    
+    def detect_liquidity_zones(self, highs: np.ndarray, lows: np.ndarray, lookback: int = 20,
+                               columnar: bool = False) -> Union[List[Dict], DetectionColumns]:
         """
         Detect potential liquidity zones based on large wicks/levels that attracted orders
         """
-        liquidity_zones = []
-        
-        for i in range(lookback, len(highs)):
-            # Look for candles with large wicks (potential liquidity areas)
-            body_size = abs(highs[i] - lows[i])
-            upper_wick = highs[i] - max(highs[i], lows[i])
-            lower_wick = min(highs[i], lows[i]) - lows[i]
-            
-            # If wick is significantly larger than body, it may have attracted liquidity
-            if body_size > 0 and (upper_wick / body_size) > 2:
-                liquidity_zones.append({
-                    'index': i,
-                    'type': 'upper_liquidity_zone',
-                    'level': highs[i],
-                    'strength': upper_wick / body_size
-                })
-            elif body_size > 0 and (lower_wick / body_size) > 2:
-                liquidity_zones.append({
-                    'index': i,
-                    'type': 'lower_liquidity_zone',
-                    'level': lows[i],
-                    'strength': lower_wick / body_size
-                })
-        
-        return liquidity_zones
+        highs = np.asarray(highs, dtype=np.float64)[lookback:]
+        lows = np.asarray(lows, dtype=np.float64)[lookback:]
+        
+        # Look for candles with large wicks (potential liquidity areas)
+        body_size = np.abs(highs - lows)
+        upper_wick = highs - np.where(lows > highs, lows, highs)
+        lower_wick = np.where(lows < highs, lows, highs) - lows
+        with np.errstate(divide='ignore', invalid='ignore'):
+            upper_ratio = upper_wick / body_size
+            lower_ratio = lower_wick / body_size
+        
+        # If wick is significantly larger than body, it may have attracted liquidity
+        upper = (body_size > 0) & (upper_ratio > 2)
+        lower = (body_size > 0) & ~upper & (lower_ratio > 2)
+        
+        zone = upper | lower
+        index = np.flatnonzero(zone)
+        is_upper = upper[index]
+        type_code = np.where(is_upper, TYPE_CODES['upper_liquidity_zone'], TYPE_CODES['lower_liquidity_zone'])
+        liquidity_zones = DetectionColumns(index + lookback, type_code, LIQUIDITY_ZONE_LAYOUT,
+                                           price=np.where(is_upper, highs[index], lows[index]),
+                                           extra={'strength': np.where(is_upper, upper_ratio[index],
+                                                                       lower_ratio[index])})
+        return liquidity_zones if columnar else liquidity_zones.to_dicts()
+
+
+def average_true_range(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, period: int = 14) -> np.ndarray:
+    """
+    Mean true range of the last `period` bars at every bar (fewer at the
+    start of the series), from one cumulative sum. Non-finite true ranges
+    are left out of the mean.
+    """
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    closes = np.asarray(closes, dtype=np.float64)
+    prev_close = np.concatenate(([np.nan], closes[:-1]))
+    true_range = np.fmax(highs - lows, np.fmax(np.abs(highs - prev_close), np.abs(lows - prev_close)))
+    finite = np.isfinite(true_range)
+    totals = np.concatenate(([0.0], np.cumsum(np.where(finite, true_range, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(finite)))
+    stop = np.arange(1, len(true_range) + 1)
+    start = np.maximum(stop - period, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (totals[stop] - totals[start]) / (counts[stop] - counts[start])
+
+
+class LiquidityPoolDetector:
+    """
+    Detects equal highs and equal lows: swings resting at about the same
+    price, where stop orders (liquidity) pile up
+    """
+    
+    def __init__(self, tolerance: float = 0.1, atr_period: int = 14, min_touches: int = 2):
+        self.tolerance = tolerance
+        self.atr_period = atr_period
+        self.min_touches = min_touches
+    
+    def detect_liquidity_pools(self, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray,
+                               swing_highs: Union[List[Dict], DetectionColumns],
+                               swing_lows: Union[List[Dict], DetectionColumns], columnar: bool = False,
+                               rmq: Optional[RangeExtremaIndex] = None) -> Union[List[Dict], DetectionColumns]:
+        """
+        Cluster swing highs (and swing lows) whose prices are within
+        `tolerance` x ATR of each other. Swings are sorted by price once and
+        neighbours closer than the tolerance are chained into one pool, so
+        the whole pass is O(n log n) instead of comparing every pair.
+        
+        A pool needs `min_touches` swings. It is reported at its last touch,
+        with the level stops rest beyond (highest high / lowest low), and is
+        swept once a later bar trades beyond that level.
+        """
+        highs = np.asarray(highs, dtype=np.float64)
+        lows = np.asarray(lows, dtype=np.float64)
+        if rmq is None:
+            rmq = RangeExtremaIndex(highs, lows)
+        atr = average_true_range(highs, lows, closes, self.atr_period)
+        
+        equal_highs = self._pools('equal_highs', atr, rmq, *_swing_arrays(swing_highs))
+        equal_lows = self._pools('equal_lows', atr, rmq, *_swing_arrays(swing_lows))
+        
+        liquidity_pools = DetectionColumns.concatenate([equal_highs, equal_lows])
+        return liquidity_pools if columnar else liquidity_pools.to_dicts()
+    
+    def _pools(self, type_name: str, atr: np.ndarray, rmq: RangeExtremaIndex, swing_index: np.ndarray,
+               swing_price: np.ndarray) -> DetectionColumns:
+        usable = np.isfinite(swing_price) & np.isfinite(atr[swing_index])
+        swing_index, swing_price = swing_index[usable], swing_price[usable]
+        order = np.argsort(swing_price, kind='stable')
+        index, price = swing_index[order], swing_price[order]
+        
+        # A new pool starts wherever the gap to the next price is wider than
+        # the tolerance of the calmer of the two swings
+        tolerance = self.tolerance * atr[index]
+        gap = np.diff(price) > np.minimum(tolerance[1:], tolerance[:-1])
+        starts = np.flatnonzero(np.concatenate(([True], gap))) if len(price) else np.zeros(0, dtype=np.int64)
+        touches = np.diff(np.append(starts, len(price)))
+        if len(starts):
+            top = np.maximum.reduceat(price, starts)
+            bottom = np.minimum.reduceat(price, starts)
+            last = np.maximum.reduceat(index, starts)
+            first = np.minimum.reduceat(index, starts)
+        else:
+            top = bottom = np.zeros(0)
+            last = first = np.zeros(0, dtype=np.int64)
+        
+        keep = touches >= self.min_touches
+        touches, top, bottom, last, first = touches[keep], top[keep], bottom[keep], last[keep], first[keep]
+        
+        bullish = type_name == 'equal_highs'
+        level = top if bullish else bottom
+        sweep_index = (rmq.first_high_above(last + 1, level) if bullish
+                       else rmq.first_low_below(last + 1, level))
+        sweep_index = np.atleast_1d(sweep_index).astype(np.int64)
+        
+        chronological = np.argsort(last, kind='stable')
+        pools = DetectionColumns.of_type(type_name, last, LIQUIDITY_POOL_LAYOUT, price=level, high=top, low=bottom,
+                                         extra={'touches': touches, 'first_index': first,
+                                                'swept': sweep_index >= 0, 'sweep_index': sweep_index})
+        return pools.take(chronological)
 
 
 class UnusualVolumeDetector:
@@ -80,25 +207,33 @@ class UnusualVolumeDetector:
     Detects unusual volume patterns that may indicate institutional activity
     """
     
-    def detect_unusual_volume(self, volumes: np.ndarray, lookback: int = 20, threshold: float = 1.5) -> List[Dict]:
+    def detect_unusual_volume(self, volumes: np.ndarray, lookback: int = 20, threshold: float = 1.5,
+                              columnar: bool = False) -> Union[List[Dict], DetectionColumns]:
         """
-        Detect unusually high volume bars that may indicate institutional interest
+        Detect unusually high volume bars that may indicate institutional interest.
+        The trailing mean of the previous `lookback` bars comes from one
+        cumulative sum, so the whole series is a single O(n) pass.
         """
-        unusual_volume = []
-        
-        if len(volumes) < lookback:
-            return unusual_volume
-        
-        for i in range(lookback, len(volumes)):
-            avg_volume = np.mean(volumes[i-lookback:i])
-            
-            if avg_volume > 0 and (volumes[i] / avg_volume) > threshold:
-                unusual_volume.append({
-                    'index': i,
-                    'volume': volumes[i],
-                    'avg_volume': avg_volume,
-                    'ratio': volumes[i] / avg_volume,
-                    'type': 'unusual_volume'
-                })
-        
-        return unusual_volume
\ No newline at end of file
+        volumes = np.asarray(volumes, dtype=np.float64)
+        
+        if lookback <= 0 or len(volumes) <= lookback:
+            index = np.zeros(0, dtype=np.int64)
+            avg_volume = np.zeros(0)
+        else:
+            # Non-finite volumes would poison every later prefix sum; sum them
+            # as 0 and blank only the windows that contain one
+            finite = np.isfinite(volumes)
+            totals = np.concatenate(([0.0], np.cumsum(np.where(finite, volumes, 0.0))))
+            missing = np.concatenate(([0], np.cumsum(~finite)))
+            avg_volume = (totals[lookback:-1] - totals[:-lookback - 1]) / lookback
+            avg_volume[missing[lookback:-1] != missing[:-lookback - 1]] = np.nan
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ratio = volumes[lookback:] / avg_volume
+            index = np.flatnonzero((avg_volume > 0) & (ratio > threshold))
+            avg_volume = avg_volume[index]
+            index = index + lookback
+        
+        unusual_volume = DetectionColumns.of_type('unusual_volume', index, UNUSUAL_VOLUME_LAYOUT,
+                                                  extra={'volume': volumes[index], 'avg_volume': avg_volume,
+                                                         'ratio': volumes[index] / avg_volume})
+        return unusual_volume if columnar else unusual_volume.to_dicts()
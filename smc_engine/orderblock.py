@@ -1,5 +1,31 @@
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional, Union
+
+from .backend import get_backend
+from .columnar import DetectionColumns
+from .zones import ZoneStore
+
+ORDER_BLOCK_LAYOUT = (('index', 'index'), ('type', 'type'), ('high', 'high'), ('low', 'low'),
+                      ('mid_price', 'mid_price'), ('strength', 'strength'))
+INSIDE_BAR_LAYOUT = (('index', 'index'), ('high', 'high'), ('low', 'low'), ('type', 'type'))
+MOTHER_BAR_LAYOUT = (('index', 'index'), ('high', 'high'), ('low', 'low'), ('type', 'type'),
+                     ('range_ratio', 'range_ratio'))
+
+
+def _swing_index(swings: Union[List[Dict], DetectionColumns]) -> np.ndarray:
+    if isinstance(swings, DetectionColumns):
+        return swings.index
+    return np.array([swing['index'] for swing in swings], dtype=np.int64)
+
+
+def _larger(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    # Element-wise built-in max(first, second), NaN handling included
+    return np.where(second > first, second, first)
+
+
+def _smaller(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    # Element-wise built-in min(first, second)
+    return np.where(second < first, second, first)
 
 
 class OrderBlockDetector:
@@ -7,67 +33,65 @@ class OrderBlockDetector:
     Detects Order Blocks in price action
     """
     
-    def detect_order_blocks(self, highs: np.ndarray, lows: np.ndarray, swing_highs: List[Dict], swing_lows: List[Dict]) -> List[Dict]:
+    def __init__(self, backend: Optional[str] = None):
+        self.kernels = get_backend(backend)
+    
+    def detect_order_blocks(self, highs: np.ndarray, lows: np.ndarray,
+                            swing_highs: Union[List[Dict], DetectionColumns],
+                            swing_lows: Union[List[Dict], DetectionColumns],
+                            columnar: bool = False,
+                            store: Optional[ZoneStore] = None) -> Union[List[Dict], DetectionColumns]:
         """
-        Detect potential order blocks based on swing points
+        Detect potential order blocks based on swing points.
+        Every pair of consecutive swings is processed at once; swings may
+        be dicts or DetectionColumns. The blocks are also added to `store`
+        when one is given.
         """
-        order_blocks = []
+        highs = np.asarray(highs, dtype=np.float64)
+        lows = np.asarray(lows, dtype=np.float64)
         
-        # Look for order blocks after swing highs/lows that held as support/resistance
-        for i, swing in enumerate(swing_highs):
-            if i > 0:
-                # Potential bearish order block after a swing high that acted as resistance
-                prev_swing = swing_highs[i-1]
-                
-                # Calculate the block as the range around the swing high
-                block_high = max(swing['high'], prev_swing['high'])
-                block_low = min(swing['high'], prev_swing['high']) - (max(swing['high'], prev_swing['high']) - min(swing['high'], prev_swing['high'])) * 0.3
-                block_low = max(block_low, min(swing['low'], prev_swing['low']))  # Ensure block doesn't go below the lows
-                
-                order_blocks.append({
-                    'index': swing['index'],
-                    'type': 'bearish_order_block',
-                    'high': block_high,
-                    'low': block_low,
-                    'mid_price': (block_high + block_low) / 2,
-                    'strength': self._calculate_ob_strength(highs, lows, swing['index'])
-                })
+        # Bearish order blocks after a swing high that acted as resistance
+        high_idx = _swing_index(swing_highs)
+        current, previous = high_idx[1:], high_idx[:-1]
+        top = _larger(highs[current], highs[previous])
+        bottom = _smaller(highs[current], highs[previous])
+        bearish_high = top
+        bearish_low = bottom - (top - bottom) * 0.3
+        # Ensure block doesn't go below the lows
+        bearish_low = _larger(bearish_low, _smaller(lows[current], lows[previous]))
+        bearish = self._blocks('bearish_order_block', current, bearish_high, bearish_low, highs, lows)
         
-        for i, swing in enumerate(swing_lows):
-            if i > 0:
-                # Potential bullish order block after a swing low that acted as support
-                prev_swing = swing_lows[i-1]
-                
-                # Calculate the block as the range around the swing low
-                block_low = min(swing['low'], prev_swing['low'])
-                block_high = max(swing['low'], prev_swing['low']) + (min(swing['low'], prev_swing['low']) - max(swing['low'], prev_swing['low'])) * 0.3
-                block_high = min(block_high, max(swing['high'], prev_swing['high']))  # Ensure block doesn't go above the highs
-                
-                order_blocks.append({
-                    'index': swing['index'],
-                    'type': 'bullish_order_block',
-                    'high': block_high,
-                    'low': block_low,
-                    'mid_price': (block_high + block_low) / 2,
-                    'strength': self._calculate_ob_strength(highs, lows, swing['index'])
-                })
+        # Bullish order blocks after a swing low that acted as support
+        low_idx = _swing_index(swing_lows)
+        current, previous = low_idx[1:], low_idx[:-1]
+        bottom = _smaller(lows[current], lows[previous])
+        top = _larger(lows[current], lows[previous])
+        bullish_low = bottom
+        bullish_high = top + (bottom - top) * 0.3
+        # Ensure block doesn't go above the highs
+        bullish_high = _smaller(bullish_high, _larger(highs[current], highs[previous]))
+        bullish = self._blocks('bullish_order_block', current, bullish_high, bullish_low, highs, lows)
         
-        return order_blocks
+        order_blocks = DetectionColumns.concatenate([bearish, bullish])
+        if store is not None:
+            store.add(order_blocks)
+        return order_blocks if columnar else order_blocks.to_dicts()
+    
+    def _blocks(self, type_name: str, index: np.ndarray, block_high: np.ndarray, block_low: np.ndarray,
+                highs: np.ndarray, lows: np.ndarray) -> DetectionColumns:
+        strength = self._calculate_ob_strength(highs, lows, index)
+        return DetectionColumns.of_type(type_name, index, ORDER_BLOCK_LAYOUT, high=block_high, low=block_low,
+                                        extra={'mid_price': (block_high + block_low) / 2,
+                                               'strength': strength})
     
-    def _calculate_ob_strength(self, highs: np.ndarray, lows: np.ndarray, swing_index: int, lookback: int = 10) -> float:
+    def _calculate_ob_strength(self, highs: np.ndarray, lows: np.ndarray, swing_index, lookback: int = 10):
         """
-        Calculate the strength of an order block based on how many times it has been tested
+        Calculate the strength of an order block based on how many times it has been tested.
+        Accepts one swing index or an array of them.
         """
-        if swing_index < lookback:
-            return 0.0
-        
-        # Count how many times price tested the level in the recent past
-        test_count = 0
-        for i in range(max(0, swing_index-lookback), swing_index):
-            if highs[i] > lows[swing_index] and lows[i] < highs[swing_index]:
-                test_count += 1
-        
-        return min(1.0, test_count / 5.0)  # Normalize to 0-1 scale
+        test_count = self.kernels.prior_overlap_counts(highs, lows, np.atleast_1d(swing_index), lookback)
+        strength = np.minimum(1.0, test_count / 5.0)  # Normalize to 0-1 scale
+        return strength if np.ndim(swing_index) else float(strength[0])
 
 
 class InsideBarDetector:
@@ -75,22 +99,19 @@ class InsideBarDetector:
     Detects inside bars which can indicate consolidation
     """
     
-    def detect_inside_bars(self, highs: np.ndarray, lows: np.ndarray) -> List[Dict]:
+    def detect_inside_bars(self, highs: np.ndarray, lows: np.ndarray,
+                           columnar: bool = False) -> Union[List[Dict], DetectionColumns]:
         """
         Detect inside bars (bars completely within the range of previous bar)
         """
-        inside_bars = []
-        
-        for i in range(1, len(highs)):
-            if highs[i] <= highs[i-1] and lows[i] >= lows[i-1]:
-                inside_bars.append({
-                    'index': i,
-                    'high': highs[i],
-                    'low': lows[i],
-                    'type': 'inside_bar'
-                })
+        highs = np.asarray(highs, dtype=np.float64)
+        lows = np.asarray(lows, dtype=np.float64)
         
-        return inside_bars
+        inside = (highs[1:] <= highs[:-1]) & (lows[1:] >= lows[:-1])
+        index = np.flatnonzero(inside) + 1
+        inside_bars = DetectionColumns.of_type('inside_bar', index, INSIDE_BAR_LAYOUT,
+                                               high=highs[index], low=lows[index])
+        return inside_bars if columnar else inside_bars.to_dicts()
 
 
 class MotherBarDetector:
@@ -98,23 +119,22 @@ class MotherBarDetector:
     Detects mother bars which can indicate significant market moves
     """
     
-    def detect_mother_bars(self, highs: np.ndarray, lows: np.ndarray, min_ratio: float = 1.5) -> List[Dict]:
+    def detect_mother_bars(self, highs: np.ndarray, lows: np.ndarray, min_ratio: float = 1.5,
+                           columnar: bool = False) -> Union[List[Dict], DetectionColumns]:
         """
         Detect mother bars (significantly larger bars that may contain inside bars)
         """
-        mother_bars = []
+        highs = np.asarray(highs, dtype=np.float64)
+        lows = np.asarray(lows, dtype=np.float64)
         
-        for i in range(1, len(highs)):
-            current_range = highs[i] - lows[i]
-            prev_range = highs[i-1] - lows[i-1]
-            
-            if prev_range > 0 and (current_range / prev_range) >= min_ratio:
-                mother_bars.append({
-                    'index': i-1,  # Previous bar is the mother bar
-                    'high': highs[i-1],
-                    'low': lows[i-1],
-                    'type': 'mother_bar',
-                    'range_ratio': current_range / prev_range
-                })
+        ranges = highs - lows
+        current_range, prev_range = ranges[1:], ranges[:-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = current_range / prev_range
+        mother = (prev_range > 0) & (ratio >= min_ratio)
         
-        return mother_bars
\ No newline at end of file
+        # Previous bar is the mother bar
+        index = np.flatnonzero(mother)
+        mother_bars = DetectionColumns.of_type('mother_bar', index, MOTHER_BAR_LAYOUT, high=highs[index],
+                                               low=lows[index], extra={'range_ratio': ratio[index]})
+        return mother_bars if columnar else mother_bars.to_dicts()
@@ -0,0 +1,146 @@
+import heapq
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Iterable, List
+
+from .resume import window_overlap
+from .zones import ZoneStore, mitigation_level
+
+
+class _SymbolZones:
+    """
+    Zones of one symbol/timeframe, indexed by absolute bar (bars since the
+    first window), and the last window they were updated with
+    """
+    __slots__ = ('store', 'highs', 'lows', 'offset', 'seen', 'seen_order')
+
+    def __init__(self):
+        self.store = ZoneStore()
+        self.highs = np.zeros(0)
+        self.lows = np.zeros(0)
+        # Absolute bar of the first bar of the last window
+        self.offset = 0
+        # (type, bar) of every zone already registered while it can still
+        # be re-detected, with a heap to drop those that left the window
+        self.seen = set()
+        self.seen_order = []
+
+
+class ZoneRegistry:
+    """
+    Long-lived FVG and order block zones per symbol/timeframe.
+
+    Each request's window is aligned with the previous one (see
+    smc_engine.resume.window_overlap). Only the candles past the previous
+    window are applied to the stored zones, which touches or mitigates them
+    through the ZoneStore's sorted levels, so an update costs the new candles
+    plus the zones they affect rather than the whole window. Zones detected
+    for the first time are checked against the candles after them and
+    registered; mitigated zones and zones older than `max_age` bars are
+    evicted. A window that does not overlap the previous one starts over.
+    """
+
+    def __init__(self, max_symbols: int = 256, min_overlap: int = 32, max_age: int = 1000):
+        self.max_symbols = max_symbols
+        self.min_overlap = min_overlap
+        self.max_age = max_age
+        self._symbols: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.added = 0
+        self.touched = 0
+        self.mitigated = 0
+        self.expired = 0
+        self.resets = 0
+
+    def update(self, key, highs, lows, zones: Iterable[Dict]) -> List[Dict]:
+        """
+        Apply the window of `key` and the zones detected in it (indices
+        relative to the window). Returns the active zones, indexed relative
+        to this window (negative when formed before it), with a 'touched' flag.
+        """
+        highs = np.array(highs, dtype=np.float64)
+        lows = np.array(lows, dtype=np.float64)
+        with self._lock:
+            state = self._symbols.get(key)
+            if state is None:
+                state = _SymbolZones()
+            self._symbols[key] = state
+            self._symbols.move_to_end(key)
+            while len(self._symbols) > self.max_symbols:
+                self._symbols.popitem(last=False)
+
+            shift, shared = window_overlap(state.highs, state.lows, highs, lows, self.min_overlap)
+            if shared:
+                # New bars: past the old window, or from the first re-sent bar that changed
+                state.offset += shift
+                self.touched += len(state.store.touch(highs[shared:], lows[shared:]))
+                self.mitigated += len(state.store.mitigate(highs[shared:], lows[shared:]))
+            else:
+                if len(state.highs):
+                    self.resets += 1
+                offset = state.offset + len(state.highs)
+                state = self._symbols[key] = _SymbolZones()
+                state.offset = offset
+            state.highs, state.lows = highs, lows
+
+            self._register(state, zones, highs, lows)
+            end = state.offset + len(highs)
+            self.expired += len(state.store.expire(end - self.max_age))
+            while state.seen_order and state.seen_order[0][0] < state.offset:
+                state.seen.discard(heapq.heappop(state.seen_order)[1])
+
+            return [{**zone, 'index': zone['index'] - state.offset} for zone in state.store.active()]
+
+    def _register(self, state: _SymbolZones, zones: Iterable[Dict], highs: np.ndarray, lows: np.ndarray):
+        added = []
+        for zone in zones:
+            zone = zone.to_dict() if hasattr(zone, 'to_dict') else dict(zone)
+            key = (zone['type'], state.offset + zone['index'])
+            if key in state.seen:
+                continue
+            state.seen.add(key)
+            heapq.heappush(state.seen_order, (key[1], key))
+
+            # Candles after the zone within this window decide its state so
+            # far; an FVG's index is its middle candle, and the third candle
+            # bounds the gap, so its scan starts one bar later (as in detect_fvg)
+            first = zone['index'] + (2 if zone['type'].endswith('_fvg') else 1)
+            after = slice(first, len(highs))
+            level = mitigation_level(zone)
+            if zone['type'].startswith('bullish'):
+                reach = np.fmin.reduce(lows[after], initial=np.inf)
+                touched, mitigated = reach <= zone['high'], reach <= level
+            else:
+                reach = np.fmax.reduce(highs[after], initial=-np.inf)
+                touched, mitigated = reach >= zone['low'], reach >= level
+            if mitigated:
+                self.mitigated += 1
+                continue
+            zone.update(index=key[1], touched=bool(touched))
+            added.append(zone)
+        if added:
+            self.added += len(added)
+            state.store.add(added)
+
+    def forget(self, key=None) -> None:
+        """
+        Drop the zones of `key`, or of every symbol
+        """
+        with self._lock:
+            if key is None:
+                self._symbols.clear()
+            else:
+                self._symbols.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'symbols': len(self._symbols),
+                'zones': sum(len(state.store) for state in self._symbols.values()),
+                'added': self.added,
+                'touched': self.touched,
+                'mitigated': self.mitigated,
+                'expired': self.expired,
+                'resets': self.resets
+            }
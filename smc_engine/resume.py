@@ -0,0 +1,154 @@
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Iterable, Tuple
+
+from .kernels import swing_indices
+
+
+def window_overlap(old_highs: np.ndarray, old_lows: np.ndarray, highs: np.ndarray, lows: np.ndarray,
+                   min_overlap: int = 32) -> Tuple[int, int]:
+    """
+    Best (shift, shared) such that bars [0, shared) of the new window equal
+    bars [shift, shift + shared) of the old one; (0, 0) when fewer than
+    `min_overlap` bars match
+    """
+    best_shift, best_shared = 0, 0
+    if len(highs) == 0:
+        return best_shift, best_shared
+    # Candidate shifts are the old positions of the new first bar
+    candidates = np.flatnonzero((old_highs == highs[0]) & (old_lows == lows[0]))
+    for shift in candidates.tolist():
+        length = min(len(old_highs) - shift, len(highs))
+        if length <= best_shared:
+            continue
+        same = (old_highs[shift:shift + length] == highs[:length]) & (old_lows[shift:shift + length] == lows[:length])
+        differ = np.flatnonzero(~same)
+        shared = int(differ[0]) if len(differ) else length
+        if shared > best_shared:
+            best_shift, best_shared = shift, shared
+    if best_shared < min_overlap:
+        return 0, 0
+    return best_shift, best_shared
+
+
+class _WindowState:
+    """
+    Highs/lows of the last analyzed window of one symbol and the swing
+    indices found in it, keyed by lookback
+    """
+    __slots__ = ('highs', 'lows', 'extrema')
+
+    def __init__(self, highs: np.ndarray, lows: np.ndarray, extrema: Dict[int, Tuple[np.ndarray, np.ndarray]]):
+        self.highs = highs
+        self.lows = lows
+        self.extrema = extrema
+
+
+class PrefixResumer:
+    """
+    Reuses swing detection between consecutive windows of the same symbol.
+
+    Production requests are usually the previous window shifted by a candle
+    or two. A bar's swing status only depends on the bars within `lookback`
+    of it, so every swing whose whole neighbourhood lies in the region shared
+    with the previous window is kept (re-indexed by the shift). Only the bars
+    within `lookback` of the first differing bar, which covers a re-sent
+    forming candle, and the new tail are re-scanned. The shared region is
+    verified bar by bar on highs and lows; if no shift matches, the window is
+    analyzed from scratch. Results are identical to a full analysis.
+    Windows without a key (anonymous requests) are analyzed from scratch and
+    not stored, so unrelated clients don't evict each other's windows.
+    """
+
+    def __init__(self, max_symbols: int = 256, min_overlap: int = 32):
+        self.max_symbols = max_symbols
+        self.min_overlap = min_overlap
+        self._windows: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.resumed = 0
+        self.full = 0
+        self.anonymous = 0
+        self.reused_bars = 0
+
+    def extrema(self, key, highs: np.ndarray, lows: np.ndarray,
+                lookbacks: Iterable[int]) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        """
+        (high, low) swing indices of this window for every lookback, reusing
+        the previous window stored under `key` where it overlaps
+        """
+        highs = np.array(highs, dtype=np.float64)
+        lows = np.array(lows, dtype=np.float64)
+        with self._lock:
+            state = self._windows.get(key)
+
+        shift, shared = self._overlap(state, highs, lows) if state is not None else (0, 0)
+        extrema = {}
+        for lookback in set(lookbacks):
+            previous = state.extrema.get(lookback) if shared else None
+            if previous is None:
+                extrema[lookback] = swing_indices(highs, lows, lookback)
+            else:
+                extrema[lookback] = self._resume(previous, highs, lows, lookback, shift, shared)
+
+        with self._lock:
+            if shared:
+                self.resumed += 1
+                self.reused_bars += shared
+            else:
+                self.full += 1
+            self._windows[key] = _WindowState(highs, lows, extrema)
+            self._windows.move_to_end(key)
+            while len(self._windows) > self.max_symbols:
+                self._windows.popitem(last=False)
+        return extrema
+
+    def analyze(self, engine, key, open, high, low, close, volume=None, **kwargs) -> Dict:
+        """
+        `engine.analyze_arrays` with swing detection resumed from the
+        previous window of `key`; without a key, a plain full analysis
+        """
+        if key is None:
+            with self._lock:
+                self.anonymous += 1
+            return engine.analyze_arrays(open, high, low, close, volume, **kwargs)
+        extrema = self.extrema(key, high, low, engine.extrema_lookbacks)
+        return engine.analyze_arrays(open, high, low, close, volume, extrema=extrema, **kwargs)
+
+    def _overlap(self, state: _WindowState, highs: np.ndarray, lows: np.ndarray) -> Tuple[int, int]:
+        return window_overlap(state.highs, state.lows, highs, lows, self.min_overlap)
+
+    @staticmethod
+    def _resume(previous: Tuple[np.ndarray, np.ndarray], highs: np.ndarray, lows: np.ndarray,
+                lookback: int, shift: int, shared: int) -> Tuple[np.ndarray, np.ndarray]:
+        # Bars i with i - lookback >= 0 and i + lookback < shared saw exactly
+        # the same neighbourhood in the previous window
+        start = max(0, shared - 2 * lookback)
+        high_tail, low_tail = swing_indices(highs[start:], lows[start:], lookback)
+
+        def merge(old, tail):
+            old = old - shift
+            kept = old[(old >= lookback) & (old + lookback < shared)]
+            return np.concatenate([kept, tail + start])
+
+        return merge(previous[0], high_tail), merge(previous[1], low_tail)
+
+    def forget(self, key=None) -> None:
+        """
+        Drop the stored window of `key`, or of every symbol
+        """
+        with self._lock:
+            if key is None:
+                self._windows.clear()
+            else:
+                self._windows.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'symbols': len(self._windows),
+                'resumed': self.resumed,
+                'full': self.full,
+                'anonymous': self.anonymous,
+                'reused_bars': self.reused_bars
+            }
@@ -0,0 +1,331 @@
+import numpy as np
+from typing import Dict, Tuple, Union
+
+from .kernels import _as_float_array
+
+Positions = Union[int, np.ndarray]
+
+
+class SparseTable:
+    """
+    Growable sparse table for idempotent range reductions (max/min).
+
+    Row k holds op(values[i:i + 2**k]) for every i where that range is
+    complete. Building n values costs O(n log n); any range [start, stop)
+    is then answered in O(1) from two overlapping power-of-two rows.
+    `extend` only fills the entries the new values complete, O(log n) per
+    appended value, so a table can follow a live series.
+    """
+
+    def __init__(self, op, fill: float, values=None, capacity: int = 64):
+        self._op = op
+        self._fill = fill
+        # Max tables (fill -inf) look for larger values, min tables for smaller
+        self._beyond = np.greater if fill < 0 else np.less
+        self._table = np.empty((max(capacity, 1).bit_length(), max(capacity, 1)))
+        self._size = 0
+        if values is not None:
+            self.extend(values)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._table[0, :self._size]
+
+    def _reserve(self, size: int):
+        levels, capacity = self._table.shape
+        if size <= capacity:
+            return
+        capacity = max(2 * capacity, size)
+        table = np.empty((capacity.bit_length(), capacity))
+        table[:levels, :self._size] = self._table[:, :self._size]
+        self._table = table
+
+    def extend(self, values):
+        values = _as_float_array(values)
+        old_size, size = self._size, self._size + len(values)
+        self._reserve(size)
+        table = self._table
+        table[0, old_size:size] = values
+
+        level = 1
+        while (1 << level) <= size:
+            half = 1 << (level - 1)
+            # Entries of this row that the new values complete
+            start = max(old_size - (1 << level) + 1, 0)
+            stop = size - (1 << level) + 1
+            previous = table[level - 1]
+            table[level, start:stop] = self._op(previous[start:stop], previous[start + half:stop + half])
+            level += 1
+        self._size = size
+
+    def append(self, value: float):
+        self.extend([value])
+
+    def query(self, start: Positions, stop: Positions) -> Union[float, np.ndarray]:
+        """
+        op over values[start:stop] for scalar or array bounds; empty ranges
+        give the fill value (-inf for max, +inf for min)
+        """
+        scalar = np.ndim(start) == 0 and np.ndim(stop) == 0
+        start, stop = np.broadcast_arrays(np.asarray(start, dtype=np.int64), np.asarray(stop, dtype=np.int64))
+        start = np.clip(start, 0, self._size)
+        stop = np.clip(stop, 0, self._size)
+        length = stop - start
+        empty = length <= 0
+        length = np.where(empty, 1, length)
+        # floor(log2(length)), exact for integers
+        level = np.frexp(length.astype(np.float64))[1] - 1
+        first = np.where(empty, 0, start)
+        second = np.where(empty, 0, stop - (1 << level))
+        result = self._op(self._table[level, first], self._table[level, second])
+        result = np.where(empty, self._fill, result)
+        return float(result) if scalar else result
+
+    def sliding(self, width: int) -> np.ndarray:
+        """
+        op over every full window values[k:k + width], k = 0 .. len - width.
+        All windows share one row, so this is two slices and one op.
+        """
+        count = self._size - width + 1
+        if width <= 0 or count <= 0:
+            return np.empty(0)
+        level = width.bit_length() - 1
+        row = self._table[level]
+        offset = width - (1 << level)
+        return self._op(row[:count], row[offset:offset + count])
+
+    def first_beyond(self, start: Positions, levels) -> Union[int, np.ndarray]:
+        """
+        First position k >= start whose value is strictly beyond its level
+        (above it for max tables, below it for min tables), -1 when there is
+        none. Binary descent over the rows: from the widest row down, skip
+        any block that stays within the level, so each query is O(log n).
+        """
+        scalar = np.ndim(start) == 0 and np.ndim(levels) == 0
+        start, levels = np.broadcast_arrays(np.asarray(start, dtype=np.int64), np.asarray(levels, dtype=np.float64))
+        position = np.clip(start, 0, self._size)
+        for level in range(self._size.bit_length() - 1, -1, -1):
+            step = 1 << level
+            fits = position + step <= self._size
+            block = self._table[level, np.where(fits, position, 0)]
+            # NaN blocks never cross, so test "not beyond" rather than "within"
+            position = position + np.where(fits & ~self._beyond(block, levels), step, 0)
+        found = np.where(position < self._size, position, -1)
+        return int(found) if scalar else found
+
+
+class MaxSegmentTree:
+    """
+    Range max with point updates, for sets that shrink (e.g. zones being
+    mitigated): set a slot to -inf to remove it. Besides O(log n) updates
+    it finds the first/last slot in a range whose value reaches a level by
+    descending only into subtrees whose max does.
+    """
+
+    def __init__(self, values):
+        values = _as_float_array(values)
+        self._size = len(values)
+        self._leaves = 1 << max(self._size - 1, 0).bit_length()
+        self._tree = np.full(2 * self._leaves, -np.inf)
+        self._tree[self._leaves:self._leaves + self._size] = values
+        for node in range(self._leaves - 1, 0, -1):
+            self._tree[node] = max(self._tree[2 * node], self._tree[2 * node + 1])
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, position: int) -> float:
+        return float(self._tree[self._leaves + position])
+
+    def update(self, position: int, value: float):
+        node = self._leaves + position
+        self._tree[node] = value
+        node //= 2
+        while node:
+            self._tree[node] = max(self._tree[2 * node], self._tree[2 * node + 1])
+            node //= 2
+
+    def first_at_least(self, start: int, stop: int, level: float) -> int:
+        """
+        First position in [start, stop) whose value is >= level, -1 if none
+        """
+        return self._find(1, 0, self._leaves, max(start, 0), min(stop, self._size), level, True)
+
+    def last_at_least(self, start: int, stop: int, level: float) -> int:
+        """
+        Last position in [start, stop) whose value is >= level, -1 if none
+        """
+        return self._find(1, 0, self._leaves, max(start, 0), min(stop, self._size), level, False)
+
+    def _find(self, node: int, lo: int, hi: int, start: int, stop: int, level: float, first: bool) -> int:
+        if hi <= start or stop <= lo or not self._tree[node] >= level:
+            return -1
+        if hi - lo == 1:
+            return lo
+        mid = (lo + hi) // 2
+        children = ((2 * node, lo, mid), (2 * node + 1, mid, hi))
+        for child, child_lo, child_hi in (children if first else children[::-1]):
+            found = self._find(child, child_lo, child_hi, start, stop, level, first)
+            if found >= 0:
+                return found
+        return -1
+
+
+class RangeExtremaIndex:
+    """
+    Range-max of highs and range-min of lows over one price series, built
+    once per analysis and shared by the detectors. Queries are half-open
+    bar ranges [start, stop) and NaNs are ignored like in the kernels.
+    Bars can be appended, so one index can follow a streaming series.
+    """
+
+    def __init__(self, highs=None, lows=None):
+        self._highs = SparseTable(np.fmax, -np.inf, highs)
+        self._lows = SparseTable(np.fmin, np.inf, lows)
+        if len(self._highs) != len(self._lows):
+            raise ValueError("highs and lows must have the same length")
+
+    def __len__(self) -> int:
+        return len(self._highs)
+
+    @property
+    def highs(self) -> np.ndarray:
+        return self._highs.values
+
+    @property
+    def lows(self) -> np.ndarray:
+        return self._lows.values
+
+    def append(self, high: float, low: float):
+        self._highs.append(high)
+        self._lows.append(low)
+
+    def extend(self, highs, lows):
+        if len(highs) != len(lows):
+            raise ValueError("highs and lows must have the same length")
+        self._highs.extend(highs)
+        self._lows.extend(lows)
+
+    def max_high(self, start: Positions, stop: Positions) -> Union[float, np.ndarray]:
+        return self._highs.query(start, stop)
+
+    def min_low(self, start: Positions, stop: Positions) -> Union[float, np.ndarray]:
+        return self._lows.query(start, stop)
+
+    def first_high_above(self, start: Positions, levels) -> Union[int, np.ndarray]:
+        """
+        First bar at or after `start` whose high is above each level, -1 if none
+        """
+        return self._highs.first_beyond(start, levels)
+
+    def first_low_below(self, start: Positions, levels) -> Union[int, np.ndarray]:
+        """
+        First bar at or after `start` whose low is below each level, -1 if none
+        """
+        return self._lows.first_beyond(start, levels)
+
+    def extrema_masks(self, lookback: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Same masks as kernels.centered_extrema_masks: element k flags bar
+        k + lookback as the (tie-inclusive) extreme of its centered window
+        """
+        window = 2 * lookback + 1
+        window_high = self._highs.sliding(window)
+        window_low = self._lows.sliding(window)
+        center = slice(lookback, lookback + len(window_high))
+        is_high = ~(self.highs[center] < window_high)
+        is_low = ~(self.lows[center] > window_low)
+        return is_high, is_low
+
+    def swing_indices(self, lookback: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Indices of swing highs and swing lows, in ascending order
+        """
+        is_high, is_low = self.extrema_masks(lookback)
+        return np.flatnonzero(is_high) + lookback, np.flatnonzero(is_low) + lookback
+
+    def nested_swing_indices(self, lookbacks) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Swing indices for several lookbacks in one pass. A swing of a wider
+        window is also a swing of every narrower one, so only the smallest
+        lookback scans all bars; each wider one re-tests just the survivors
+        of the previous scale with two O(1) range queries.
+        """
+        nested = {}
+        high_idx = low_idx = None
+        for lookback in sorted(set(lookbacks)):
+            if high_idx is None:
+                high_idx, low_idx = self.swing_indices(lookback)
+            else:
+                high_idx = high_idx[(high_idx >= lookback) & (high_idx + lookback < len(self))]
+                low_idx = low_idx[(low_idx >= lookback) & (low_idx + lookback < len(self))]
+                high_idx = high_idx[~(self.highs[high_idx] < self.max_high(high_idx - lookback,
+                                                                             high_idx + lookback + 1))]
+                low_idx = low_idx[~(self.lows[low_idx] > self.min_low(low_idx - lookback, low_idx + lookback + 1))]
+            nested[lookback] = (high_idx, low_idx)
+        return nested
+
+    def touched_after(self, start: Positions, levels, below: bool) -> np.ndarray:
+        """
+        Whether the lows (below=True) reach down to, or the highs reach up
+        to, each level anywhere in [start, len)
+        """
+        if below:
+            return self.min_low(start, len(self)) <= levels
+        return self.max_high(start, len(self)) >= levels
+
+
+class CloseCrossingIndex:
+    """
+    Range-max and range-min of closes, answering "first bar at or after
+    `start` that closes above / below a level" in O(log n) per level. This is
+    what turns a structure level into the bar that actually broke it.
+    """
+
+    def __init__(self, closes=None):
+        self._max = SparseTable(np.fmax, -np.inf, closes)
+        self._min = SparseTable(np.fmin, np.inf, closes)
+
+    def __len__(self) -> int:
+        return len(self._max)
+
+    @property
+    def closes(self) -> np.ndarray:
+        return self._max.values
+
+    def append(self, close: float):
+        self._max.append(close)
+        self._min.append(close)
+
+    def extend(self, closes):
+        self._max.extend(closes)
+        self._min.extend(closes)
+
+    def first_close_above(self, start: Positions, levels) -> Union[int, np.ndarray]:
+        return self._max.first_beyond(start, levels)
+
+    def first_close_below(self, start: Positions, levels) -> Union[int, np.ndarray]:
+        return self._min.first_beyond(start, levels)
+
+    def breaks(self, start: Positions, levels, bullish: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Break bar index and break close of every level: the first close above
+        it (bullish) or below it (bearish) from `start` on. Unbroken levels
+        get index -1 and a NaN close.
+        """
+        index = np.atleast_1d(self.first_close_above(start, levels) if bullish
+                              else self.first_close_below(start, levels))
+        close = np.where(index >= 0, self.closes[np.maximum(index, 0)] if len(self) else np.nan, np.nan)
+        return index, close
+
+    def break_fields(self, start: int, level: float, bullish: bool) -> Dict:
+        """
+        Dict form of `breaks` for one level, with None when it never broke
+        """
+        index, close = self.breaks(start, level, bullish)
+        if index[0] < 0:
+            return {'break_index': None, 'break_close': None}
+        return {'break_index': int(index[0]), 'break_close': float(close[0])}
@@ -1,11 +1,34 @@
+import os
+import threading
 import numpy as np
-import pandas as pd
-from typing import List, Dict, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Optional, TYPE_CHECKING
 
-from .structure import SwingDetector
+from .backend import get_backend
+from .rmq import CloseCrossingIndex, RangeExtremaIndex
+from .kernels import rolling_max, rolling_min
+from .columnar import DetectionColumns, TYPE_CODES, break_columns
+from .structure import MultiScaleSwingDetector, SwingDetector
+from .zones import ZoneStore
 from .fvg import FVGDetector
 from .orderblock import OrderBlockDetector
-from .liquidity import LiquidityDetector
+from .liquidity import LiquidityDetector, LiquidityPoolDetector
+from .graph import DetectorGraph
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Detector thread pools shared by every analyzer, one per pool size
+_executors: Dict[int, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def _shared_executor(workers: int) -> ThreadPoolExecutor:
+    with _executors_lock:
+        executor = _executors.get(workers)
+        if executor is None:
+            executor = _executors[workers] = ThreadPoolExecutor(workers, thread_name_prefix='smc-detector')
+        return executor
 
 
 class SMCAnalyzer:
@@ -13,73 +36,190 @@ class SMCAnalyzer:
     Smart Money Concept Analyzer that combines all SMC elements
     """
     
-    def __init__(self, lookback_period: int = 20):
+    # Lookback of the fractal detection used by the analysis
+    fractal_lookback = 2
+    
+    # Graph nodes read by `analyze_market_structure` / `analyze_arrays`
+    market_structure_nodes = ('trend', 'bos_choch', 'fvg_zones', 'order_blocks', 'liquidity_sweeps', 'bias')
+    
+    def __init__(self, lookback_period: int = 20, backend: Optional[str] = None, workers: Optional[int] = None):
         self.lookback_period = lookback_period
-        self.swing_detector = SwingDetector(lookback_period)
+        # Array kernels: 'numpy', 'numba' or 'auto' (default: SMC_KERNEL_BACKEND)
+        self.kernels = get_backend(backend)
+        self.swing_detector = SwingDetector(lookback_period, backend=self.kernels)
         self.fvg_detector = FVGDetector()
-        self.ob_detector = OrderBlockDetector()
+        self.ob_detector = OrderBlockDetector(backend=self.kernels)
         self.liquidity_detector = LiquidityDetector()
+        self.pool_detector = LiquidityPoolDetector()
+        self.graph = self._build_graph()
+        # Threads for independent detectors (default: SMC_ANALYSIS_WORKERS, 0 = run in order),
+        # from a pool shared by analyzers of the same size
+        workers = workers if workers is not None else int(os.getenv('SMC_ANALYSIS_WORKERS', 0))
+        self._executor = _shared_executor(workers) if workers > 0 else None
     
-    def analyze(self, df: pd.DataFrame) -> Dict:
+    def analyze(self, df: 'pd.DataFrame', columnar: bool = False, zones: Optional[ZoneStore] = None) -> Dict:
         """
-        Main analysis function that combines all SMC elements
+        Main analysis function that combines all SMC elements.
+        With columnar=True every detection list is a DetectionColumns;
+        use smc_engine.columnar.materialize() to get the dict shape back.
+        FVGs and order blocks are also added to `zones` when one is given.
         """
-        highs = df['high'].values
-        lows = df['low'].values
-        closes = df['close'].values
-        opens = df['open'].values
-        
-        # Detect swings
-        swing_highs, swing_lows = self.swing_detector.detect_swings(highs, lows)
-        
-        # Detect fractals
-        bullish_fractals, bearish_fractals = self.swing_detector.detect_fractals(highs, lows)
-        
-        # Detect BOS and CHOCH
-        bos_bullish, bos_bearish, choch_bullish, choch_bearish = self.detect_bos_choch(swing_highs, swing_lows)
-        
-        # Detect FVGs
-        fvg_zones = self.fvg_detector.detect_fvg(opens, highs, lows, closes)
-        
-        # Detect Order Blocks
-        order_blocks = self.ob_detector.detect_order_blocks(highs, lows, swing_highs, swing_lows)
-        
-        # Detect Liquidity Sweeps
-        liquidity_sweeps = self.liquidity_detector.detect_liquidity_sweeps(highs, lows, swing_highs, swing_lows)
-        
-        # Determine market phase
-        market_phase = self.determine_market_phase(closes)
-        
-        # Determine trend based on swing structure
-        trend = self.determine_trend(swing_highs, swing_lows)
-        
-        result = {
-            'trend': trend,
-            'market_phase': market_phase,
-            'swing_highs': swing_highs,
-            'swing_lows': swing_lows,
-            'bullish_fractals': bullish_fractals,
-            'bearish_fractals': bearish_fractals,
-            'bullish_bos': bos_bullish,
-            'bearish_bos': bos_bearish,
-            'bullish_choch': choch_bullish,
-            'bearish_choch': choch_bearish,
-            'fvg_zones': fvg_zones,
-            'order_blocks': order_blocks,
-            'liquidity_sweeps': liquidity_sweeps,
-            'fibonacci_levels': self.calculate_fibonacci_levels(df),
-            'bias': self.calculate_bias(bos_bullish, bos_bearish, choch_bullish, choch_bearish, fvg_zones, order_blocks),
-            'current_price': closes[-1] if len(closes) > 0 else None
-        }
+        return self._analyze(df['open'].values, df['high'].values, df['low'].values, df['close'].values,
+                             columnar=columnar, zones=zones)
+    
+    @property
+    def extrema_lookbacks(self) -> Tuple[int, int]:
+        """
+        Lookbacks of the swing and fractal detection used by the analysis
+        """
+        return self.lookback_period, self.fractal_lookback
+    
+    def _build_graph(self) -> DetectorGraph:
+        """
+        The analysis as a DAG: arrays -> range index/extrema -> swings ->
+        BOS/CHOCH, order blocks, sweeps and pools; arrays -> FVGs; closes -> phase.
+        The range index is only built for backends with range queries; the
+        others get None (and the pool detector builds its own when read).
+        """
+        graph = DetectorGraph()
+        if self.kernels.range_queries:
+            graph.add('rmq', RangeExtremaIndex, 'highs', 'lows')
+        else:
+            graph.add('rmq', lambda: None)
+        return (graph
+                .add('extrema', self._missing_extrema, 'highs', 'lows', 'rmq', 'known_extrema')
+                .add('swings', self._detect_swings, 'highs', 'lows', 'extrema', 'rmq', 'columnar')
+                .add('fractals', self._detect_fractals, 'highs', 'lows', 'extrema', 'rmq', 'columnar')
+                .add('bos_choch', self.detect_bos_choch, 'swing_highs', 'swing_lows', 'closes')
+                .add('swing_highs', lambda swings: swings[0], 'swings')
+                .add('swing_lows', lambda swings: swings[1], 'swings')
+                .add('fvg_zones', self._detect_fvg, 'opens', 'highs', 'lows', 'closes', 'columnar')
+                .add('order_blocks', self._detect_order_blocks, 'highs', 'lows', 'swing_highs', 'swing_lows',
+                     'columnar')
+                .add('liquidity_sweeps', self._detect_sweeps, 'highs', 'lows', 'swing_highs', 'swing_lows',
+                     'columnar')
+                .add('liquidity_pools', self._detect_pools, 'highs', 'lows', 'closes', 'swing_highs', 'swing_lows',
+                     'rmq', 'columnar')
+                .add('market_phase', self.determine_market_phase, 'closes')
+                .add('trend', self.determine_trend, 'swing_highs', 'swing_lows')
+                .add('fibonacci_levels', self._fibonacci_levels, 'highs', 'lows')
+                .add('bias', self._bias, 'bos_choch', 'fvg_zones', 'order_blocks')
+                .add('current_price', lambda closes: closes[-1] if len(closes) > 0 else None, 'closes'))
+    
+    def _missing_extrema(self, highs, lows, rmq: RangeExtremaIndex, known: Dict[int, Tuple[np.ndarray, np.ndarray]]):
+        # Swings and fractals not passed in come from one multi-scale pass
+        # (or one kernel scan each, for backends without range queries)
+        missing = [lookback for lookback in self.extrema_lookbacks if lookback not in known]
+        return {**self.kernels.nested_swing_indices(highs, lows, missing, rmq), **known}
+    
+    def _detect_swings(self, highs, lows, extrema, rmq, columnar):
+        return self.swing_detector.detect_swings(highs, lows, columnar=columnar,
+                                                 indices=extrema.get(self.lookback_period), rmq=rmq)
+    
+    def _detect_fractals(self, highs, lows, extrema, rmq, columnar):
+        return self.swing_detector.detect_fractals(highs, lows, self.fractal_lookback, columnar=columnar,
+                                                   indices=extrema.get(self.fractal_lookback), rmq=rmq)
+    
+    def _detect_fvg(self, opens, highs, lows, closes, columnar):
+        return self.fvg_detector.detect_fvg(opens, highs, lows, closes, columnar=columnar)
+    
+    def _detect_order_blocks(self, highs, lows, swing_highs, swing_lows, columnar):
+        return self.ob_detector.detect_order_blocks(highs, lows, swing_highs, swing_lows, columnar=columnar)
+    
+    def _detect_sweeps(self, highs, lows, swing_highs, swing_lows, columnar):
+        return self.liquidity_detector.detect_liquidity_sweeps(highs, lows, swing_highs, swing_lows,
+                                                               columnar=columnar)
+    
+    def _detect_pools(self, highs, lows, closes, swing_highs, swing_lows, rmq, columnar):
+        return self.pool_detector.detect_liquidity_pools(highs, lows, closes, swing_highs, swing_lows,
+                                                         columnar=columnar, rmq=rmq)
+    
+    def _bias(self, bos_choch, fvg_zones, order_blocks) -> str:
+        return self.calculate_bias(*bos_choch, fvg_zones, order_blocks)
+    
+    def _analyze(self, opens: np.ndarray, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray,
+                 extrema: Optional[Dict[int, Tuple[np.ndarray, np.ndarray]]] = None,
+                 columnar: bool = False, rmq: Optional[RangeExtremaIndex] = None,
+                 zones: Optional[ZoneStore] = None, targets: Optional[Tuple[str, ...]] = None,
+                 timings: Optional[Dict[str, float]] = None) -> Dict:
+        """
+        Run the detector graph for `targets` (default: everything) and
+        return the parts of the result they cover. `timings`, when given,
+        receives the seconds spent in each node.
+        """
+        inputs = {'opens': opens, 'highs': highs, 'lows': lows, 'closes': closes, 'columnar': columnar,
+                  'known_extrema': extrema or {}}
+        if rmq is not None:
+            inputs['rmq'] = rmq
+        if targets is not None and zones is not None:
+            targets = (*targets, 'fvg_zones', 'order_blocks')
+        run = self.graph.run(inputs, targets, self._executor)
+        if timings is not None:
+            timings.update(run.timings)
+        
+        values = run.values
+        if zones is not None:
+            zones.add([*values['fvg_zones'], *values['order_blocks']])
+        
+        result = {}
+        for key in ('trend', 'market_phase', 'swing_highs', 'swing_lows'):
+            if key in values:
+                result[key] = values[key]
+        if 'fractals' in values:
+            result['bullish_fractals'], result['bearish_fractals'] = values['fractals']
+        if 'bos_choch' in values:
+            (result['bullish_bos'], result['bearish_bos'],
+             result['bullish_choch'], result['bearish_choch']) = values['bos_choch']
+        for key in ('fvg_zones', 'order_blocks', 'liquidity_sweeps', 'liquidity_pools', 'fibonacci_levels',
+                    'bias', 'current_price'):
+            if key in values:
+                result[key] = values[key]
         
         return result
 
-    def analyze_market_structure(self, df: pd.DataFrame) -> Dict:
+    def analyze_market_structure(self, df: 'pd.DataFrame', columnar: bool = False) -> Dict:
+        """
+        Wrapper method for backward compatibility with the server interface.
+        Only the detectors the summary reads are run.
+        """
+        return self._market_structure(self._analyze(df['open'].values, df['high'].values, df['low'].values,
+                                                    df['close'].values, columnar=columnar,
+                                                    targets=self.market_structure_nodes))
+
+    def analyze_arrays(self, open, high, low, close, volume=None,
+                       extrema: Optional[Dict[int, Tuple[np.ndarray, np.ndarray]]] = None,
+                       columnar: bool = False, rmq: Optional[RangeExtremaIndex] = None,
+                       zones: Optional[ZoneStore] = None, timings: Optional[Dict[str, float]] = None) -> Dict:
         """
-        Wrapper method for backward compatibility with the server interface
+        Same result as `analyze_market_structure`, straight from price
+        buffers (lists, NumPy arrays or anything with the buffer protocol)
+        without building a DataFrame. Volume is accepted for symmetry with
+        the OHLCV payloads and is not used by the structure rules.
+
+        `extrema` maps a lookback from `extrema_lookbacks` to precomputed
+        (high, low) extreme indices of this window; missing ones are computed.
+        `rmq` is a range index over exactly these highs/lows (e.g. one kept
+        up to date with `append` while streaming); it is built when omitted.
+        `zones` is a ZoneStore that receives the FVGs and order blocks.
+        `timings` receives the seconds spent in each detector node.
         """
-        result = self.analyze(df)
+        opens = np.ascontiguousarray(open, dtype=np.float64)
+        highs = np.ascontiguousarray(high, dtype=np.float64)
+        lows = np.ascontiguousarray(low, dtype=np.float64)
+        closes = np.ascontiguousarray(close, dtype=np.float64)
+        lengths = {len(opens), len(highs), len(lows), len(closes)}
+        if volume is not None:
+            lengths.add(len(volume))
+        if len(lengths) != 1:
+            raise ValueError("All price arrays must have the same length")
+        if rmq is not None and len(rmq) != len(highs):
+            raise ValueError("Range index does not cover the price arrays")
+
+        return self._market_structure(self._analyze(opens, highs, lows, closes, extrema=extrema,
+                                                    columnar=columnar, rmq=rmq, zones=zones,
+                                                    targets=self.market_structure_nodes, timings=timings))
 
+    def _market_structure(self, result: Dict) -> Dict:
         return {
             'trend': result['trend'],
             'bos': {
@@ -100,9 +240,21 @@ class SMCAnalyzer:
             'explanation': f"Trend: {result.get('trend', 'NONE')}, Bias: {result.get('bias', 'NONE')}"
         }
     
-    def detect_bos_choch(self, swing_highs: List[Dict], swing_lows: List[Dict]) -> Tuple[List, List, List, List]:
+    def detect_swing_hierarchy(self, highs: np.ndarray, lows: np.ndarray, lookbacks: Optional[Tuple[int, ...]] = None,
+                               columnar: bool = False) -> Dict:
+        """
+        Internal and external swings for several lookbacks (default: the
+        fractal and swing lookbacks of this analyzer), linked to their parents
+        """
+        return MultiScaleSwingDetector(lookbacks or self.extrema_lookbacks,
+                                       backend=self.kernels).detect(highs, lows, columnar=columnar)
+    
+    def detect_bos_choch(self, swing_highs: List[Dict], swing_lows: List[Dict],
+                         closes: Optional[np.ndarray] = None) -> Tuple[List, List, List, List]:
         """
         Detect Break of Structure (BOS) and Change of Character (CHOCH)
+        With `closes`, each event carries the first bar that closed through
+        the previous swing level and that close (None while it holds).
         """
         bos_bullish = []
         bos_bearish = []
@@ -112,6 +264,13 @@ class SMCAnalyzer:
         if len(swing_highs) < 2 or len(swing_lows) < 2:
             return bos_bullish, bos_bearish, choch_bullish, choch_bearish
         
+        crossings = None if closes is None else CloseCrossingIndex(closes)
+        if isinstance(swing_highs, DetectionColumns):
+            bos_bullish = break_columns(swing_highs, 'bullish_bos', crossings)
+            bos_bearish = break_columns(swing_lows, 'bearish_bos', crossings)
+            return (bos_bullish, bos_bearish, bos_bullish.with_type('bullish_choch'),
+                    bos_bearish.with_type('bearish_choch'))
+        
         # Detect BOS patterns
         for i in range(1, len(swing_highs)):
             if swing_highs[i]['price'] > swing_highs[i-1]['price']:
@@ -119,7 +278,8 @@ class SMCAnalyzer:
                     'index': swing_highs[i]['index'],
                     'price': swing_highs[i]['price'],
                     'previous_price': swing_highs[i-1]['price'],
-                    'type': 'bullish_bos'
+                    'type': 'bullish_bos',
+                    **self._break_fields(crossings, swing_highs[i-1], True)
                 })
         
         for i in range(1, len(swing_lows)):
@@ -128,7 +288,8 @@ class SMCAnalyzer:
                     'index': swing_lows[i]['index'],
                     'price': swing_lows[i]['price'],
                     'previous_price': swing_lows[i-1]['price'],
-                    'type': 'bearish_bos'
+                    'type': 'bearish_bos',
+                    **self._break_fields(crossings, swing_lows[i-1], False)
                 })
         
         # Detect CHOCH patterns
@@ -138,7 +299,8 @@ class SMCAnalyzer:
                     'index': swing_lows[i]['index'],
                     'price': swing_lows[i]['price'],
                     'previous_price': swing_lows[i-1]['price'],
-                    'type': 'bearish_choch'
+                    'type': 'bearish_choch',
+                    **self._break_fields(crossings, swing_lows[i-1], False)
                 })
         
         for i in range(1, len(swing_highs)):
@@ -147,11 +309,18 @@ class SMCAnalyzer:
                     'index': swing_highs[i]['index'],
                     'price': swing_highs[i]['price'],
                     'previous_price': swing_highs[i-1]['price'],
-                    'type': 'bullish_choch'
+                    'type': 'bullish_choch',
+                    **self._break_fields(crossings, swing_highs[i-1], True)
                 })
         
         return bos_bullish, bos_bearish, choch_bullish, choch_bearish
     
+    @staticmethod
+    def _break_fields(crossings: Optional[CloseCrossingIndex], previous: Dict, bullish: bool) -> Dict:
+        if crossings is None:
+            return {}
+        return crossings.break_fields(previous['index'] + 1, previous['price'], bullish)
+    
     def determine_market_phase(self, closes: np.ndarray) -> str:
         """
         Determine market phase based on price action
@@ -166,7 +335,9 @@ class SMCAnalyzer:
         
         # Determine if trending or ranging based on price movement
         recent_range = max(closes[-20:]) - min(closes[-20:])
-        avg_range = np.mean([max(closes[i-5:i]) - min(closes[i-5:i]) for i in range(5, len(closes)) if i < len(closes)])
+        # Range of every 5-bar window closes[i-5:i], i = 5 .. len(closes) - 1
+        windows = len(closes) - 5
+        avg_range = np.mean(rolling_max(closes, 5)[:windows] - rolling_min(closes, 5)[:windows])
         
         if relative_volatility > 0.02:  # High volatility
             return "DISTRIBUTION" if closes[-1] > closes[-20] else "ACCUMULATION"
@@ -197,16 +368,16 @@ class SMCAnalyzer:
         else:
             return "RANGE"
     
-    def calculate_fibonacci_levels(self, df: pd.DataFrame) -> Dict[float, float]:
+    def calculate_fibonacci_levels(self, df: 'pd.DataFrame') -> Dict[float, float]:
         """
         Calculate fibonacci retracement levels based on recent swing points
         """
-        if len(df) < 20:
+        return self._fibonacci_levels(df['high'].values, df['low'].values)
+    
+    def _fibonacci_levels(self, highs: np.ndarray, lows: np.ndarray) -> Dict[float, float]:
+        if len(highs) < 20:
             return {}
         
-        highs = df['high'].values
-        lows = df['low'].values
-        
         # Find the highest high and lowest low in the lookback period
         recent_high = max(highs[-20:])
         recent_low = min(lows[-20:])
@@ -230,12 +401,12 @@ class SMCAnalyzer:
         bearish_signals = len(bos_bearish) + len(choch_bearish)
         
         # Check for bullish FVGs and order blocks
-        bullish_fvg = sum(1 for fvg in fvg_zones if fvg.get('type') == 'bullish_fvg')
-        bullish_ob = sum(1 for ob in order_blocks if ob.get('type') == 'bullish_order_block')
+        bullish_fvg = self._count_type(fvg_zones, 'bullish_fvg')
+        bullish_ob = self._count_type(order_blocks, 'bullish_order_block')
         
         # Check for bearish FVGs and order blocks
-        bearish_fvg = sum(1 for fvg in fvg_zones if fvg.get('type') == 'bearish_fvg')
-        bearish_ob = sum(1 for ob in order_blocks if ob.get('type') == 'bearish_order_block')
+        bearish_fvg = self._count_type(fvg_zones, 'bearish_fvg')
+        bearish_ob = self._count_type(order_blocks, 'bearish_order_block')
         
         bullish_signals += bullish_fvg + bullish_ob
         bearish_signals += bearish_fvg + bearish_ob
@@ -246,3 +417,9 @@ class SMCAnalyzer:
             return "BEARISH"
         else:
             return "NEUTRAL"
+    
+    @staticmethod
+    def _count_type(detections, type_name: str) -> int:
+        if isinstance(detections, DetectionColumns):
+            return int(np.count_nonzero(detections.type_code == TYPE_CODES[type_name]))
+        return sum(1 for detection in detections if detection.get('type') == type_name)
@@ -1,5 +1,11 @@
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
+
+from .backend import get_backend
+from .rmq import RangeExtremaIndex
+from .columnar import (
+    Constant, DetectionColumns, Nullable, SWING_LAYOUT, swing_columns, fractal_columns, break_columns
+)
 
 
 class SwingDetector:
@@ -7,90 +13,130 @@ class SwingDetector:
     Detects swing highs and lows based on fractal pattern
     """
     
-    def __init__(self, lookback_period: int = 5):
+    def __init__(self, lookback_period: int = 5, backend: Optional[str] = None):
         self.lookback_period = lookback_period
+        self.kernels = get_backend(backend)
     
-    def detect_swings(self, highs: np.ndarray, lows: np.ndarray) -> Tuple[List[Dict], List[Dict]]:
+    def detect_swings(self, highs: np.ndarray, lows: np.ndarray, columnar: bool = False,
+                      indices: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                      rmq: Optional[RangeExtremaIndex] = None) -> Tuple[List[Dict], List[Dict]]:
         """
-        Detect swing highs and lows
+        Detect swing highs and lows. `indices` are precomputed (high, low)
+        swing indices for `lookback_period`, e.g. reused by smc_engine.resume;
+        `rmq` is the range index of these bars shared by the detectors.
         """
-        swing_highs = []
-        swing_lows = []
-        
-        for i in range(self.lookback_period, len(highs) - self.lookback_period):
-            # Check for swing high (highest high in lookback range)
-            is_swing_high = True
-            for j in range(i - self.lookback_period, i + self.lookback_period + 1):
-                if highs[i] < highs[j] and j != i:
-                    is_swing_high = False
-                    break
-            if is_swing_high:
-                swing_highs.append({
-                    'index': i,
-                    'price': highs[i],
-                    'high': highs[i],
-                    'low': lows[i],
-                    'time': i  # Using index as time for now
-                })
-            
-            # Check for swing low (lowest low in lookback range)
-            is_swing_low = True
-            for j in range(i - self.lookback_period, i + self.lookback_period + 1):
-                if lows[i] > lows[j] and j != i:
-                    is_swing_low = False
-                    break
-            if is_swing_low:
-                swing_lows.append({
-                    'index': i,
-                    'price': lows[i],
-                    'high': highs[i],
-                    'low': lows[i],
-                    'time': i  # Using index as time for now
-                })
+        if indices is None:
+            indices = self.kernels.swing_indices(highs, lows, self.lookback_period, rmq)
+        high_idx, low_idx = indices
+        if columnar:
+            return swing_columns(np.asarray(highs, dtype=np.float64), np.asarray(lows, dtype=np.float64),
+                                 high_idx, low_idx)
+        
+        swing_highs = [{
+            'index': i,
+            'price': highs[i],
+            'high': highs[i],
+            'low': lows[i],
+            'time': i  # Using index as time for now
+        } for i in high_idx.tolist()]
+        
+        swing_lows = [{
+            'index': i,
+            'price': lows[i],
+            'high': highs[i],
+            'low': lows[i],
+            'time': i  # Using index as time for now
+        } for i in low_idx.tolist()]
         
         return swing_highs, swing_lows
     
-    def detect_fractals(self, highs: np.ndarray, lows: np.ndarray, lookback: int = 2) -> Tuple[List[Dict], List[Dict]]:
+    def detect_fractals(self, highs: np.ndarray, lows: np.ndarray, lookback: int = 2,
+                        columnar: bool = False, indices: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                        rmq: Optional[RangeExtremaIndex] = None) -> Tuple[List[Dict], List[Dict]]:
         """
         Detect fractals based on MT5 logic (2 bars on each side)
         """
-        bullish_fractals = []
-        bearish_fractals = []
-        
-        for i in range(lookback, len(highs) - lookback):
-            # Bullish fractal (low fractal) - lowest low at middle
-            is_bullish = True
-            for j in range(i - lookback, i + lookback + 1):
-                if j != i and lows[i] > lows[j]:
-                    is_bullish = False
-                    break
-            if is_bullish:
-                bearish_fractals.append({
-                    'index': i,
-                    'price': lows[i],
-                    'type': 'bullish',
-                    'high': highs[i],
-                    'low': lows[i]
-                })
-            
-            # Bearish fractal (high fractal) - highest high at middle
-            is_bearish = True
-            for j in range(i - lookback, i + lookback + 1):
-                if j != i and highs[i] < highs[j]:
-                    is_bearish = False
-                    break
-            if is_bearish:
-                bullish_fractals.append({
-                    'index': i,
-                    'price': highs[i],
-                    'type': 'bearish',
-                    'high': highs[i],
-                    'low': lows[i]
-                })
+        if indices is None:
+            # Fractals share the swing masks
+            indices = self.kernels.fractal_indices(highs, lows, lookback, rmq)
+        high_idx, low_idx = indices
+        if columnar:
+            return fractal_columns(np.asarray(highs, dtype=np.float64), np.asarray(lows, dtype=np.float64),
+                                   high_idx, low_idx)
+        
+        # Bullish fractal (low fractal) - lowest low at middle
+        bearish_fractals = [{
+            'index': i,
+            'price': lows[i],
+            'type': 'bullish',
+            'high': highs[i],
+            'low': lows[i]
+        } for i in low_idx.tolist()]
+        
+        # Bearish fractal (high fractal) - highest high at middle
+        bullish_fractals = [{
+            'index': i,
+            'price': highs[i],
+            'type': 'bearish',
+            'high': highs[i],
+            'low': lows[i]
+        } for i in high_idx.tolist()]
         
         return bullish_fractals, bearish_fractals
 
 
+class MultiScaleSwingDetector:
+    """
+    Internal (short lookback) and external (long lookback) swing structure
+    computed together. All scales share one range index: the smallest
+    lookback is scanned once and every wider one only re-tests the swings
+    that survived the scale below it, so the whole hierarchy costs about
+    one swing pass.
+    """
+    
+    def __init__(self, lookbacks: Tuple[int, ...] = (2, 5, 20), backend: Optional[str] = None):
+        self.lookbacks = tuple(sorted(set(lookbacks)))
+        self.kernels = get_backend(backend)
+    
+    def detect(self, highs: np.ndarray, lows: np.ndarray, columnar: bool = False,
+               rmq: Optional[RangeExtremaIndex] = None) -> Dict[int, Tuple[List[Dict], List[Dict]]]:
+        """
+        (swing highs, swing lows) per lookback, internal scales first. Each
+        swing gets its 'lookback' and the bar index of its 'parent': the
+        latest swing on the same side of the next wider scale at or before
+        it (a swing that is also on that scale is its own parent). The
+        widest scale and swings before its first swing have no parent (None).
+        """
+        highs = np.asarray(highs, dtype=np.float64)
+        lows = np.asarray(lows, dtype=np.float64)
+        if rmq is None and self.kernels.range_queries:
+            rmq = RangeExtremaIndex(highs, lows)
+        nested = self.kernels.nested_swing_indices(highs, lows, self.lookbacks, rmq)
+        
+        hierarchy = {}
+        for position, lookback in enumerate(self.lookbacks):
+            coarser = nested[self.lookbacks[position + 1]] if position + 1 < len(self.lookbacks) else None
+            layout = SWING_LAYOUT + (('lookback', Constant(lookback)), ('parent', Nullable('parent', 'has_parent')))
+            swing_highs, swing_lows = (
+                self._with_parents(swings, layout, None if coarser is None else coarser[side])
+                for side, swings in enumerate(swing_columns(highs, lows, *nested[lookback]))
+            )
+            hierarchy[lookback] = (swing_highs, swing_lows) if columnar else (swing_highs.to_dicts(),
+                                                                             swing_lows.to_dicts())
+        return hierarchy
+    
+    @staticmethod
+    def _with_parents(swings: DetectionColumns, layout, parents: Optional[np.ndarray]) -> DetectionColumns:
+        if parents is None or len(parents) == 0:
+            parent = np.full(len(swings), -1, dtype=np.int64)
+        else:
+            # Latest wider-scale swing at or before each swing
+            slot = np.searchsorted(parents, swings.index, side='right') - 1
+            parent = np.where(slot >= 0, parents[np.maximum(slot, 0)], -1)
+        return DetectionColumns(swings.index, swings.type_code, layout, price=swings.price, high=swings.high,
+                                low=swings.low, extra={'parent': parent, 'has_parent': parent >= 0})
+
+
 class BOSDetector:
     """
     Detects Break of Structure patterns
@@ -100,6 +146,11 @@ class BOSDetector:
         """
         Detect BOS (Break of Structure) - when price breaks swing points
         """
+        if isinstance(swing_highs, DetectionColumns):
+            if len(swing_highs) < 2 or len(swing_lows) < 2:
+                swing_highs, swing_lows = swing_highs[:0], swing_lows[:0]
+            return break_columns(swing_highs, 'bullish_bos'), break_columns(swing_lows, 'bearish_bos')
+        
         bullish_bos = []
         bearish_bos = []
         
@@ -138,6 +189,11 @@ class CHOCHDetector:
         """
         Detect CHOCH (Change of Character) - false break of swing points
         """
+        if isinstance(swing_highs, DetectionColumns):
+            if len(swing_highs) < 2 or len(swing_lows) < 2:
+                swing_highs, swing_lows = swing_highs[:0], swing_lows[:0]
+            return break_columns(swing_highs, 'bullish_choch'), break_columns(swing_lows, 'bearish_choch')
+        
         bullish_choch = []
         bearish_choch = []
         
@@ -0,0 +1,300 @@
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from .columnar import DetectionColumns, TYPE_NAMES
+from .rmq import MaxSegmentTree
+
+# Value of removed (mitigated) slots, and the level every live slot reaches
+_REMOVED = -np.inf
+_LIVE = -np.finfo(np.float64).max
+
+
+def mitigation_level(zone: Dict) -> float:
+    """
+    Price that mitigates a zone: its 'entry' if it has one, else the low of
+    a bullish and the high of a bearish zone
+    """
+    if 'entry' in zone:
+        return zone['entry']
+    return zone['low'] if zone['type'].startswith('bullish') else zone['high']
+
+
+class _ZoneLevel:
+    """
+    One static block of zones with the indexes described in ZoneStore.
+    Methods take and return positions in `records`; `sequence` holds each
+    zone's insertion number in the store.
+    """
+
+    def __init__(self, records: List[Dict], sequence: np.ndarray):
+        self.records = records
+        self.sequence = sequence
+        count = len(records)
+        self.high = np.array([zone['high'] for zone in records], dtype=np.float64)
+        self.low = np.array([zone['low'] for zone in records], dtype=np.float64)
+        bullish_mask = np.array([zone['type'].startswith('bullish') for zone in records], dtype=bool)
+        self.level = np.array([mitigation_level(zone) for zone in records], dtype=np.float64)
+        self.near = np.where(bullish_mask, self.high, self.low)
+        self.index = np.array([zone['index'] for zone in records], dtype=np.int64)
+        self.active = np.ones(count, dtype=bool)
+        self.live = count
+        self.counts = {}
+        for zone in records:
+            self.counts[zone['type']] = self.counts.get(zone['type'], 0) + 1
+
+        # Stabbing and "nearest above": zones by lower bound, tree of upper bounds
+        self.by_low = np.argsort(self.low, kind='stable')
+        self.low_sorted = self.low[self.by_low]
+        self.low_tree = MaxSegmentTree(self.high[self.by_low])
+        # "Nearest below": zones by upper bound, tree of live flags
+        self.by_high = np.argsort(self.high, kind='stable')
+        self.high_sorted = self.high[self.by_high]
+        self.high_tree = MaxSegmentTree(np.full(count, _LIVE))
+        self.low_slot = np.empty(count, dtype=np.int64)
+        self.low_slot[self.by_low] = np.arange(count)
+        self.high_slot = np.empty(count, dtype=np.int64)
+        self.high_slot[self.by_high] = np.arange(count)
+
+        # Mitigation order: bullish levels ascending (a low mitigates a
+        # suffix), bearish levels ascending (a high mitigates a prefix)
+        bullish, bearish = np.flatnonzero(bullish_mask), np.flatnonzero(~bullish_mask)
+        self.bullish_order = bullish[np.argsort(self.level[bullish], kind='stable')]
+        self.bearish_order = bearish[np.argsort(self.level[bearish], kind='stable')]
+        self.bullish_cut = len(self.bullish_order)
+        self.bearish_cut = 0
+        # Same for the near edges, and the zones by formation bar
+        self.bullish_touch_order = bullish[np.argsort(self.near[bullish], kind='stable')]
+        self.bearish_touch_order = bearish[np.argsort(self.near[bearish], kind='stable')]
+        self.bullish_touch_cut = len(self.bullish_touch_order)
+        self.bearish_touch_cut = 0
+        self.by_index = np.argsort(self.index, kind='stable')
+        self.expired = 0
+
+    def live_records(self) -> Tuple[List[Dict], np.ndarray]:
+        positions = np.flatnonzero(self.active)
+        return [self.records[k] for k in positions], self.sequence[positions]
+
+    def remove(self, zone: int):
+        if not self.active[zone]:
+            return
+        self.active[zone] = False
+        self.live -= 1
+        self.counts[self.records[zone]['type']] -= 1
+        self.low_tree.update(self.low_slot[zone], _REMOVED)
+        self.high_tree.update(self.high_slot[zone], _REMOVED)
+
+    def reached(self, highs: np.ndarray, lows: np.ndarray, levels: np.ndarray, bullish_order: np.ndarray,
+                bearish_order: np.ndarray, bullish_cut: int, bearish_cut: int):
+        # Bullish levels at or above the lowest low form a suffix of their
+        # order, bearish levels at or below the highest high a prefix
+        reached = []
+        if len(lows) and not np.isnan(lows).all():
+            cut = int(np.searchsorted(levels[bullish_order], np.nanmin(lows), 'left'))
+            if cut < bullish_cut:
+                reached.extend(bullish_order[cut:bullish_cut].tolist())
+                bullish_cut = cut
+        if len(highs) and not np.isnan(highs).all():
+            cut = int(np.searchsorted(levels[bearish_order], np.nanmax(highs), 'right'))
+            if cut > bearish_cut:
+                reached.extend(bearish_order[bearish_cut:cut].tolist())
+                bearish_cut = cut
+        return [zone for zone in reached if self.active[zone]], bullish_cut, bearish_cut
+
+    def touch(self, highs: np.ndarray, lows: np.ndarray) -> List[int]:
+        touched, self.bullish_touch_cut, self.bearish_touch_cut = self.reached(
+            highs, lows, self.near, self.bullish_touch_order, self.bearish_touch_order,
+            self.bullish_touch_cut, self.bearish_touch_cut)
+        return touched
+
+    def mitigate(self, highs: np.ndarray, lows: np.ndarray) -> List[int]:
+        mitigated, self.bullish_cut, self.bearish_cut = self.reached(
+            highs, lows, self.level, self.bullish_order, self.bearish_order, self.bullish_cut, self.bearish_cut)
+        for zone in mitigated:
+            self.remove(zone)
+        return mitigated
+
+    def expire(self, before_index: int) -> List[int]:
+        cut = int(np.searchsorted(self.index[self.by_index], before_index, 'left'))
+        expired = [zone for zone in self.by_index[self.expired:cut].tolist() if self.active[zone]]
+        self.expired = max(self.expired, cut)
+        for zone in expired:
+            self.remove(zone)
+        return expired
+
+    def containing(self, price: float) -> List[int]:
+        stop = int(np.searchsorted(self.low_sorted, price, 'right'))
+        found = []
+        slot = self.low_tree.first_at_least(0, stop, price)
+        while slot >= 0:
+            found.append(int(self.by_low[slot]))
+            slot = self.low_tree.first_at_least(slot + 1, stop, price)
+        return found
+
+    def nearest_above(self, price: float) -> int:
+        start = int(np.searchsorted(self.low_sorted, price, 'right'))
+        slot = self.low_tree.first_at_least(start, len(self.records), _LIVE)
+        return -1 if slot < 0 else int(self.by_low[slot])
+
+    def nearest_below(self, price: float) -> int:
+        stop = int(np.searchsorted(self.high_sorted, price, 'left'))
+        slot = self.high_tree.last_at_least(0, stop, _LIVE)
+        return -1 if slot < 0 else int(self.by_high[slot])
+
+
+class ZoneStore:
+    """
+    Active FVG and order block zones indexed by price.
+
+    Zones are kept in two sorted orders, by lower bound and by upper bound,
+    each backed by a MaxSegmentTree, so "zones containing price X" and
+    "nearest zone above/below X" are O(log n) (plus the zones returned).
+    Bullish zones are mitigated once a low reaches their mitigation level,
+    bearish zones once a high does. The levels are sorted per side, so a
+    batch of candles mitigates a whole suffix (prefix) in one binary search.
+
+    The mitigation level is a zone's 'entry' when it has one (FVGs, as in
+    the detectors), otherwise its far edge: the low of a bullish and the
+    high of a bearish order block. A zone is touched once price reaches its
+    near edge (high of a bullish, low of a bearish zone), tracked the same
+    way, and zones formed before a bar index can be expired in bulk.
+
+    The indexes are static, so the store is a list of them (levels) with
+    at least doubling sizes. Added zones form a new level that absorbs every
+    level not larger than itself, like carries in a binary counter: adding m
+    zones re-indexes only the small levels, each zone is re-indexed O(log n)
+    times in its life, and queries visit O(log n) levels.
+    """
+
+    def __init__(self, zones: Optional[Union[List[Dict], DetectionColumns]] = None):
+        self._levels: List[_ZoneLevel] = []
+        self._added = 0
+        if zones is not None:
+            self.add(zones)
+
+    def __len__(self) -> int:
+        return sum(level.live for level in self._levels)
+
+    def add(self, zones: Union[List[Dict], DetectionColumns]):
+        """
+        Add detected zones (dicts or DetectionColumns with high/low/type),
+        amortized O(m log^2 n) for m zones
+        """
+        records = []
+        for zone in zones:
+            zone = zone.to_dict() if hasattr(zone, 'to_dict') else dict(zone)
+            if np.isfinite(zone['high']) and np.isfinite(zone['low']):
+                records.append(zone)
+        if not records:
+            return
+        sequence = np.arange(self._added, self._added + len(records))
+        self._added += len(records)
+
+        # Merge the levels the new one outgrows (the smallest are last);
+        # mitigated and expired zones are dropped on the way
+        # Mitigation shrinks old levels out of order; past 2 log2(n) levels
+        # everything is merged into one
+        merge_all = len(self._levels) >= 2 * (len(self) + len(records)).bit_length()
+        while self._levels and (merge_all or self._levels[-1].live <= len(records)):
+            merged, merged_sequence = self._levels.pop().live_records()
+            records = merged + records
+            sequence = np.concatenate([merged_sequence, sequence])
+        self._levels.append(_ZoneLevel(records, sequence))
+
+    def _collect(self, found: Iterable[Tuple[_ZoneLevel, List[int]]]) -> List[Dict]:
+        # Zones of several levels in the order they were added
+        pairs = [(int(level.sequence[zone]), level.records[zone]) for level, zones in found for zone in zones]
+        pairs.sort(key=lambda pair: pair[0])
+        return [zone for _, zone in pairs]
+
+    def _prune(self):
+        self._levels = [level for level in self._levels if level.live]
+
+    def touch(self, highs, lows) -> List[Dict]:
+        """
+        Apply one or more candles (all later than the stored zones) and
+        return the active zones they touched for the first time
+        """
+        highs, lows = _candles(highs, lows)
+        touched = [zone for zone in self._collect((level, level.touch(highs, lows)) for level in self._levels)
+                   if not zone.get('touched')]
+        for zone in touched:
+            zone['touched'] = True
+        return touched
+
+    def mitigate(self, highs, lows) -> List[Dict]:
+        """
+        Apply one or more candles (all later than the stored zones) and
+        return the zones they mitigated
+        """
+        highs, lows = _candles(highs, lows)
+        mitigated = self._collect((level, level.mitigate(highs, lows)) for level in self._levels)
+        for zone in mitigated:
+            if 'mitigated' in zone:
+                zone['mitigated'] = True
+        self._prune()
+        return mitigated
+
+    def expire(self, before_index: int) -> List[Dict]:
+        """
+        Remove the active zones formed before a bar index
+        """
+        expired = self._collect((level, level.expire(before_index)) for level in self._levels)
+        self._prune()
+        return expired
+
+    def containing(self, price: float) -> List[Dict]:
+        """
+        Active zones with low <= price <= high (stabbing query)
+        """
+        return self._collect((level, level.containing(price)) for level in self._levels)
+
+    def nearest_above(self, price: float) -> Optional[Dict]:
+        """
+        Active zone with the lowest lower bound above the price
+        """
+        best = None
+        for level in self._levels:
+            zone = level.nearest_above(price)
+            if zone >= 0:
+                key = (level.low[zone], level.sequence[zone])
+                if best is None or key < best[0]:
+                    best = (key, level.records[zone])
+        return None if best is None else best[1]
+
+    def nearest_below(self, price: float) -> Optional[Dict]:
+        """
+        Active zone with the highest upper bound below the price
+        """
+        best = None
+        for level in self._levels:
+            zone = level.nearest_below(price)
+            if zone >= 0:
+                key = (level.high[zone], level.sequence[zone])
+                if best is None or key > best[0]:
+                    best = (key, level.records[zone])
+        return None if best is None else best[1]
+
+    def count(self, type_name: Optional[str] = None) -> int:
+        """
+        Number of active zones, optionally of one type
+        """
+        if type_name is None:
+            return len(self)
+        return sum(level.counts.get(type_name, 0) for level in self._levels)
+
+    def active(self, type_name: Optional[str] = None) -> List[Dict]:
+        """
+        Active zones in the order they were added
+        """
+        return [zone for zone in self._collect((level, np.flatnonzero(level.active).tolist())
+                                               for level in self._levels)
+                if type_name is None or zone['type'] == type_name]
+
+    def __repr__(self) -> str:
+        counts = {name: self.count(name) for name in TYPE_NAMES if self.count(name)}
+        return f"ZoneStore({counts})"
+
+
+def _candles(highs, lows) -> Tuple[np.ndarray, np.ndarray]:
+    return (np.atleast_1d(np.asarray(highs, dtype=np.float64)),
+            np.atleast_1d(np.asarray(lows, dtype=np.float64)))
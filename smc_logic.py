@@ -1,6 +1,28 @@
+import heapq
+from collections import deque
+
 import numpy as np
-from typing import List, Dict, Tuple, Optional
-import pandas as pd
+from typing import List, Dict, Tuple, Optional, TYPE_CHECKING
+
+from smc_engine.backend import get_backend
+from smc_engine.rmq import CloseCrossingIndex, RangeExtremaIndex
+from smc_engine.liquidity import LiquidityPoolDetector
+from smc_engine.zones import ZoneStore
+from smc_engine.lazy import LazyResult, lazy_field
+from smc_engine.columnar import (
+    Constant, DetectionColumns, TYPE_CODES, swing_columns, fractal_columns, break_columns
+)
+
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+FVG_LAYOUT = (('index', 'index'), ('type', 'type'), ('high', 'high'), ('low', 'low'),
+              ('entry', 'entry'), ('mitigated', Constant(False)))
+ORDER_BLOCK_LAYOUT = (('index', 'index'), ('type', 'type'), ('high', 'high'), ('low', 'low'),
+                      ('price', 'price'), ('mitigated', Constant(False)))
+SWEEP_LAYOUT = (('index', 'index'), ('type', 'type'), ('price', 'price'), ('candle_index', 'index'))
 
 
 class SMCEngine:
@@ -8,93 +30,104 @@ class SMCEngine:
     Smart Money Concept Engine that replicates the logic from MT5 SMC indicator
     """
     
-    def __init__(self):
+    # Lookbacks of the swing and fractal detection used by the analysis
+    extrema_lookbacks = (5, 2)
+    
+    def __init__(self, backend: Optional[str] = None):
         self.lookback = 20  # Default lookback for fractal detection
+        # Array kernels: 'numpy', 'numba' or 'auto' (default: SMC_KERNEL_BACKEND)
+        self.kernels = get_backend(backend)
         
-    def detect_swings(self, highs: List[float], lows: List[float], lookback: int = 5) -> Tuple[List[Dict], List[Dict]]:
-        """
-        Detect swing highs and lows based on fractal pattern
-        """
-        swing_highs = []
-        swing_lows = []
-        
-        for i in range(lookback, len(highs) - lookback):
-            # Check for swing high (highest high in lookback range)
-            is_swing_high = True
-            for j in range(i - lookback, i + lookback + 1):
-                if highs[i] < highs[j]:
-                    is_swing_high = False
-                    break
-            if is_swing_high:
-                swing_highs.append({
-                    'index': i,
-                    'price': highs[i],
-                    'high': highs[i],
-                    'low': lows[i],
-                    'time': i  # Using index as time for now
-                })
-            
-            # Check for swing low (lowest low in lookback range)
-            is_swing_low = True
-            for j in range(i - lookback, i + lookback + 1):
-                if lows[i] > lows[j]:
-                    is_swing_low = False
-                    break
-            if is_swing_low:
-                swing_lows.append({
-                    'index': i,
-                    'price': lows[i],
-                    'high': highs[i],
-                    'low': lows[i],
-                    'time': i  # Using index as time for now
-                })
+    def detect_swings(self, highs: List[float], lows: List[float], lookback: int = 5,
+                      columnar: bool = False, indices: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                      rmq: Optional[RangeExtremaIndex] = None) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Detect swing highs and lows based on fractal pattern.
+        `indices` are precomputed (high, low) swing indices for this lookback,
+        e.g. reused from an overlapping window by smc_engine.resume; `rmq`
+        is the range index of these bars shared by the detectors.
+        """
+        if indices is None:
+            indices = self.kernels.swing_indices(highs, lows, lookback, rmq)
+        high_idx, low_idx = indices
+        if columnar:
+            return swing_columns(np.asarray(highs, dtype=np.float64), np.asarray(lows, dtype=np.float64),
+                                 high_idx, low_idx)
+        
+        swing_highs = [{
+            'index': i,
+            'price': highs[i],
+            'high': highs[i],
+            'low': lows[i],
+            'time': i  # Using index as time for now
+        } for i in high_idx.tolist()]
+        
+        swing_lows = [{
+            'index': i,
+            'price': lows[i],
+            'high': highs[i],
+            'low': lows[i],
+            'time': i  # Using index as time for now
+        } for i in low_idx.tolist()]
         
         return swing_highs, swing_lows
     
-    def detect_fractals(self, highs: List[float], lows: List[float], lookback: int = 2) -> Tuple[List[Dict], List[Dict]]:
+    def detect_fractals(self, highs: List[float], lows: List[float], lookback: int = 2,
+                        columnar: bool = False, indices: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                        rmq: Optional[RangeExtremaIndex] = None) -> Tuple[List[Dict], List[Dict]]:
         """
         Detect fractals based on MT5 logic (2 bars on each side)
         """
-        bullish_fractals = []
-        bearish_fractals = []
-        
-        for i in range(lookback, len(highs) - lookback):
-            # Bullish fractal (low fractal) - lowest low at middle
-            is_bullish = True
-            for j in range(i - lookback, i + lookback + 1):
-                if j != i and lows[i] > lows[j]:
-                    is_bullish = False
-                    break
-            if is_bullish:
-                bearish_fractals.append({
-                    'index': i,
-                    'price': lows[i],
-                    'type': 'bullish',
-                    'high': highs[i],
-                    'low': lows[i]
-                })
-            
-            # Bearish fractal (high fractal) - highest high at middle
-            is_bearish = True
-            for j in range(i - lookback, i + lookback + 1):
-                if j != i and highs[i] < highs[j]:
-                    is_bearish = False
-                    break
-            if is_bearish:
-                bullish_fractals.append({
-                    'index': i,
-                    'price': highs[i],
-                    'type': 'bearish',
-                    'high': highs[i],
-                    'low': lows[i]
-                })
+        if indices is None:
+            # Fractals share the swing masks
+            indices = self.kernels.fractal_indices(highs, lows, lookback, rmq)
+        high_idx, low_idx = indices
+        if columnar:
+            return fractal_columns(np.asarray(highs, dtype=np.float64), np.asarray(lows, dtype=np.float64),
+                                   high_idx, low_idx)
+        
+        # Bullish fractal (low fractal) - lowest low at middle
+        bearish_fractals = [{
+            'index': i,
+            'price': lows[i],
+            'type': 'bullish',
+            'high': highs[i],
+            'low': lows[i]
+        } for i in low_idx.tolist()]
+        
+        # Bearish fractal (high fractal) - highest high at middle
+        bullish_fractals = [{
+            'index': i,
+            'price': highs[i],
+            'type': 'bearish',
+            'high': highs[i],
+            'low': lows[i]
+        } for i in high_idx.tolist()]
         
         return bullish_fractals, bearish_fractals
     
-    def detect_bos_choch(self, swing_highs: List[Dict], swing_lows: List[Dict]) -> Dict:
+    def detect_bos_choch(self, swing_highs: List[Dict], swing_lows: List[Dict], closes=None) -> Dict:
         """
         Detect Break of Structure (BOS) and Change of Character (CHOCH)
+        Columnar swings give columnar events; CHOCH shares the BOS arrays.
+        With `closes`, every event also gets the bar that first closed
+        through the previous swing level ('break_index', 'break_close', None
+        while the level holds), found by binary descent over a range index
+        instead of scanning the bars for each level.
         """
+        crossings = None if closes is None else CloseCrossingIndex(closes)
+        if isinstance(swing_highs, DetectionColumns):
+            if len(swing_highs) < 2 or len(swing_lows) < 2:
+                swing_highs, swing_lows = swing_highs[:0], swing_lows[:0]
+            bos_bullish = break_columns(swing_highs, 'bullish_bos', crossings)
+            bos_bearish = break_columns(swing_lows, 'bearish_bos', crossings)
+            return {
+                'bullish_bos': bos_bullish,
+                'bearish_bos': bos_bearish,
+                'bullish_choch': bos_bullish.with_type('bullish_choch'),
+                'bearish_choch': bos_bearish.with_type('bearish_choch')
+            }
+        
         bos_bullish = []
         bos_bearish = []
         choch_bullish = []
@@ -117,7 +150,8 @@ class SMCEngine:
                     'index': swing_highs[i]['index'],
                     'price': swing_highs[i]['price'],
                     'previous_price': swing_highs[i-1]['price'],
-                    'type': 'bullish_bos'
+                    'type': 'bullish_bos',
+                    **self._break_fields(crossings, swing_highs[i-1], True)
                 })
         
         # For bearish BOS: lower low broken (new low below previous low)
@@ -128,7 +162,8 @@ class SMCEngine:
                     'index': swing_lows[i]['index'],
                     'price': swing_lows[i]['price'],
                     'previous_price': swing_lows[i-1]['price'],
-                    'type': 'bearish_bos'
+                    'type': 'bearish_bos',
+                    **self._break_fields(crossings, swing_lows[i-1], False)
                 })
         
         # For CHOCH patterns (Change of Character)
@@ -139,7 +174,8 @@ class SMCEngine:
                     'index': swing_lows[i]['index'],
                     'price': swing_lows[i]['price'],
                     'previous_price': swing_lows[i-1]['price'],
-                    'type': 'bearish_choch'
+                    'type': 'bearish_choch',
+                    **self._break_fields(crossings, swing_lows[i-1], False)
                 })
         
         # Bullish CHOCH: price breaks above previous swing high then back below
@@ -149,7 +185,8 @@ class SMCEngine:
                     'index': swing_highs[i]['index'],
                     'price': swing_highs[i]['price'],
                     'previous_price': swing_highs[i-1]['price'],
-                    'type': 'bullish_choch'
+                    'type': 'bullish_choch',
+                    **self._break_fields(crossings, swing_highs[i-1], True)
                 })
         
         return {
@@ -159,97 +196,103 @@ class SMCEngine:
             'bearish_choch': choch_bearish
         }
     
-    def detect_fvg(self, opens: List[float], highs: List[float], lows: List[float], closes: List[float]) -> List[Dict]:
+    @staticmethod
+    def _break_fields(crossings: Optional[CloseCrossingIndex], previous: Dict, bullish: bool) -> Dict:
+        if crossings is None:
+            return {}
+        return crossings.break_fields(previous['index'] + 1, previous['price'], bullish)
+    
+    def detect_fvg(self, opens: List[float], highs: List[float], lows: List[float], closes: List[float],
+                   columnar: bool = False, rmq: Optional[RangeExtremaIndex] = None) -> List[Dict]:
         """
         Detect Fair Value Gaps (FVG)
         FVG is a gap between candles that gets filled
         """
-        fvg_zones = []
+        n = len(highs)
+        if n < 4:
+            return DetectionColumns.empty(FVG_LAYOUT) if columnar else []
         
-        for i in range(2, len(highs) - 1):
-            # Bullish FVG: gap between previous candle and next candle
-            # Candle 1 (i-2) High < Candle 3 (i) Low
-            prev_high = highs[i-2]
-            next_low = lows[i]
-            
-            # Check for bullish FVG
-            if next_low > prev_high:
-                fvg_zones.append({
+        highs_arr = np.asarray(highs, dtype=np.float64)
+        lows_arr = np.asarray(lows, dtype=np.float64)
+        current_close = closes[-1]
+        
+        # Candle 3 of every three-candle pattern; the last candle is never used
+        third = np.arange(2, n - 1)
+        prev_high = highs_arr[third - 2]
+        prev_low = lows_arr[third - 2]
+        next_low = lows_arr[third]
+        next_high = highs_arr[third]
+        
+        # Bullish FVG: Candle 1 (i-2) High < Candle 3 (i) Low.
+        # Mitigated once price touches the entry (midpoint) from the candle
+        # after candle 3 on, or the current close has fallen completely
+        # through the gap
+        bullish = next_low > prev_high
+        bullish &= ~(current_close < prev_high)
+        gaps = np.flatnonzero(bullish)
+        bullish[gaps] = ~self.kernels.touched_after(lows_arr, third[gaps] + 1,
+                                                    (next_low[gaps] + prev_high[gaps]) / 2, True, rmq)
+        
+        # Bearish FVG: Candle 1 (i-2) Low > Candle 3 (i) High
+        bearish = next_high < prev_low
+        bearish &= ~(current_close > prev_low)
+        gaps = np.flatnonzero(bearish)
+        bearish[gaps] = ~self.kernels.touched_after(highs_arr, third[gaps] + 1,
+                                                    (prev_low[gaps] + next_high[gaps]) / 2, False, rmq)
+        
+        # Sort by index (bullish first on ties) and take only the last 10
+        # to avoid clutter
+        keys = np.concatenate([third[bullish] * 2, third[bearish] * 2 + 1])
+        keys.sort()
+        
+        if columnar:
+            keys = keys[-10:]
+            third = keys // 2
+            is_bullish = keys % 2 == 0
+            zone_high = np.where(is_bullish, lows_arr[third], lows_arr[third - 2])
+            zone_low = np.where(is_bullish, highs_arr[third - 2], highs_arr[third])
+            type_code = np.where(is_bullish, TYPE_CODES['bullish_fvg'], TYPE_CODES['bearish_fvg'])
+            return DetectionColumns(third - 1, type_code, FVG_LAYOUT, high=zone_high, low=zone_low,
+                                    extra={'entry': (zone_high + zone_low) / 2})
+        
+        active_fvg_zones = []
+        for key in keys[-10:].tolist():
+            i = key // 2
+            if key % 2 == 0:
+                active_fvg_zones.append({
                     'index': i-1,
                     'type': 'bullish_fvg',
-                    'high': next_low,  # Upper bound of gap
-                    'low': prev_high,  # Lower bound of gap
-                    'entry': (next_low + prev_high) / 2,
+                    'high': lows[i],  # Upper bound of gap
+                    'low': highs[i-2],  # Lower bound of gap
+                    'entry': (lows[i] + highs[i-2]) / 2,
                     'mitigated': False
                 })
-            
-            # Bearish FVG: gap between previous candle and next candle
-            # Candle 1 (i-2) Low > Candle 3 (i) High
-            prev_low = lows[i-2]
-            next_high = highs[i]
-            
-            # Check for bearish FVG
-            if next_high < prev_low:
-                fvg_zones.append({
+            else:
+                active_fvg_zones.append({
                     'index': i-1,
                     'type': 'bearish_fvg',
-                    'high': prev_low,  # Upper bound of gap
-                    'low': next_high,  # Lower bound of gap
-                    'entry': (prev_low + next_high) / 2,
+                    'high': lows[i-2],  # Upper bound of gap
+                    'low': highs[i],  # Lower bound of gap
+                    'entry': (lows[i-2] + highs[i]) / 2,
                     'mitigated': False
                 })
         
-        # Filter mitigated FVGs
-        active_fvg_zones = []
-        
-        for zone in fvg_zones:
-            is_mitigated = False
-            # Check if any subsequent candle filled the gap
-            # Ideally we check all candles from zone['index'] + 2 to end
-            # For performance, we can just check if current price is beyond the gap or if recent price action filled it
-            
-            start_check_index = zone['index'] + 2
-            if start_check_index < len(highs):
-                # Simple mitigation check: 
-                # For Bullish FVG: if any subsequent Low is lower than the gap High (next_low)
-                # For Bearish FVG: if any subsequent High is higher than the gap Low (next_high)
-                
-                if zone['type'] == 'bullish_fvg':
-                    # Gap is between low (prev_high) and high (next_low)
-                    # If price drops below the top of the gap, it's starting to be mitigated.
-                    # Fully mitigated if it drops below the bottom.
-                    # For now, let's consider it mitigated if price touches the entry (midpoint) or goes below
-                    
-                    # Optimization: Just check the most recent candles or if current price is below the gap
-                    if closes[-1] < zone['low']: # Price completely fell through
-                         is_mitigated = True
-                    
-                    # More precise check: iterate through subsequent candles
-                    for k in range(start_check_index, len(lows)):
-                        if lows[k] <= zone['entry']: # Touched entry
-                            is_mitigated = True
-                            break
-
-                elif zone['type'] == 'bearish_fvg':
-                    if closes[-1] > zone['high']: # Price completely rose through
-                        is_mitigated = True
-                    
-                    for k in range(start_check_index, len(highs)):
-                        if highs[k] >= zone['entry']: # Touched entry
-                            is_mitigated = True
-                            break
-            
-            if not is_mitigated:
-                active_fvg_zones.append(zone)
-        
-        # Sort by index and take only the last 5-10 to avoid clutter
-        active_fvg_zones.sort(key=lambda x: x['index'])
-        return active_fvg_zones[-10:]
+        return active_fvg_zones
     
     def detect_order_blocks(self, highs: List[float], lows: List[float], swing_highs: List[Dict], swing_lows: List[Dict]) -> List[Dict]:
         """
         Detect order blocks based on swing points
         """
+        if isinstance(swing_highs, DetectionColumns):
+            # Every swing but the first; keep the last 5 of each type
+            bullish = swing_lows[max(1, len(swing_lows) - 5):]
+            bearish = swing_highs[max(1, len(swing_highs) - 5):]
+            return DetectionColumns.concatenate([
+                DetectionColumns.of_type(type_name, swings.index, ORDER_BLOCK_LAYOUT, price=swings.price,
+                                         high=swings.high, low=swings.low)
+                for type_name, swings in (('bullish_order_block', bullish), ('bearish_order_block', bearish))
+            ])
+        
         order_blocks = []
         
         # Look for order blocks after swing highs/lows that held as support/resistance
@@ -304,10 +347,28 @@ class SMCEngine:
         
         return active_order_blocks
     
+    def detect_liquidity_pools(self, highs: List[float], lows: List[float], closes: List[float],
+                               swing_highs: List[Dict], swing_lows: List[Dict], columnar: bool = False,
+                               rmq: Optional[RangeExtremaIndex] = None) -> List[Dict]:
+        """
+        Detect equal highs/lows (resting liquidity pools) among the swings,
+        see smc_engine.liquidity.LiquidityPoolDetector
+        """
+        return LiquidityPoolDetector().detect_liquidity_pools(highs, lows, closes, swing_highs, swing_lows,
+                                                              columnar=columnar, rmq=rmq)
+    
     def detect_liquidity_sweeps(self, highs: List[float], lows: List[float], swing_highs: List[Dict], swing_lows: List[Dict]) -> List[Dict]:
         """
         Detect liquidity sweeps (wicks that touch swing points)
         """
+        if isinstance(swing_highs, DetectionColumns):
+            highs_arr = np.asarray(highs, dtype=np.float64)
+            lows_arr = np.asarray(lows, dtype=np.float64)
+            return DetectionColumns.concatenate([
+                self._sweep_columns(highs_arr, lows_arr, swing_highs, 'liquidity_sweep_high'),
+                self._sweep_columns(highs_arr, lows_arr, swing_lows, 'liquidity_sweep_low')
+            ])
+        
         liquidity_sweeps = []
         
         # Check for liquidity sweeps at swing points
@@ -337,6 +398,24 @@ class SMCEngine:
         
         return liquidity_sweeps
     
+    def _sweep_columns(self, highs: np.ndarray, lows: np.ndarray, swings: DetectionColumns,
+                       sweep_type: str) -> DetectionColumns:
+        """
+        Columnar sweeps: every swing is checked against the 10 candles around
+        it at once, in the same (swing, candle) order as the loops
+        """
+        candles = swings.index[:, None] + np.arange(-5, 5)
+        valid = (candles >= 0) & (candles < len(highs))
+        safe = np.clip(candles, 0, max(len(highs) - 1, 0))
+        level = swings.price[:, None]
+        if sweep_type == 'liquidity_sweep_high':
+            swept = valid & (highs[safe] >= level) & (lows[safe] < level)
+        else:
+            swept = valid & (lows[safe] <= level) & (highs[safe] > level)
+        rows, cols = np.nonzero(swept)
+        return DetectionColumns.of_type(sweep_type, candles[rows, cols], SWEEP_LAYOUT,
+                                        price=swings.price[rows])
+    
     def calculate_fibonacci_levels(self, start_price: float, end_price: float) -> Dict[float, float]:
         """
         Calculate fibonacci retracement levels
@@ -373,43 +452,229 @@ class SMCEngine:
         else:
             return "RANGE"
     
-    def analyze_market_structure(self, df: pd.DataFrame) -> Dict:
+    def analyze_market_structure(self, df: 'pd.DataFrame', columnar: bool = False, lazy: bool = False) -> Dict:
         """
-        Main analysis function that combines all SMC elements
+        Main analysis function that combines all SMC elements.
+        With columnar=True the detection lists are DetectionColumns; use
+        smc_engine.columnar.materialize() to get the dict shape back.
+        With lazy=True the result is an SMCAnalysis that only runs the
+        detectors behind the keys that are read.
         """
-        highs = df['high'].tolist()
-        lows = df['low'].tolist()
-        closes = df['close'].tolist()
-        opens = df['open'].tolist()
+        if columnar:
+            return self.analyze_arrays(df['open'].to_numpy(), df['high'].to_numpy(), df['low'].to_numpy(),
+                                       df['close'].to_numpy(), columnar=True, lazy=lazy)
         
-        # Detect swings
-        swing_highs, swing_lows = self.detect_swings(highs, lows)
-        
-        # Detect fractals
-        bullish_fractals, bearish_fractals = self.detect_fractals(highs, lows)
+        return self._analyze(df['open'].tolist(), df['high'].tolist(), df['low'].tolist(),
+                             df['close'].tolist(), columnar=False, lazy=lazy)
+    
+    def analyze_arrays(self, open, high, low, close, volume=None, columnar: bool = False,
+                       extrema: Optional[Dict[int, Tuple[np.ndarray, np.ndarray]]] = None,
+                       rmq: Optional[RangeExtremaIndex] = None, zones: Optional[ZoneStore] = None,
+                       lazy: bool = False) -> Dict:
+        """
+        Same analysis as `analyze_market_structure`, straight from price
+        buffers (lists, NumPy arrays or anything with the buffer protocol)
+        without building a DataFrame. Volume is accepted for symmetry with
+        the OHLCV payloads; the SMC rules do not use it.
         
-        # Detect BOS/CHOCH
-        bos_choch = self.detect_bos_choch(swing_highs, swing_lows)
+        `extrema` maps a lookback from `extrema_lookbacks` to precomputed
+        (high, low) extreme indices of this window; missing ones are computed.
+        `rmq` is a range index over exactly these highs/lows (e.g. one kept
+        up to date with `append` while streaming); it is built when omitted.
+        `zones` is a ZoneStore that receives the active FVGs and order blocks.
+        `lazy` returns an SMCAnalysis instead of the dict.
+        """
+        opens = np.ascontiguousarray(open, dtype=np.float64)
+        highs = np.ascontiguousarray(high, dtype=np.float64)
+        lows = np.ascontiguousarray(low, dtype=np.float64)
+        closes = np.ascontiguousarray(close, dtype=np.float64)
+        lengths = {len(opens), len(highs), len(lows), len(closes)}
+        if volume is not None:
+            lengths.add(len(volume))
+        if len(lengths) != 1:
+            raise ValueError("All price arrays must have the same length")
+        if rmq is not None and len(rmq) != len(highs):
+            raise ValueError("Range index does not cover the price arrays")
         
-        # Detect FVGs
-        fvg_zones = self.detect_fvg(opens, highs, lows, closes)
+        if not columnar:
+            opens, highs, lows, closes = opens.tolist(), highs.tolist(), lows.tolist(), closes.tolist()
+        return self._analyze(opens, highs, lows, closes, columnar=columnar, extrema=extrema, rmq=rmq, zones=zones,
+                             lazy=lazy)
+    
+    def _analyze(self, opens, highs, lows, closes, columnar: bool,
+                 extrema: Optional[Dict[int, Tuple[np.ndarray, np.ndarray]]] = None,
+                 rmq: Optional[RangeExtremaIndex] = None, zones: Optional[ZoneStore] = None,
+                 lazy: bool = False):
+        known = {} if rmq is None else {'rmq': rmq}
+        analysis = SMCAnalysis(self, opens, highs, lows, closes, columnar=columnar, extrema=extrema, **known)
         
-        # Detect order blocks
-        order_blocks = self.detect_order_blocks(highs, lows, swing_highs, swing_lows)
+        if zones is not None:
+            zones.add([*analysis.fvg_zones, *analysis.order_blocks])
         
-        # Detect liquidity sweeps
-        liquidity_sweeps = self.detect_liquidity_sweeps(highs, lows, swing_highs, swing_lows)
+        return analysis if lazy else analysis.to_dict()
+    
+    def label_history(self, df: 'pd.DataFrame') -> Dict[str, np.ndarray]:
+        """
+        What `analyze_market_structure` would have said at every bar, using
+        only the candles up to that bar (no lookahead). Computed in a single
+        forward pass with IncrementalSMCEngine instead of one analysis per
+        prefix. Missing entry/sl/tp are NaN.
+        """
+        n = len(df)
+        labels = {
+            'trend': np.empty(n, dtype='<U7'),
+            'bias': np.empty(n, dtype='<U7'),
+            'entry': np.full(n, np.nan),
+            'sl': np.full(n, np.nan),
+            'tp': np.full(n, np.nan),
+            'fvg_count': np.zeros(n, dtype=np.int64),
+            'order_block_count': np.zeros(n, dtype=np.int64),
+            'liquidity_swept': np.zeros(n, dtype=bool)
+        }
         
-        # Determine trend
-        trend = self.detect_trend(closes)
+        stream = IncrementalSMCEngine()
+        candles = zip(df['high'].tolist(), df['low'].tolist(), df['close'].tolist())
+        for i, (high, low, close) in enumerate(candles):
+            stream._push(high, low, close)
+            signal = stream.current_signal()
+            for key, values in labels.items():
+                if signal[key] is not None:
+                    values[i] = signal[key]
         
+        return labels
+    
+    def _compose_analysis(self, closes: List[float], swing_highs: List[Dict], swing_lows: List[Dict],
+                          bullish_fractals: List[Dict], bearish_fractals: List[Dict], bos_choch: Dict,
+                          fvg_zones: List[Dict], order_blocks: List[Dict], liquidity_sweeps: List[Dict]) -> 'SMCAnalysis':
+        """
+        Combine detected SMC elements into trend, bias, entry, SL and TP.
+        Only the last 20 closes are read, so callers may pass just that tail.
+        The result is an SMCAnalysis; call `to_dict()` for the plain dict.
+        """
+        return SMCAnalysis(self, closes=closes, swings=(swing_highs, swing_lows),
+                           fractal_points=(bullish_fractals, bearish_fractals), bos_choch=bos_choch,
+                           fvg_zones=fvg_zones, order_blocks=order_blocks, liquidity_sweeps=liquidity_sweeps)
+
+
+class SMCAnalysis(LazyResult):
+    """
+    Result of SMCEngine's analysis with every part computed on first
+    access. Reading `bias` runs the swing and BOS/CHOCH detection it needs,
+    then FVGs and order blocks only if no structure break decided it;
+    fractals and liquidity sweeps are only detected when read. It is a
+    mapping with the keys of `analyze_market_structure`'s dict, and
+    `to_dict()` (or materialize) returns that dict.
+    """
+    
+    def __init__(self, engine: SMCEngine, opens=None, highs=None, lows=None, closes=None, columnar: bool = False,
+                 extrema: Optional[Dict[int, Tuple[np.ndarray, np.ndarray]]] = None, **known):
+        super().__init__(**known)
+        self._engine = engine
+        self._opens, self._highs, self._lows, self._closes = opens, highs, lows, closes
+        self._columnar = columnar
+        self._extrema = extrema or {}
+    
+    @lazy_field()
+    def rmq(self) -> Optional[RangeExtremaIndex]:
+        # Range max/min index shared by every detector, built once; only
+        # backends with range queries use it
+        if not self._engine.kernels.range_queries:
+            return None
+        return RangeExtremaIndex(self._highs, self._lows)
+    
+    @lazy_field()
+    def swings(self) -> Tuple:
+        # Extrema passed in (e.g. resumed) are reused; each lookback is only
+        # scanned when its own field is read
+        lookback = self._engine.extrema_lookbacks[0]
+        return self._engine.detect_swings(self._highs, self._lows, lookback, columnar=self._columnar,
+                                          indices=self._extrema.get(lookback), rmq=self.rmq)
+    
+    @lazy_field()
+    def fractal_points(self) -> Tuple:
+        lookback = self._engine.extrema_lookbacks[1]
+        return self._engine.detect_fractals(self._highs, self._lows, lookback, columnar=self._columnar,
+                                            indices=self._extrema.get(lookback), rmq=self.rmq)
+    
+    @lazy_field()
+    def bos_choch(self) -> Dict:
+        return self._engine.detect_bos_choch(*self.swings, self._closes)
+    
+    @lazy_field()
+    def recent_closes(self) -> List[float]:
+        # The composition reads at most the last 20 closes
+        if self._columnar:
+            return self._closes[-20:].tolist()
+        return self._closes
+    
+    @lazy_field('trend')
+    def trend(self) -> str:
+        return self._engine.detect_trend(self.recent_closes)
+    
+    @lazy_field('bos')
+    def bos(self) -> Dict:
+        return {
+            "bullish": self.bos_choch['bullish_bos'],
+            "bearish": self.bos_choch['bearish_bos']
+        }
+    
+    @lazy_field('choch')
+    def choch(self) -> Dict:
+        return {
+            "bullish": self.bos_choch['bullish_choch'],
+            "bearish": self.bos_choch['bearish_choch']
+        }
+    
+    @lazy_field('fvgZones')
+    def fvg_zones(self):
+        return self._engine.detect_fvg(self._opens, self._highs, self._lows, self._closes,
+                                       columnar=self._columnar, rmq=self.rmq)
+    
+    @lazy_field('orderBlocks')
+    def order_blocks(self):
+        return self._engine.detect_order_blocks(self._highs, self._lows, *self.swings)
+    
+    @lazy_field('liquiditySwept')
+    def liquidity_swept(self) -> bool:
+        return len(self.liquidity_sweeps) > 0
+    
+    @lazy_field('liquiditySweeps')
+    def liquidity_sweeps(self):
+        return self._engine.detect_liquidity_sweeps(self._highs, self._lows, *self.swings)
+    
+    @lazy_field('fractals')
+    def fractals(self) -> Dict:
+        bullish_fractals, bearish_fractals = self.fractal_points
+        return {
+            "bullish": bearish_fractals,
+            "bearish": bullish_fractals
+        }
+    
+    @lazy_field('swingPoints')
+    def swing_points(self) -> Dict:
+        swing_highs, swing_lows = self.swings
+        return {
+            "highs": swing_highs,
+            "lows": swing_lows
+        }
+    
+    @lazy_field('fibonacciLevels')
+    def fibonacci_levels(self) -> Dict[float, float]:
         # Calculate fibonacci levels based on recent swing points
-        fib_levels = {}
+        swing_highs, swing_lows = self.swings
         if len(swing_highs) > 0 and len(swing_lows) > 0:
             # Use the most recent swing high and low for fibonacci calculation
-            recent_swing_high = max(swing_highs, key=lambda x: x['index'])['price']
-            recent_swing_low = max(swing_lows, key=lambda x: x['index'])['price']
-            fib_levels = self.calculate_fibonacci_levels(recent_swing_low, recent_swing_high)
+            # (swings are listed in index order)
+            recent_swing_high = swing_highs[-1]['price']
+            recent_swing_low = swing_lows[-1]['price']
+            return self._engine.calculate_fibonacci_levels(recent_swing_low, recent_swing_high)
+        return {}
+    
+    @lazy_field()
+    def signal(self) -> Dict:
+        closes = self.recent_closes
+        swing_highs, swing_lows = self.swings
+        bos_choch = self.bos_choch
         
         # Determine signal bias
         bias = "NEUTRAL"
@@ -426,11 +691,11 @@ class SMCEngine:
                 entry = recent_bos['price']
                 # Find the most recent swing low for stop loss
                 if len(swing_lows) > 0:
-                    recent_swing_low = max(swing_lows, key=lambda x: x['index'])
+                    recent_swing_low = swing_lows[-1]
                     sl = recent_swing_low['price'] - (abs(recent_bos['price'] - recent_swing_low['price']) * 0.2)  # 20% below for safety
                 # Take profit at next fibonacci level or 2:1 risk reward
-                if 0.618 in fib_levels:
-                    tp = fib_levels[0.618]
+                if 0.618 in self.fibonacci_levels:
+                    tp = self.fibonacci_levels[0.618]
                 else:
                     tp = entry + 2 * abs(entry - sl) if sl else entry + (recent_bos['price'] - closes[-1]) * 2
         
@@ -442,11 +707,11 @@ class SMCEngine:
                 entry = recent_bos['price']
                 # Find the most recent swing high for stop loss
                 if len(swing_highs) > 0:
-                    recent_swing_high = max(swing_highs, key=lambda x: x['index'])
+                    recent_swing_high = swing_highs[-1]
                     sl = recent_swing_high['price'] + (abs(recent_swing_high['price'] - recent_bos['price']) * 0.2)  # 20% above for safety
                 # Take profit at next fibonacci level or 2:1 risk reward
-                if 0.382 in fib_levels and fib_levels[0.382] < entry:
-                    tp = fib_levels[0.382]
+                if 0.382 in self.fibonacci_levels and self.fibonacci_levels[0.382] < entry:
+                    tp = self.fibonacci_levels[0.382]
                 else:
                     tp = entry - 2 * abs(entry - sl) if sl else entry - (closes[-1] - recent_bos['price']) * 2
         
@@ -465,9 +730,9 @@ class SMCEngine:
                     entry = recent_choch['price']
         
         # Check for FVG signals
-        if bias == "NEUTRAL" and len(fvg_zones) > 0:
+        if bias == "NEUTRAL" and len(self.fvg_zones) > 0:
             # Look for most recent FVG
-            recent_fvg = fvg_zones[-1]
+            recent_fvg = self.fvg_zones[-1]
             if recent_fvg['type'] == 'bullish_fvg' and closes[-1] > recent_fvg['low']:
                 bias = "BUY"
                 entry = recent_fvg['entry']
@@ -476,9 +741,9 @@ class SMCEngine:
                 entry = recent_fvg['entry']
         
         # Check for order block signals
-        if bias == "NEUTRAL" and len(order_blocks) > 0:
+        if bias == "NEUTRAL" and len(self.order_blocks) > 0:
             # Look for most recently formed order block
-            recent_ob = order_blocks[-1]
+            recent_ob = self.order_blocks[-1]
             if recent_ob['type'] == 'bullish_order_block' and closes[-1] > recent_ob['price']:
                 bias = "BUY"
                 entry = recent_ob['price']
@@ -486,8 +751,31 @@ class SMCEngine:
                 bias = "SELL"
                 entry = recent_ob['price']
         
-        # Determine liquidity sweep status
-        liquidity_swept = len(liquidity_sweeps) > 0
+        return {"bias": bias, "entry": entry, "sl": sl, "tp": tp}
+    
+    @lazy_field('bias')
+    def bias(self) -> str:
+        return self.signal['bias']
+    
+    @lazy_field('entry')
+    def entry(self) -> Optional[float]:
+        return self.signal['entry']
+    
+    @lazy_field('sl')
+    def sl(self) -> Optional[float]:
+        return self.signal['sl']
+    
+    @lazy_field('tp')
+    def tp(self) -> Optional[float]:
+        return self.signal['tp']
+    
+    @lazy_field('current_price')
+    def current_price(self) -> float:
+        return self.recent_closes[-1]
+    
+    @lazy_field('explanation')
+    def explanation(self) -> str:
+        bos_choch = self.bos_choch
         
         # Create explanation
         explanation_parts = []
@@ -495,49 +783,343 @@ class SMCEngine:
             explanation_parts.append("Bullish BOS detected")
         if len(bos_choch['bearish_bos']) > 0:
             explanation_parts.append("Bearish BOS detected")
-        if len(fvg_zones) > 0:
+        if len(self.fvg_zones) > 0:
             explanation_parts.append("FVG zones identified")
-        if len(order_blocks) > 0:
+        if len(self.order_blocks) > 0:
             explanation_parts.append("Order blocks detected")
-        if liquidity_swept:
+        if self.liquidity_swept:
             explanation_parts.append("Recent liquidity sweep")
         
-        explanation = "; ".join(explanation_parts) if explanation_parts else "No clear SMC patterns detected"
+        return "; ".join(explanation_parts) if explanation_parts else "No clear SMC patterns detected"
+
+
+class IncrementalSMCEngine(SMCEngine):
+    """
+    Streaming variant of SMCEngine that is fed one candle at a time.
+
+    Swings and fractals are confirmed as soon as their right-hand window is
+    complete (lookback bars later), BOS/CHOCH, order blocks and liquidity
+    sweeps are extended from each confirmed swing, and open FVGs are kept in
+    entry-ordered heaps so every touch is popped exactly once. Each update
+    only reads a fixed window of recent bars, so its cost does not grow with
+    history length. `current_analysis()` returns the same dict as
+    `analyze_market_structure` over every candle seen so far.
+    """
+    
+    def __init__(self, swing_lookback: int = 5, fractal_lookback: int = 2, sweep_radius: int = 5):
+        super().__init__()
+        if sweep_radius > swing_lookback + 1:
+            # Sweeps would reach bars that arrive after the swing is confirmed
+            raise ValueError("sweep_radius cannot exceed swing_lookback + 1")
+        self.swing_lookback = swing_lookback
+        self.fractal_lookback = fractal_lookback
+        self.extrema_lookbacks = (swing_lookback, fractal_lookback)
+        self.sweep_radius = sweep_radius
+        self.reset()
+    
+    def reset(self):
+        """
+        Forget all candles and detected structure
+        """
+        # Enough bars for the widest extreme test, the sweep scan back from
+        # a swing confirmed swing_lookback bars after it, and the FVG pattern
+        # with the candle after it
+        window = max(2 * self.swing_lookback + 1, 2 * self.fractal_lookback + 1,
+                     self.swing_lookback + self.sweep_radius + 1, 4)
+        self.count = 0
+        self._highs = deque(maxlen=window)
+        self._lows = deque(maxlen=window)
+        # Last 20 closes for the analysis, and enough to look back over a
+        # swing's confirmation window for the close that broke it
+        self._closes = deque(maxlen=max(20, self.swing_lookback + 1))
+        
+        self._swing_highs = []
+        self._swing_lows = []
+        self._bullish_fractals = []
+        self._bearish_fractals = []
+        self._bos_choch = {
+            'bullish_bos': [],
+            'bearish_bos': [],
+            'bullish_choch': [],
+            'bearish_choch': []
+        }
+        self._high_sweeps = []
+        self._low_sweeps = []
+        
+        # Break of every swing level: fields per (direction, swing index),
+        # unbroken levels in heaps ordered by how soon a close crosses them,
+        # and the BOS/CHOCH slots waiting for that break
+        self._level_breaks = {}
+        self._pending_breaks = {'bullish': [], 'bearish': []}
+        self._break_events = {}
         
+        # Untouched FVGs in (index, type) order, plus heaps ordered by how
+        # soon price reaches their entry
+        self._open_fvgs = {}
+        self._bullish_fvg_heap = []
+        self._bearish_fvg_heap = []
+    
+    def _bar(self, series: deque, index: int) -> float:
+        position = index - (self.count - len(series))
+        if not 0 <= position < len(series):
+            # A negative position would silently wrap to the newest bars
+            raise IndexError(f"Bar {index} is outside the kept window of {len(series)} bars")
+        return series[position]
+    
+    def update(self, candle: Dict) -> None:
+        """
+        Append one closed candle (mapping with open/high/low/close)
+        """
+        self._push(candle['high'], candle['low'], candle['close'])
+    
+    def _push(self, high: float, low: float, close: float) -> None:
+        self._highs.append(high)
+        self._lows.append(low)
+        self._closes.append(close)
+        self.count += 1
+        
+        last = self.count - 1
+        self._resolve_breaks(last, close)
+        self._confirm_swing(last - self.swing_lookback)
+        self._confirm_fractal(last - self.fractal_lookback)
+        self._add_fvg(last - 1)
+        self._mitigate_fvgs(self._highs[-1], self._lows[-1])
+    
+    def extend(self, candles) -> None:
+        """
+        Append several candles, either an iterable of mappings or a DataFrame
+        """
+        if hasattr(candles, 'columns'):
+            candles = candles[['open', 'high', 'low', 'close']].to_dict('records')
+        for candle in candles:
+            self.update(candle)
+    
+    def _is_extreme(self, i: int, lookback: int) -> Tuple[bool, bool]:
+        high_i = self._bar(self._highs, i)
+        low_i = self._bar(self._lows, i)
+        is_high = True
+        is_low = True
+        for j in range(i - lookback, i + lookback + 1):
+            if high_i < self._bar(self._highs, j):
+                is_high = False
+            if low_i > self._bar(self._lows, j):
+                is_low = False
+        return is_high, is_low
+    
+    def _confirm_swing(self, i: int) -> None:
+        if i < self.swing_lookback:
+            return
+        is_high, is_low = self._is_extreme(i, self.swing_lookback)
+        high_i = self._bar(self._highs, i)
+        low_i = self._bar(self._lows, i)
+        
+        if is_high:
+            swing = {'index': i, 'price': high_i, 'high': high_i, 'low': low_i, 'time': i}
+            self._append_swing(self._swing_highs, swing, 'bullish')
+            self._track_break(swing, 'bullish')
+            self._high_sweeps.extend(self._sweeps_at(swing, 'liquidity_sweep_high'))
+        if is_low:
+            swing = {'index': i, 'price': low_i, 'high': high_i, 'low': low_i, 'time': i}
+            self._append_swing(self._swing_lows, swing, 'bearish')
+            self._track_break(swing, 'bearish')
+            self._low_sweeps.extend(self._sweeps_at(swing, 'liquidity_sweep_low'))
+    
+    def _append_swing(self, swings: List[Dict], swing: Dict, direction: str) -> None:
+        if swings:
+            previous = swings[-1]['price']
+            broke = swing['price'] > previous if direction == 'bullish' else swing['price'] < previous
+            if broke:
+                key = (direction, swings[-1]['index'])
+                fields = self._level_breaks[key]
+                for kind in ('bos', 'choch'):
+                    events = self._bos_choch[f'{direction}_{kind}']
+                    if fields['break_index'] is None:
+                        self._break_events.setdefault(key, []).append((events, len(events)))
+                    events.append({
+                        'index': swing['index'],
+                        'price': swing['price'],
+                        'previous_price': previous,
+                        'type': f'{direction}_{kind}',
+                        **fields
+                    })
+        swings.append(swing)
+    
+    def _crosses(self, close: float, level: float, direction: str) -> bool:
+        return close > level if direction == 'bullish' else close < level
+    
+    def _track_break(self, swing: Dict, direction: str) -> None:
+        # The confirmation window after the swing is still buffered; if no
+        # close in it crossed the level, later closes resolve it from the heap
+        i, level = swing['index'], swing['price']
+        for k in range(i + 1, self.count):
+            close = self._bar(self._closes, k)
+            if self._crosses(close, level, direction):
+                self._level_breaks[(direction, i)] = {'break_index': k, 'break_close': close}
+                return
+        self._level_breaks[(direction, i)] = {'break_index': None, 'break_close': None}
+        if level == level:  # NaN levels never break
+            heapq.heappush(self._pending_breaks[direction], (level if direction == 'bullish' else -level, i))
+    
+    def _resolve_breaks(self, k: int, close: float) -> None:
+        # Lowest pending swing highs and highest pending swing lows first,
+        # so each level is popped exactly once, by the close that crossed it
+        for direction, sign in (('bullish', 1), ('bearish', -1)):
+            heap = self._pending_breaks[direction]
+            while heap and self._crosses(close, sign * heap[0][0], direction):
+                key = (direction, heapq.heappop(heap)[1])
+                fields = {'break_index': k, 'break_close': close}
+                self._level_breaks[key] = fields
+                # Replace rather than mutate, results already handed out keep their dicts
+                for events, position in self._break_events.pop(key, ()):
+                    events[position] = {**events[position], **fields}
+    
+    def _sweeps_at(self, swing: Dict, sweep_type: str) -> List[Dict]:
+        sweeps = []
+        price = swing['price']
+        for i in range(max(0, swing['index'] - self.sweep_radius), swing['index'] + self.sweep_radius):
+            high_i = self._bar(self._highs, i)
+            low_i = self._bar(self._lows, i)
+            if sweep_type == 'liquidity_sweep_high':
+                swept = high_i >= price and low_i < price
+            else:
+                swept = low_i <= price and high_i > price
+            if swept:
+                sweeps.append({'index': i, 'type': sweep_type, 'price': price, 'candle_index': i})
+        return sweeps
+    
+    def _confirm_fractal(self, i: int) -> None:
+        if i < self.fractal_lookback:
+            return
+        is_high, is_low = self._is_extreme(i, self.fractal_lookback)
+        high_i = self._bar(self._highs, i)
+        low_i = self._bar(self._lows, i)
+        if is_low:
+            self._bearish_fractals.append({'index': i, 'price': low_i, 'type': 'bullish', 'high': high_i, 'low': low_i})
+        if is_high:
+            self._bullish_fractals.append({'index': i, 'price': high_i, 'type': 'bearish', 'high': high_i, 'low': low_i})
+    
+    def _add_fvg(self, i: int) -> None:
+        # Candle 3 of a pattern only counts once a later candle exists
+        if i < 2:
+            return
+        prev_high = self._bar(self._highs, i - 2)
+        prev_low = self._bar(self._lows, i - 2)
+        next_high = self._bar(self._highs, i)
+        next_low = self._bar(self._lows, i)
+        
+        if next_low > prev_high:
+            key = (i, 0)
+            self._open_fvgs[key] = {
+                'index': i-1,
+                'type': 'bullish_fvg',
+                'high': next_low,
+                'low': prev_high,
+                'entry': (next_low + prev_high) / 2,
+                'mitigated': False
+            }
+            heapq.heappush(self._bullish_fvg_heap, (-self._open_fvgs[key]['entry'], key))
+        
+        if next_high < prev_low:
+            key = (i, 1)
+            self._open_fvgs[key] = {
+                'index': i-1,
+                'type': 'bearish_fvg',
+                'high': prev_low,
+                'low': next_high,
+                'entry': (prev_low + next_high) / 2,
+                'mitigated': False
+            }
+            heapq.heappush(self._bearish_fvg_heap, (self._open_fvgs[key]['entry'], key))
+    
+    def _mitigate_fvgs(self, high: float, low: float) -> None:
+        # Bullish gaps are filled once a low touches their entry, highest
+        # entries first; bearish gaps once a high does, lowest entries first
+        while self._bullish_fvg_heap and -self._bullish_fvg_heap[0][0] >= low:
+            del self._open_fvgs[heapq.heappop(self._bullish_fvg_heap)[1]]
+        while self._bearish_fvg_heap and self._bearish_fvg_heap[0][0] <= high:
+            del self._open_fvgs[heapq.heappop(self._bearish_fvg_heap)[1]]
+    
+    def _active_fvgs(self, current_close: float) -> List[Dict]:
+        active = []
+        for zone in reversed(self._open_fvgs.values()):
+            if zone['type'] == 'bullish_fvg' and current_close < zone['low']:
+                continue
+            if zone['type'] == 'bearish_fvg' and current_close > zone['high']:
+                continue
+            active.append(zone)
+            if len(active) == 10:
+                break
+        active.reverse()
+        return active
+    
+    def _order_blocks(self) -> List[Dict]:
+        order_blocks = [{
+            'index': swing['index'],
+            'type': 'bullish_order_block',
+            'high': swing['high'],
+            'low': swing['low'],
+            'price': swing['price'],
+            'mitigated': False
+        } for swing in self._swing_lows[max(1, len(self._swing_lows) - 5):]]
+        order_blocks.extend({
+            'index': swing['index'],
+            'type': 'bearish_order_block',
+            'high': swing['high'],
+            'low': swing['low'],
+            'price': swing['price'],
+            'mitigated': False
+        } for swing in self._swing_highs[max(1, len(self._swing_highs) - 5):])
+        return order_blocks
+    
+    def _bos_choch_lists(self, keep: Optional[int] = None) -> Dict:
+        if len(self._swing_highs) < 2 or len(self._swing_lows) < 2:
+            return {key: [] for key in self._bos_choch}
+        if keep is None:
+            return {key: list(events) for key, events in self._bos_choch.items()}
+        return {key: events[-keep:] for key, events in self._bos_choch.items()}
+    
+    def current_analysis(self) -> Dict:
+        """
+        Same result as `analyze_market_structure` over all candles seen so far
+        """
+        closes = list(self._closes)
+        fvg_zones = self._active_fvgs(closes[-1]) if closes else []
+        liquidity_sweeps = self._high_sweeps + self._low_sweeps
+        
+        return self._compose_analysis(closes, list(self._swing_highs), list(self._swing_lows),
+                                      list(self._bullish_fractals), list(self._bearish_fractals),
+                                      self._bos_choch_lists(), fvg_zones, self._order_blocks(),
+                                      liquidity_sweeps).to_dict()
+    
+    def current_signal(self) -> Dict:
+        """
+        Trend, bias, entry, SL, TP and active zone counts of
+        `current_analysis()`. The bias logic only reads the most recent item
+        of each list, so only those are passed and the cost stays constant.
+        """
+        closes = list(self._closes)
+        fvg_zones = self._active_fvgs(closes[-1])
+        order_blocks = self._order_blocks()
+        liquidity_sweeps = self._high_sweeps[-1:] + self._low_sweeps[-1:]
+        
+        result = self._compose_analysis(closes, self._swing_highs[-1:], self._swing_lows[-1:], [], [],
+                                        self._bos_choch_lists(keep=1), fvg_zones, order_blocks, liquidity_sweeps)
         return {
-            "trend": trend,
-            "bos": {
-                "bullish": bos_choch['bullish_bos'],
-                "bearish": bos_choch['bearish_bos']
-            },
-            "choch": {
-                "bullish": bos_choch['bullish_choch'],
-                "bearish": bos_choch['bearish_choch']
-            },
-            "fvgZones": fvg_zones,
-            "orderBlocks": order_blocks,
-            "liquiditySwept": liquidity_swept,
-            "liquiditySweeps": liquidity_sweeps,
-            "fractals": {
-                "bullish": bearish_fractals,
-                "bearish": bullish_fractals
-            },
-            "swingPoints": {
-                "highs": swing_highs,
-                "lows": swing_lows
-            },
-            "fibonacciLevels": fib_levels,
-            "bias": bias,
-            "entry": entry,
-            "sl": sl,
-            "tp": tp,
-            "current_price": closes[-1],
-            "explanation": explanation
+            'trend': result['trend'],
+            'bias': result['bias'],
+            'entry': result['entry'],
+            'sl': result['sl'],
+            'tp': result['tp'],
+            'fvg_count': len(fvg_zones),
+            'order_block_count': len(order_blocks),
+            'liquidity_swept': result['liquiditySwept']
         }
 
 
 # For testing purposes
 def test_smc_engine():
+    import pandas as pd
+    
     # Create sample data
     np.random.seed(42)
     prices = 100 + np.cumsum(np.random.randn(100) * 0.1)
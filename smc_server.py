@@ -4,35 +4,62 @@ from typing import List, Dict, Any, Optional
 
 import numpy as np
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
 import pydantic
 from pydantic import BaseModel, Field
 from pydantic.v1 import validator
 
+from ai_engine.batching import BatchQueueFull, MicroBatcher
+from ai_engine.model_loader import ModelLoader
 from smc_engine import SMCEngine
-import pandas as pd
+from smc_engine.columnar import materialize
+from smc_engine.resume import PrefixResumer
+from smc_engine.registry import ZoneRegistry
 
 # Load existing model if available
 MODEL_PATH = Path(os.getenv('AI_MODEL_PATH', Path(__file__).resolve().parent / 'models' / 'model.h5'))
-model = None
-if MODEL_PATH.exists():
-    try:
-        from tensorflow.keras.models import load_model
-        model = load_model(MODEL_PATH)
-    except Exception as e:
-        print(f"Failed to load model: {e}. Using fallback mode.")
-else:
-    print("No model file found. Using fallback mode.")
+# TensorFlow when installed, else the NumPy engine (AI_MODEL_BACKEND selects);
+# loaded in the background once the app starts, see /ready
+model_loader = ModelLoader(MODEL_PATH, load=False)
+
+# Concurrent predictions share forward passes (AI_BATCH_MAX_SIZE / _MAX_WAIT_MS / _QUEUE_DEPTH)
+predict_batcher = MicroBatcher(lambda windows: model_loader.get_model().predict(windows, verbose=0))
 
 app = FastAPI(title="SMC + AI Trading Signal API", version="1.0.0")
 
+@app.on_event('startup')
+async def start_model_loading():
+    # Off the import path: /smc and /health are served while the model loads
+    model_loader.load_in_background()
+
+@app.on_event('shutdown')
+async def stop_predict_batcher():
+    # Cancels the batching worker instead of leaving it pending at exit
+    await predict_batcher.aclose()
+
 # Initialize SMC Engine
 smc_engine = SMCEngine()
 
+# Swing detection resumed from the previous window of each symbol
+window_resumer = PrefixResumer()
+
+# FVGs and order blocks kept per symbol/timeframe across requests
+zone_registry = ZoneRegistry()
+
 class SignalPayload(BaseModel):
     open: List[float] = Field(..., description="Open prices")
     high: List[float] = Field(..., description="High prices")
     low: List[float] = Field(..., description="Low prices")
     close: List[float] = Field(..., description="Close prices")
+    symbol: Optional[str] = Field(default=None, description="Instrument, used to reuse the previous window")
+    timeframe: Optional[str] = Field(default=None, description="Candle timeframe, keys the zone registry with symbol")
+
+def check_closes(closes) -> None:
+    """Raise ValueError unless there are at least 20 closes, all finite"""
+    if len(closes) < 20:
+        raise ValueError("Need at least 20 close prices for prediction")
+    if not np.isfinite(np.asarray(closes, dtype=np.float64)).all():
+        raise ValueError("All close prices must be finite numbers")
 
 class PredictPayload(BaseModel):
     closes: List[float] = Field(..., description="Chronological close prices")
@@ -40,10 +67,7 @@ class PredictPayload(BaseModel):
 
     @validator('closes')
     def validate_closes(cls, v):
-        if len(v) < 20:
-            raise ValueError("Need at least 20 close prices for prediction")
-        if any(not np.isfinite(price) for price in v):
-            raise ValueError("All close prices must be finite numbers")
+        check_closes(v)
         return v
 
 class SMCResponse(BaseModel):
@@ -58,6 +82,7 @@ class SMCResponse(BaseModel):
     sl: Optional[float] = None
     tp: Optional[float] = None
     explanation: str
+    activeZones: List[Dict[str, Any]] = Field(default_factory=list)
 
 class PredictResponse(BaseModel):
     signal: str
@@ -73,6 +98,7 @@ class FinalSignalResponse(BaseModel):
     sl: Optional[float] = None
     tp: Optional[float] = None
     explanation: str
+    timings: Dict[str, float] = Field(default_factory=dict, description="Milliseconds per SMC detector")
 
 def map_signal(prediction: float) -> str:
     """
@@ -117,6 +143,17 @@ def calculate_confidence(prediction: float) -> float:
     
     return float(min(1.0, max(0.0, confidence)))
 
+def window_key(payload: SignalPayload) -> Optional[tuple]:
+    """Key of the request's resume state and zones; anonymous requests have none"""
+    return (payload.symbol, payload.timeframe) if payload.symbol else None
+
+def track_zones(payload: SignalPayload, result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Update the symbol's zone registry with this window; anonymous requests keep no zones"""
+    key = window_key(payload)
+    if key is None:
+        return []
+    return zone_registry.update(key, payload.high, payload.low, result['fvgZones'] + result['orderBlocks'])
+
 def reshape_for_lstm(series: np.ndarray) -> np.ndarray:
     if series.ndim != 1:
         raise ValueError("Series must be 1-D before reshaping")
@@ -129,16 +166,9 @@ async def get_smc_analysis(payload: SignalPayload):
         if not (len(payload.open) == len(payload.high) == len(payload.low) == len(payload.close)):
             raise HTTPException(status_code=400, detail="All price arrays must have the same length")
         
-        # Create DataFrame from payload
-        df = pd.DataFrame({
-            'open': payload.open,
-            'high': payload.high,
-            'low': payload.low,
-            'close': payload.close
-        })
-        
-        # Perform SMC analysis
-        result = smc_engine.analyze_market_structure(df)
+        # Perform SMC analysis straight from the payload arrays
+        result = materialize(window_resumer.analyze(smc_engine, window_key(payload), payload.open, payload.high,
+                                                    payload.low, payload.close, columnar=True))
         
         return SMCResponse(
             trend=result['trend'],
@@ -151,25 +181,29 @@ async def get_smc_analysis(payload: SignalPayload):
             entry=result['entry'],
             sl=result['sl'],
             tp=result['tp'],
-            explanation=result['explanation']
+            explanation=result['explanation'],
+            activeZones=track_zones(payload, result)
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to analyze SMC: {str(e)}")
 
-@app.post('/predict', response_model=PredictResponse)
-async def predict(payload: PredictPayload):
+async def run_prediction(closes: np.ndarray, normalize: bool = True) -> PredictResponse:
+    """Score a close series (shared by /predict and /final)"""
+    if not model_loader.ready.is_set():
+        raise HTTPException(status_code=503, detail="AI model is still loading")
+    model = model_loader.get_model()
     if model is None:
         # Fallback mode: return NEUTRAL with a small random prediction
         prediction = np.random.normal(0, 0.1)
     else:
         try:
-            closes = np.asarray(payload.closes, dtype=np.float32)
-            if payload.normalize:
+            if normalize:
                 closes, _, _ = normalize_series(closes)
             else:
                 closes = closes.astype(np.float32)
-            reshaped = reshape_for_lstm(closes)
-            prediction = float(model.predict(reshaped, verbose=0).squeeze())
+            prediction = await predict_batcher.predict(reshape_for_lstm(closes)[0])
+        except BatchQueueFull as exc:
+            raise HTTPException(status_code=503, detail=str(exc))
         except Exception as exc:
             raise HTTPException(status_code=400, detail=f"Failed to run inference: {str(exc)}")
 
@@ -177,22 +211,25 @@ async def predict(payload: PredictPayload):
     confidence = calculate_confidence(prediction)  # Use new confidence calculation
     return PredictResponse(signal=signal, confidence=confidence, raw_prediction=prediction)
 
+@app.post('/predict', response_model=PredictResponse)
+async def predict(payload: PredictPayload):
+    return await run_prediction(np.asarray(payload.closes, dtype=np.float32), payload.normalize)
+
 @app.post('/final', response_model=FinalSignalResponse)
 async def get_final_signal(payload: SignalPayload):
     try:
-        # Get SMC analysis
-        df = pd.DataFrame({
-            'open': payload.open,
-            'high': payload.high,
-            'low': payload.low,
-            'close': payload.close
-        })
+        # Payload converted once; the analysis and the AI share the arrays
+        opens, highs, lows, closes = (np.ascontiguousarray(prices, dtype=np.float64)
+                                      for prices in (payload.open, payload.high, payload.low, payload.close))
         
-        smc_result = smc_engine.analyze_market_structure(df)
+        # Get SMC analysis
+        timings = {}
+        smc_result = materialize(window_resumer.analyze(smc_engine, window_key(payload), opens, highs, lows, closes,
+                                                        columnar=True, timings=timings))
         
-        # Get AI prediction using close prices
-        ai_payload = PredictPayload(closes=payload.close)
-        ai_result = await predict(ai_payload)
+        # Get AI prediction using close prices (the /predict payload checks)
+        check_closes(closes)
+        ai_result = await run_prediction(closes)
         
         # Combine SMC and AI signals
         final_signal = "NEUTRAL"
@@ -259,20 +296,34 @@ async def get_final_signal(payload: SignalPayload):
                 entry=smc_result['entry'],
                 sl=smc_result['sl'],
                 tp=smc_result['tp'],
-                explanation=smc_result['explanation']
+                explanation=smc_result['explanation'],
+                activeZones=track_zones(payload, smc_result)
             ),
             ai_prediction=ai_result,
             entry=smc_result['entry'],
             sl=smc_result['sl'],
             tp=smc_result['tp'],
-            explanation=explanation
+            explanation=explanation,
+            timings={node: 1000 * seconds for node, seconds in timings.items()}
         )
+    except HTTPException:
+        # 503s from the prediction (model loading, queue full) pass through
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to generate final signal: {str(e)}")
 
 @app.get('/health')
 async def health():
-    return {'status': 'ok', 'smc_engine_loaded': True, 'ai_model_loaded': model is not None}
+    # Liveness: answers as soon as the process serves requests
+    return {'status': 'ok', 'smc_engine_loaded': True, 'ai_model_loaded': model_loader.get_model() is not None,
+            'ai_model': model_loader.stats(), 'window_resume': window_resumer.stats(), 'zone_registry': zone_registry.stats(),
+            'smc_detectors': smc_engine.graph.stats(), 'predict_batching': predict_batcher.stats()}
+
+@app.get('/ready')
+async def ready():
+    # Readiness: 503 until the model finished loading (or fell back)
+    status_code = 200 if model_loader.ready.is_set() else 503
+    return JSONResponse({'ready': status_code == 200, 'ai_model': model_loader.stats()}, status_code=status_code)
 
 if __name__ == '__main__':
     import uvicorn
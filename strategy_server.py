@@ -4,9 +4,9 @@ os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 
 from flask import Flask, request, jsonify
-import pandas as pd
 import numpy as np
-from typing import List, Dict, Any
+from datetime import datetime
+from typing import List, Dict, Any, Tuple
 import sys
 import os
 
@@ -15,7 +15,11 @@ sys.path.append(os.path.join(os.path.dirname(__file__)))
 
 # Import the SMC Engine (renamed to smc_logic to avoid conflict)
 from smc_logic import SMCEngine
+from smc_engine.columnar import materialize
 from ai_engine.predict import PredictionEngine
+from smc_engine.resume import PrefixResumer
+from smc_engine.registry import ZoneRegistry
+from utils.cache import TTLCache, fingerprint
 
 
 app = Flask(__name__)
@@ -25,28 +29,46 @@ class StrategyProcessor:
     Processes market data and generates trading signals based on SMC and AI
     """
 
-    def __init__(self):
+    def __init__(self, cache_size: int = None, cache_ttl: float = None):
         # Initialize the SMC engine
         self.smc_engine = SMCEngine()
         # Initialize the AI engine
-        self.ai_engine = PredictionEngine()
+        # Loaded on a background thread; predictions wait for it, see /ready
+        self.ai_engine = PredictionEngine(background=True)
+        # Identical windows (bot commands, 15m loop) within the TTL share one result
+        self.analysis_cache = TTLCache(
+            maxsize=cache_size if cache_size is not None else int(os.getenv('ANALYSIS_CACHE_SIZE', 128)),
+            ttl=cache_ttl if cache_ttl is not None else float(os.getenv('ANALYSIS_CACHE_TTL', 30))
+        )
+        # Windows shifted by a candle reuse the swings of the previous one
+        self.window_resumer = PrefixResumer()
+        # FVGs and order blocks kept per symbol/timeframe across requests
+        self.zone_registry = ZoneRegistry()
         print("Strategy Processor Initialized with SMC and AI")
 
+    def _cache_key(self, opens, highs, lows, closes, volumes, symbol: str = None, timeframe: str = None) -> str:
+        """
+        Content hash of the OHLCV window plus everything that changes the result
+        (the symbol/timeframe select the registry's active zones)
+        """
+        params = (type(self.smc_engine).__name__, self.smc_engine.lookback,
+                  str(self.ai_engine.model_loader.model_path), self.ai_engine.model_loader.version,
+                  symbol, timeframe)
+        return fingerprint(opens, highs, lows, closes, volumes or [], params)
+
     def process_data(self, data: Dict[str, List[float]]) -> Dict[str, Any]:
         """
         Process OHLCV data and return trading signal with entry, SL, and TP levels
         """
         try:
-            # Create DataFrame from received data
-            df = pd.DataFrame({
-                'open': data.get('open', []),
-                'high': data.get('high', []),
-                'low': data.get('low', []),
-                'close': data.get('close', []),
-                'volume': data.get('volume', [])
-            })
-
-            if df.empty or len(df) < 50:  # Need minimum data for analysis
+            # Contiguous float64 arrays, no DataFrame round-trip
+            opens = np.asarray(data.get('open', []), dtype=np.float64)
+            highs = np.asarray(data.get('high', []), dtype=np.float64)
+            lows = np.asarray(data.get('low', []), dtype=np.float64)
+            closes = np.asarray(data.get('close', []), dtype=np.float64)
+            volumes = data.get('volume') or None
+
+            if len(closes) < 50:  # Need minimum data for analysis
                 return {
                     'signal': 'NEUTRAL',
                     'entry': None,
@@ -58,70 +80,14 @@ class StrategyProcessor:
                     'aiConfidence': 0.0
                 }
 
-            # 1. Run SMC Analysis
-            smc_result = self.smc_engine.analyze_market_structure(df)
-            
-            # 2. Run AI Prediction
-            closes = data.get('close', [])
-            ai_signal = 'NEUTRAL'
-            ai_confidence = 0.0
-            
-            try:
-                ai_result = self.ai_engine.get_prediction(closes)
-                ai_signal = ai_result.get('signal', 'NEUTRAL')
-                ai_confidence = ai_result.get('confidence', 0.0)
-            except Exception as e:
-                print(f"Error getting AI prediction: {str(e)}")
-
-            # 3. Combine Signals
-            final_signal = 'NEUTRAL'
-            confidence = 0.0
-            reason = smc_result.get('explanation', '')
-            
-            smc_bias = smc_result.get('bias', 'NEUTRAL')
-            
-            # Logic for combining signals
-            if smc_bias == 'BUY':
-                if ai_signal == 'BUY':
-                    final_signal = 'BUY'
-                    confidence = 0.9  # Strong confirmation
-                    reason += " | AI Confirms BUY"
-                elif ai_signal == 'NEUTRAL':
-                    final_signal = 'BUY'
-                    confidence = 0.7  # Standard SMC buy
-                else: # AI says SELL
-                    final_signal = 'NEUTRAL'
-                    confidence = 0.3
-                    reason += " | AI Divergence (Bearish)"
-                    
-            elif smc_bias == 'SELL':
-                if ai_signal == 'SELL':
-                    final_signal = 'SELL'
-                    confidence = 0.9  # Strong confirmation
-                    reason += " | AI Confirms SELL"
-                elif ai_signal == 'NEUTRAL':
-                    final_signal = 'SELL'
-                    confidence = 0.7  # Standard SMC sell
-                else: # AI says BUY
-                    final_signal = 'NEUTRAL'
-                    confidence = 0.3
-                    reason += " | AI Divergence (Bullish)"
-            
-            # If SMC is Neutral but AI is very confident?
-            # Usually better to wait for SMC structure, so we keep it Neutral or check for lower timeframe structure
-            # For now, we prioritize SMC structure.
-
-            return {
-                'signal': final_signal,
-                'entry': smc_result.get('entry'),
-                'sl': smc_result.get('sl'),
-                'tp': smc_result.get('tp'),
-                'reason': reason,
-                'confidence': confidence,
-                'aiSignal': ai_signal,
-                'aiConfidence': ai_confidence,
-                'smc_details': smc_result # Pass full details for frontend
-            }
+            key = self._cache_key(opens, highs, lows, closes, volumes, data.get('symbol'), data.get('timeframe'))
+            # Results without a real AI prediction are not kept for the TTL
+            result, _ = self.analysis_cache.get_or_compute(
+                key, lambda: self._analyze(opens, highs, lows, closes, volumes, data.get('close', []),
+                                           data.get('symbol'), data.get('timeframe')),
+                cache_if=lambda computed: computed[1]
+            )
+            return result
 
         except Exception as e:
             print(f"Error in process_data: {str(e)}")
@@ -136,6 +102,89 @@ class StrategyProcessor:
                 'confidence': 0.0
             }
 
+    def _analyze(self, opens: np.ndarray, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray,
+                 volumes, close_list: List[float], symbol: str = None,
+                 timeframe: str = None) -> Tuple[Dict[str, Any], bool]:
+        """
+        Run SMC and AI on one window and combine them into a signal.
+        Returns (result, ai_answered); ai_answered is False when the AI part
+        failed or fell back to a random prediction.
+        """
+        # 1. Run SMC Analysis (columnar; converted to dicts only in the response)
+        # Lazy: only the detectors behind the fields read below (and by the
+        # response) run
+        # Resume state and zones are kept per symbol/timeframe
+        key = (symbol, timeframe) if symbol else None
+        smc_result = self.window_resumer.analyze(self.smc_engine, key, opens, highs, lows, closes, volumes,
+                                                 columnar=True, lazy=True)
+        if key is not None:
+            # Zones carried over from earlier windows, mitigated by the new candles only
+            smc_result['activeZones'] = self.zone_registry.update(
+                key, highs, lows, [*smc_result['fvgZones'], *smc_result['orderBlocks']])
+        
+        # 2. Run AI Prediction
+        ai_signal = 'NEUTRAL'
+        ai_confidence = 0.0
+        ai_answered = False
+        
+        try:
+            ai_result = self.ai_engine.get_prediction(close_list)
+            ai_signal = ai_result.get('signal', 'NEUTRAL')
+            ai_confidence = ai_result.get('confidence', 0.0)
+            ai_answered = not ai_result.get('fallback', False)
+        except Exception as e:
+            print(f"Error getting AI prediction: {str(e)}")
+
+        # 3. Combine Signals
+        final_signal = 'NEUTRAL'
+        confidence = 0.0
+        reason = smc_result.get('explanation', '')
+        
+        smc_bias = smc_result.get('bias', 'NEUTRAL')
+        
+        # Logic for combining signals
+        if smc_bias == 'BUY':
+            if ai_signal == 'BUY':
+                final_signal = 'BUY'
+                confidence = 0.9  # Strong confirmation
+                reason += " | AI Confirms BUY"
+            elif ai_signal == 'NEUTRAL':
+                final_signal = 'BUY'
+                confidence = 0.7  # Standard SMC buy
+            else: # AI says SELL
+                final_signal = 'NEUTRAL'
+                confidence = 0.3
+                reason += " | AI Divergence (Bearish)"
+                
+        elif smc_bias == 'SELL':
+            if ai_signal == 'SELL':
+                final_signal = 'SELL'
+                confidence = 0.9  # Strong confirmation
+                reason += " | AI Confirms SELL"
+            elif ai_signal == 'NEUTRAL':
+                final_signal = 'SELL'
+                confidence = 0.7  # Standard SMC sell
+            else: # AI says BUY
+                final_signal = 'NEUTRAL'
+                confidence = 0.3
+                reason += " | AI Divergence (Bullish)"
+        
+        # If SMC is Neutral but AI is very confident?
+        # Usually better to wait for SMC structure, so we keep it Neutral or check for lower timeframe structure
+        # For now, we prioritize SMC structure.
+
+        return {
+            'signal': final_signal,
+            'entry': smc_result.get('entry'),
+            'sl': smc_result.get('sl'),
+            'tp': smc_result.get('tp'),
+            'reason': reason,
+            'confidence': confidence,
+            'aiSignal': ai_signal,
+            'aiConfidence': ai_confidence,
+            'smc_details': smc_result # Pass full details for frontend
+        }, ai_answered
+
 
 # Initialize strategy processor
 processor = StrategyProcessor()
@@ -181,11 +230,18 @@ def analyze():
             'high': high_prices,
             'low': low_prices,
             'close': close_prices,
-            'volume': volumes
+            'volume': volumes,
+            'symbol': symbol,
+            'timeframe': data.get('timeframe')
         }
         
         # Process the data
         result = processor.process_data(processed_data)
+        smc_details = result.get('smc_details', {})
+        # Optional subset of smc_details to return; unrequested parts are never computed
+        smc_fields = data.get('smc_fields')
+        if smc_fields:
+            smc_details = {field: smc_details[field] for field in smc_fields if field in smc_details}
         print(f"DEBUG: Result - Signal: {result['signal']}, Confidence: {result['confidence']}")
         
         # Return the result
@@ -199,8 +255,8 @@ def analyze():
             'confidence': result['confidence'],
             'aiSignal': result['aiSignal'],
             'aiConfidence': result['aiConfidence'],
-            'smc_details': result.get('smc_details', {}),
-            'timestamp': pd.Timestamp.now().isoformat()
+            'smc_details': materialize(smc_details),
+            'timestamp': datetime.now().isoformat()
         }
         
         return jsonify(response)
@@ -222,9 +278,23 @@ def health():
     return jsonify({
         'status': 'healthy',
         'service': 'strategy_server',
-        'timestamp': pd.Timestamp.now().isoformat()
+        'analysis_cache': processor.analysis_cache.stats(),
+        'window_resume': processor.window_resumer.stats(),
+        'zone_registry': processor.zone_registry.stats(),
+        'prediction_cache': processor.ai_engine.ai_predictor.cache_stats(),
+        'ai_model': processor.ai_engine.model_loader.stats(),
+        'timestamp': datetime.now().isoformat()
     })
 
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    # Readiness: 503 until the model finished loading (or fell back);
+    # /health only says the process is up
+    model_loader = processor.ai_engine.model_loader
+    is_ready = model_loader.ready.is_set()
+    return jsonify({'ready': is_ready, 'ai_model': model_loader.stats()}), 200 if is_ready else 503
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Test Analysis Cache
+Checks LRU/TTL behaviour and request coalescing of utils.cache
+"""
+import sys
+import threading
+import time
+import numpy as np
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from utils.cache import TTLCache, fingerprint
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_fingerprint_is_content_addressed():
+    """Equal windows hash equal, any changed price or parameter does not"""
+    print("=" * 60)
+    print("TEST 1: Fingerprint")
+    print("=" * 60)
+
+    closes = [1800.0 + i for i in range(320)]
+    assert fingerprint(closes, 'SMCEngine') == fingerprint(np.array(closes), 'SMCEngine')
+    assert fingerprint(closes, 'SMCEngine') != fingerprint(closes, 'IncrementalSMCEngine')
+    shifted = closes[1:] + [2200.0]
+    assert fingerprint(closes) != fingerprint(shifted)
+    # Array boundaries are part of the hash
+    assert fingerprint([1.0, 2.0], [3.0]) != fingerprint([1.0], [2.0, 3.0])
+    print("✅ Fingerprint depends on content and parameters only")
+
+
+def test_lru_and_ttl():
+    """Oldest entries are evicted first and entries expire after the TTL"""
+    print("\n" + "=" * 60)
+    print("TEST 2: LRU + TTL")
+    print("=" * 60)
+
+    clock = FakeClock()
+    cache = TTLCache(maxsize=2, ttl=10, clock=clock)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # 'a' is now most recently used
+    cache.put('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1
+
+    clock.now = 11
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert stats['evictions'] == 1 and stats['expirations'] == 1
+    print(f"✅ Stats: {stats}")
+
+
+def test_concurrent_requests_are_coalesced():
+    """Identical concurrent misses run the computation once"""
+    print("\n" + "=" * 60)
+    print("TEST 3: Single-flight")
+    print("=" * 60)
+
+    cache = TTLCache(maxsize=8, ttl=60)
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return {'signal': 'BUY'}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == 8 and all(result is results[0] for result in results)
+    stats = cache.stats()
+    assert stats['misses'] == 1 and stats['coalesced'] + stats['hits'] == 7
+    print(f"✅ One computation served {len(results)} requests")
+
+
+def test_fallback_results_are_not_cached():
+    """Values rejected by cache_if are returned but computed again next time"""
+    print("\n" + "=" * 60)
+    print("TEST 4: Uncached Fallbacks")
+    print("=" * 60)
+
+    cache = TTLCache(maxsize=8, ttl=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'signal': 'NEUTRAL'}, len(calls) > 1
+
+    assert cache.get_or_compute('k', compute, cache_if=lambda computed: computed[1])[1] is False
+    assert cache.get_or_compute('k', compute, cache_if=lambda computed: computed[1])[1] is True
+    assert cache.get_or_compute('k', compute, cache_if=lambda computed: computed[1])[1] is True
+    assert len(calls) == 2 and cache.stats()['size'] == 1
+
+    # An analysis whose AI prediction fell back is not served from the cache
+    from strategy_server import StrategyProcessor
+    processor = StrategyProcessor()
+    predictions = []
+
+    def fallback_prediction(closes):
+        predictions.append(1)
+        return {'signal': 'NEUTRAL', 'confidence': 0.0, 'raw_prediction': 0.0, 'fallback': len(predictions) == 1}
+
+    processor.ai_engine.get_prediction = fallback_prediction
+    # The model version is part of the key, let the background load finish first
+    processor.ai_engine.model_loader.wait_ready()
+    rng = np.random.default_rng(5)
+    closes = list(1800 + rng.normal(size=120).cumsum())
+    data = {'open': closes, 'high': [c + 1 for c in closes], 'low': [c - 1 for c in closes], 'close': closes}
+    first = processor.process_data(data)
+    second = processor.process_data(data)
+    assert processor.process_data(data) is second and second is not first
+    assert (second['signal'], second['reason']) == (first['signal'], first['reason'])
+    assert len(predictions) == 2 and processor.analysis_cache.stats()['hits'] == 1
+    processor.ai_engine.ai_predictor.batcher.close()
+    print("✅ Fallback results recomputed, real ones cached")
+
+
+def test_symbols_are_cached_separately():
+    """The same window sent for another symbol is analyzed with its own zones"""
+    print("\n" + "=" * 60)
+    print("TEST 5: Per-Symbol Cache Keys")
+    print("=" * 60)
+
+    from strategy_server import StrategyProcessor
+    processor = StrategyProcessor()
+    processor.ai_engine.get_prediction = lambda closes: {'signal': 'NEUTRAL', 'confidence': 0.0,
+                                                         'raw_prediction': 0.0, 'fallback': False}
+    processor.ai_engine.model_loader.wait_ready()
+    rng = np.random.default_rng(6)
+    closes = list(1800 + rng.normal(size=120).cumsum())
+    data = {'open': closes, 'high': [c + 1 for c in closes], 'low': [c - 1 for c in closes], 'close': closes}
+
+    requests = [{**data, 'symbol': 'XAUUSDT', 'timeframe': '15m'}, {**data, 'symbol': 'BTCUSDT', 'timeframe': '15m'},
+                {**data, 'symbol': 'XAUUSDT', 'timeframe': '1h'}, data]
+    results = [processor.process_data(request) for request in requests]
+    assert len({id(result) for result in results}) == 4
+    assert processor.process_data(requests[0]) is results[0]
+    assert processor.zone_registry.stats()['symbols'] == 3
+    assert 'activeZones' not in results[3]['smc_details']
+    print("✅ Each symbol/timeframe gets its own cached analysis")
+
+
+def main():
+    test_fingerprint_is_content_addressed()
+    test_lru_and_ttl()
+    test_concurrent_requests_are_coalesced()
+    test_fallback_results_are_not_cached()
+    test_symbols_are_cached_separately()
+
+
+if __name__ == "__main__":
+    main()
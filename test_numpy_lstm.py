@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Test NumPy LSTM Engine
+Checks the TensorFlow-free forward pass against a plain per-step LSTM and,
+when TensorFlow is installed, against Keras itself
+"""
+import os
+import shutil
+import sys
+import tempfile
+import numpy as np
+from pathlib import Path
+
+import h5py
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from ai_engine.model_loader import AIPredictor, ModelLoader
+from ai_engine.numpy_lstm import NumpyLSTMModel
+from ai_engine.predict import PredictionEngine
+
+MODEL_PATH = project_root / 'models' / 'model.h5'
+
+
+def reference_forward(windows):
+    """Textbook LSTM + Dense in float64, one sample and one gate at a time"""
+    with h5py.File(MODEL_PATH, 'r') as f:
+        cell = f['model_weights/lstm/sequential/lstm/lstm_cell']
+        kernel, recurrent, bias = (np.asarray(cell[name], dtype=np.float64)
+                                   for name in ('kernel', 'recurrent_kernel', 'bias'))
+        dense = f['model_weights/dense/sequential/dense']
+        dense_kernel, dense_bias = np.asarray(dense['kernel'], np.float64), np.asarray(dense['bias'], np.float64)
+
+    def sigmoid(x):
+        return 1 / (1 + np.exp(-x))
+
+    units = recurrent.shape[0]
+    outputs = []
+    for window in windows:
+        h, c = np.zeros(units), np.zeros(units)
+        for x in window:
+            z = x @ kernel + h @ recurrent + bias
+            i, f, g, o = (z[k * units:(k + 1) * units] for k in range(4))
+            c = sigmoid(f) * c + sigmoid(i) * np.tanh(g)
+            h = sigmoid(o) * np.tanh(c)
+        outputs.append(h @ dense_kernel + dense_bias)
+    return np.array(outputs)
+
+
+def test_forward_matches_reference():
+    """float32 engine agrees with the float64 per-step recurrence"""
+    print("=" * 60)
+    print("TEST 1: Forward Pass")
+    print("=" * 60)
+
+    model = NumpyLSTMModel.load(MODEL_PATH)
+    assert model.input_shape == (None, 20, 1)
+
+    rng = np.random.default_rng(0)
+    windows = rng.normal(size=(64, 20, 1)).astype(np.float32)
+    # Large inputs saturate the gates
+    windows[:4] *= 50
+    expected = reference_forward(windows)
+    result = model.predict(windows, verbose=0)
+    assert result.shape == (64, 1) and result.dtype == np.float32
+    assert np.allclose(result, expected, rtol=1e-4, atol=1e-6)
+    # Chunked batches give the same rows
+    assert np.allclose(model.predict(windows, batch_size=7), result, rtol=1e-6, atol=1e-7)
+
+    print("✅ NumPy forward pass matches the reference LSTM")
+
+
+def test_matches_keras():
+    """Same outputs as Keras on the saved model, when TensorFlow is available"""
+    print("=" * 60)
+    print("TEST 2: Keras Parity")
+    print("=" * 60)
+
+    try:
+        from tensorflow.keras.models import load_model
+    except ImportError:
+        print("⚠️ TensorFlow not installed, skipping")
+        return
+
+    windows = np.random.default_rng(1).normal(size=(256, 20, 1)).astype(np.float32)
+    expected = load_model(MODEL_PATH).predict(windows, verbose=0)
+    assert np.allclose(NumpyLSTMModel.load(MODEL_PATH).predict(windows), expected, rtol=1e-4, atol=1e-6)
+
+    print("✅ NumPy engine matches Keras")
+
+
+def test_loader_backend_selection():
+    """ModelLoader uses the NumPy engine when asked to, or without TensorFlow"""
+    print("=" * 60)
+    print("TEST 3: Loader Backend Selection")
+    print("=" * 60)
+
+    loader = ModelLoader(MODEL_PATH, backend='numpy')
+    assert loader.engine == 'numpy' and isinstance(loader.get_model(), NumpyLSTMModel)
+
+    try:
+        import tensorflow  # noqa: F401
+        auto_engine = 'tensorflow'
+    except ImportError:
+        auto_engine = 'numpy'
+    assert ModelLoader(MODEL_PATH, backend='auto').engine == auto_engine
+
+    try:
+        ModelLoader(MODEL_PATH, backend='torch')
+        raise AssertionError("unknown backend accepted")
+    except ValueError:
+        pass
+
+    print("✅ Loader picks the expected backend")
+
+
+def test_series_predictions():
+    """predict_series agrees with per-bar get_prediction and is cached on disk"""
+    print("=" * 60)
+    print("TEST 4: Whole-Series Predictions")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        engine = PredictionEngine(str(MODEL_PATH), series_cache_dir=cache_dir)
+        closes = 100 + np.random.default_rng(2).normal(size=300).cumsum()
+        closes[100:130] = closes[100]  # flat windows have zero std
+
+        series = engine.predict_series(closes, batch_size=64)
+        assert all(len(values) == len(closes) for values in series.values())
+        assert np.isnan(series['raw_prediction'][:19]).all() and (series['signal'][:19] == 'NEUTRAL').all()
+        for i in range(19, len(closes)):
+            expected = engine.get_prediction(list(closes[:i + 1]))
+            assert np.isclose(series['raw_prediction'][i], expected['raw_prediction'], rtol=1e-5, atol=1e-7)
+            assert series['signal'][i] == expected['signal']
+            assert np.isclose(series['confidence'][i], expected['confidence'], rtol=1e-5, atol=1e-7)
+
+        # The second run reads the cached predictions instead of the model
+        assert len(list(Path(cache_dir).glob('*.npy'))) == 1
+        engine.ai_predictor.predict_series = None
+        cached = engine.predict_series(closes)
+        assert np.array_equal(cached['raw_prediction'], series['raw_prediction'], equal_nan=True)
+        engine.ai_predictor.batcher.close()
+
+    print("✅ Series predictions match per-bar predictions and are cached")
+
+
+def test_prediction_cache():
+    """Repeated tails skip inference; replacing the model file invalidates"""
+    print("=" * 60)
+    print("TEST 5: Prediction Cache")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        model_path = Path(model_dir) / 'model.h5'
+        shutil.copy(MODEL_PATH, model_path)
+        engine = PredictionEngine(str(model_path))
+        predictor = engine.ai_predictor
+        closes = list(100 + np.random.default_rng(3).normal(size=60).cumsum())
+
+        first = engine.get_prediction(closes)
+        # Only the last 20 closes make the key
+        assert engine.get_prediction(closes[-25:]) == first
+        assert engine.get_prediction(closes[-20:]) == first
+        assert engine.get_prediction(closes[:-1]) != first
+        stats = predictor.cache_stats()
+        assert stats['misses'] == 2 and stats['hits'] == 2 and stats['hit_ratio'] == 0.5
+        assert predictor.batcher.stats()['requests'] == 2
+        # The model gets the unrounded window, same as without the cache
+        uncached = AIPredictor(engine.model_loader, cache_size=0)
+        assert uncached.predict(closes)[2] == first['raw_prediction']
+        uncached.batcher.close()
+
+        # A retrained model (new weights, new file) is picked up on the next call
+        with h5py.File(model_path, 'r+') as f:
+            f['model_weights/dense/sequential/dense/bias'][...] += 0.25
+        os.utime(model_path, ns=(0, 0))
+        changed = engine.get_prediction(closes)
+        assert np.isclose(changed['raw_prediction'], first['raw_prediction'] + 0.25, atol=1e-5)
+        stats = predictor.cache_stats()
+        assert stats['size'] == 1 and stats['model_version'] == engine.model_loader.version
+        predictor.batcher.close()
+
+    print("✅ Cached predictions reused and invalidated with the model")
+
+
+def test_background_loading():
+    """Models load off the caller's thread, warmed up; readiness tracks it"""
+    print("=" * 60)
+    print("TEST 6: Background Loading")
+    print("=" * 60)
+
+    loader = ModelLoader(MODEL_PATH, load=False)
+    assert loader.status == 'loading' and loader.get_model() is None and not loader.ready.is_set()
+    loader.load_in_background().join(10)
+    stats = loader.stats()
+    assert loader.ready.is_set() and stats['status'] == 'ready' and stats['warmup_seconds'] is not None
+
+    missing = ModelLoader(Path(tempfile.gettempdir()) / 'missing-model.h5', load=False)
+    missing.load_in_background().join(10)
+    assert missing.status == 'fallback' and missing.ready.is_set()
+
+    # Predictions made while the model loads wait for it instead of falling back
+    closes = list(100 + np.random.default_rng(4).normal(size=40).cumsum())
+    reference = PredictionEngine(str(MODEL_PATH))
+    expected = reference.get_prediction(closes)
+    engine = PredictionEngine(str(MODEL_PATH), background=True)
+    assert engine.get_prediction(closes) == expected
+    for predictor in (reference.ai_predictor, engine.ai_predictor):
+        predictor.batcher.close()
+
+    print("✅ Background load, warmup and readiness")
+
+
+def main():
+    test_forward_matches_reference()
+    test_matches_keras()
+    test_loader_backend_selection()
+    test_series_predictions()
+    test_prediction_cache()
+    test_background_loading()
+
+
+if __name__ == "__main__":
+    main()
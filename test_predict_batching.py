@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Test Prediction Micro-Batching
+Checks that concurrent predictions are batched and each caller gets its own row
+"""
+import asyncio
+import concurrent.futures
+import sys
+import threading
+import numpy as np
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from ai_engine.batching import BatchQueueFull, MicroBatcher
+
+
+class RecordingModel:
+    """Sums each window and remembers the batch sizes it was called with"""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def __call__(self, windows):
+        self.batch_sizes.append(len(windows))
+        return windows.sum(axis=(1, 2))[:, None]
+
+
+def test_burst_is_batched():
+    """A burst of requests becomes a few forward passes with per-caller results"""
+    print("=" * 60)
+    print("TEST 1: Burst Batching")
+    print("=" * 60)
+
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=16, max_wait_ms=20)
+    windows = [np.full((20, 1), k, dtype=np.float32) for k in range(100)]
+
+    async def burst():
+        try:
+            return await asyncio.gather(*(batcher.predict(window) for window in windows))
+        finally:
+            await batcher.aclose()
+
+    results = asyncio.run(burst())
+    assert results == [20.0 * k for k in range(100)]
+    assert sum(model.batch_sizes) == 100 and max(model.batch_sizes) <= 16
+    assert len(model.batch_sizes) <= 10
+    stats = batcher.stats()
+    assert stats['requests'] == 100 and stats['batches'] == len(model.batch_sizes)
+
+    # Windows of different lengths are run separately
+    async def mixed():
+        try:
+            return await asyncio.gather(batcher.predict(np.ones((20, 1))), batcher.predict(np.ones((30, 1))))
+        finally:
+            await batcher.aclose()
+
+    assert asyncio.run(mixed()) == [20.0, 30.0]
+
+    print("✅ 100 requests answered by", len(model.batch_sizes), "forward passes")
+
+
+def test_queue_limits_and_errors():
+    """Full queues reject, model errors reach every caller of the batch"""
+    print("=" * 60)
+    print("TEST 2: Queue Depth and Errors")
+    print("=" * 60)
+
+    release = threading.Event()
+
+    def slow(windows):
+        release.wait(5)
+        return windows.sum(axis=(1, 2))
+
+    batcher = MicroBatcher(slow, max_batch_size=1, max_wait_ms=0, max_queue=2)
+
+    async def overload():
+        # The worker takes the first request, then the queue holds two more
+        calls = [asyncio.ensure_future(batcher.predict(np.ones((20, 1))))]
+        await asyncio.sleep(0.05)
+        calls += [asyncio.ensure_future(batcher.predict(np.ones((20, 1)))) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        try:
+            await batcher.predict(np.ones((20, 1)))
+            raise AssertionError("full queue accepted a request")
+        except BatchQueueFull:
+            pass
+        release.set()
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        await batcher.aclose()
+        return results
+
+    results = asyncio.run(overload())
+    assert sum(isinstance(result, BatchQueueFull) for result in results) == 1
+    assert batcher.stats()['rejected'] == 2
+
+    def broken(windows):
+        raise ValueError("bad input")
+
+    failing = MicroBatcher(broken, max_wait_ms=10)
+
+    async def fail():
+        results = await asyncio.gather(*(failing.predict(np.ones((20, 1))) for _ in range(3)),
+                                       return_exceptions=True)
+        await failing.aclose()
+        return results
+
+    assert all(isinstance(result, ValueError) for result in asyncio.run(fail()))
+
+    print("✅ Queue depth enforced, errors propagated")
+
+
+def test_blocking_callers_share_batches():
+    """Threads without an event loop are batched through the background loop"""
+    print("=" * 60)
+    print("TEST 3: Blocking Callers")
+    print("=" * 60)
+
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=8, max_wait_ms=50)
+    results = {}
+
+    def call(k):
+        results[k] = batcher.predict_blocking(np.full((20, 1), k, dtype=np.float32), timeout=5)
+
+    threads = [threading.Thread(target=call, args=(k,)) for k in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {k: 20.0 * k for k in range(16)}
+    assert len(model.batch_sizes) < 16
+    batcher.close()
+
+    print("✅ 16 threads answered by", len(model.batch_sizes), "forward passes")
+
+
+def test_close_and_timeouts():
+    """Closing stops the worker and background loop; blocking calls time out"""
+    print("=" * 60)
+    print("TEST 4: Shutdown and Timeouts")
+    print("=" * 60)
+
+    release = threading.Event()
+
+    def stuck(windows):
+        release.wait(5)
+        return windows.sum(axis=(1, 2))
+
+    # Requests still waiting when the batcher closes are cancelled, not left pending
+    batcher = MicroBatcher(stuck, max_batch_size=1, max_wait_ms=0)
+
+    async def shutdown():
+        calls = [asyncio.ensure_future(batcher.predict(np.ones((20, 1)))) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        worker = batcher._worker
+        await batcher.aclose()
+        release.set()
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        return worker, results
+
+    worker, results = asyncio.run(shutdown())
+    assert worker.cancelled() and batcher._worker is None
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
+
+    # Blocking callers give up after the default timeout; close stops the loop thread
+    release.clear()
+    batcher = MicroBatcher(stuck, max_batch_size=1, max_wait_ms=0, timeout=0.1)
+    try:
+        batcher.predict_blocking(np.ones((20, 1)))
+        raise AssertionError("stuck prediction did not time out")
+    except concurrent.futures.TimeoutError:
+        pass
+    thread = batcher._background_thread
+    release.set()
+    batcher.close()
+    assert not thread.is_alive() and batcher._background is None
+    # A closed batcher starts over on its next call
+    assert batcher.predict_blocking(np.ones((20, 1)), timeout=5) == 20.0
+    batcher.close()
+
+    print("✅ Worker and background loop stopped, blocking calls bounded")
+
+
+def main():
+    test_burst_is_batched()
+    test_queue_limits_and_errors()
+    test_blocking_callers_share_batches()
+    test_close_and_timeouts()
+
+
+if __name__ == "__main__":
+    main()
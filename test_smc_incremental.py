@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Test Incremental SMC
+Checks that streaming analysis matches a full rebuild over the same candles
+"""
+import sys
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from smc_logic import SMCEngine, IncrementalSMCEngine
+from smc_engine import SMCEngine as SMCAnalyzer
+from smc_engine.resume import PrefixResumer
+from smc_engine.registry import ZoneRegistry
+from smc_engine.zones import mitigation_level
+from smc_engine.columnar import materialize
+
+
+def random_frame(rng, n):
+    """Random walk OHLC frame with rounded prices so ties occur"""
+    closes = 100 + np.round(rng.normal(size=n).cumsum() * 2, 1)
+    highs = closes + np.round(rng.random(n) * 2, 1)
+    lows = closes - np.round(rng.random(n) * 2, 1)
+    opens = lows + (highs - lows) * rng.random(n)
+    return pd.DataFrame({'open': opens, 'high': highs, 'low': lows, 'close': closes})
+
+
+def test_incremental_matches_full_analysis():
+    """Appending candles one by one must give the batch result at every step"""
+    print("=" * 60)
+    print("TEST 1: Incremental vs Full Analysis")
+    print("=" * 60)
+
+    rng = np.random.default_rng(3)
+    engine = SMCEngine()
+    for trial in range(20):
+        df = random_frame(rng, int(rng.integers(5, 250)))
+        incremental = IncrementalSMCEngine()
+        for k, candle in enumerate(df.to_dict('records')):
+            incremental.update(candle)
+            if k >= 4 and (k % 9 == 0 or k == len(df) - 1):
+                expected = engine.analyze_market_structure(df.iloc[:k + 1])
+                assert incremental.current_analysis() == expected
+
+    print("✅ Streaming result identical to analyze_market_structure")
+
+
+def test_sample_data_stream():
+    """Stream the bundled sample data and compare the final result"""
+    print("\n" + "=" * 60)
+    print("TEST 2: Sample Data Stream")
+    print("=" * 60)
+
+    df = pd.read_csv(project_root / 'sample_data.csv')
+    incremental = IncrementalSMCEngine()
+    incremental.extend(df)
+
+    expected = SMCEngine().analyze_market_structure(df)
+    assert incremental.current_analysis() == expected
+    print(f"✅ {len(df)} candles streamed, bias: {expected['bias']}")
+
+
+def test_label_history_has_no_lookahead():
+    """Per-bar labels must equal the analysis of each prefix"""
+    print("\n" + "=" * 60)
+    print("TEST 3: Walk-forward Labels")
+    print("=" * 60)
+
+    rng = np.random.default_rng(9)
+    engine = SMCEngine()
+    for trial in range(5):
+        df = random_frame(rng, int(rng.integers(5, 160)))
+        labels = engine.label_history(df)
+        for k in range(len(df)):
+            expected = engine.analyze_market_structure(df.iloc[:k + 1])
+            assert labels['bias'][k] == expected['bias']
+            assert labels['trend'][k] == expected['trend']
+            for field in ('entry', 'sl', 'tp'):
+                if expected[field] is None:
+                    assert np.isnan(labels[field][k])
+                else:
+                    assert labels[field][k] == expected[field]
+            assert labels['fvg_count'][k] == len(expected['fvgZones'])
+            assert labels['order_block_count'][k] == len(expected['orderBlocks'])
+
+    print("✅ Walk-forward labels match prefix analysis")
+
+
+def test_prefix_resume_matches_full_analysis():
+    """Sliding windows resumed from the previous request must match a rebuild"""
+    print("\n" + "=" * 60)
+    print("TEST 4: Prefix-delta Window Resume")
+    print("=" * 60)
+
+    rng = np.random.default_rng(21)
+    df = random_frame(rng, 1500)
+    engines = [SMCEngine(), SMCAnalyzer(), SMCAnalyzer(lookback_period=3)]
+    resumer = PrefixResumer()
+    for engine in engines:
+        start, end = 0, 320
+        while end < len(df):
+            window = df.iloc[start:end]
+            opens, highs, lows, closes = (window[c].to_numpy().copy() for c in ('open', 'high', 'low', 'close'))
+            step = int(rng.integers(0, 4))
+            if step == 0:
+                # Forming candle re-sent with a new high/low
+                highs[-1] += 0.5
+                lows[-1] -= 0.5
+            elif step == 3 and rng.random() < 0.2:
+                # Unrelated window for the same symbol
+                highs, lows = highs[::-1].copy(), lows[::-1].copy()
+
+            key = type(engine).__name__
+            expected = engine.analyze_arrays(opens, highs, lows, closes)
+            assert resumer.analyze(engine, key, opens, highs, lows, closes) == expected
+            start, end = start + step, end + step
+
+    stats = resumer.stats()
+    assert stats['resumed'] > stats['full'] > 0
+
+    # Anonymous windows are analyzed in full and never stored
+    symbols = stats['symbols']
+    window = df.iloc[:320]
+    arrays = [window[c].to_numpy() for c in ('open', 'high', 'low', 'close')]
+    assert resumer.analyze(engines[0], None, *arrays) == engines[0].analyze_arrays(*arrays)
+    stats = resumer.stats()
+    assert stats['anonymous'] == 1 and stats['symbols'] == symbols
+    print(f"✅ Resumed windows identical to full analysis ({stats['resumed']} resumed, {stats['full']} full)")
+
+
+def test_zone_registry_tracks_history():
+    """Zones kept across sliding windows must match a scan of the full history"""
+    print("\n" + "=" * 60)
+    print("TEST 5: Persistent Zone Registry")
+    print("=" * 60)
+
+    rng = np.random.default_rng(23)
+    df = random_frame(rng, 1500)
+    highs, lows = df['high'].to_numpy(), df['low'].to_numpy()
+    engine = SMCAnalyzer(lookback_period=5)
+    registry = ZoneRegistry(max_age=400)
+    first_seen = {}
+    untouched_fvgs = 0
+    start, end = 0, 300
+    while end <= len(df):
+        window = df.iloc[start:end]
+        result = materialize(engine.analyze_arrays(*(window[c].to_numpy() for c in ('open', 'high', 'low', 'close')),
+                                                   columnar=True))
+        detected = result['fvgZones'] + result['orderBlocks']
+        for zone in detected:
+            first_seen.setdefault((zone['type'], start + zone['index']), zone)
+        active = registry.update('XAUUSD', window['high'], window['low'], detected)
+
+        # Alive: formed within max_age and never reached by a later bar so far
+        expected = set()
+        for (type_name, bar), zone in first_seen.items():
+            after = slice(bar + (2 if type_name.endswith('_fvg') else 1), end)
+            level = mitigation_level(zone)
+            reached = (lows[after].min(initial=np.inf) <= level if type_name.startswith('bullish')
+                       else highs[after].max(initial=-np.inf) >= level)
+            if not reached and bar >= end - 400:
+                expected.add((type_name, bar))
+        assert {(zone['type'], start + zone['index']) for zone in active} == expected
+        for zone in active:
+            bar = start + zone['index'] + (2 if zone['type'].endswith('_fvg') else 1)
+            reach = (lows[bar:end].min(initial=np.inf) <= zone['high'] if zone['type'].startswith('bullish')
+                     else highs[bar:end].max(initial=-np.inf) >= zone['low'])
+            assert zone['touched'] == reach
+            untouched_fvgs += zone['type'].endswith('_fvg') and not zone['touched']
+
+        step = int(rng.integers(1, 6))
+        start, end = start + step, end + step
+
+    stats = registry.stats()
+    assert stats['mitigated'] and stats['added'] and stats['resets'] == 0
+    assert untouched_fvgs
+
+    # A gap no later candle came back to is registered untouched
+    fresh = ZoneRegistry()
+    gap_highs = np.array([10.0, 11.0, 13.0, 14.0, 15.0])
+    gap_lows = np.array([9.0, 10.0, 12.0, 13.0, 14.0])
+    gap = {'index': 1, 'type': 'bullish_fvg', 'high': 12.0, 'low': 10.0, 'entry': 11.0}
+    assert [zone['touched'] for zone in fresh.update('gap', gap_highs, gap_lows, [gap])] == [False]
+
+    # A window that does not continue the previous one starts over
+    registry.update('XAUUSD', highs[:300][::-1], lows[:300][::-1], [])
+    assert registry.stats()['resets'] == 1 and registry.stats()['zones'] == 0
+    print(f"✅ Registry matches the full history ({stats['added']} added, {stats['mitigated']} mitigated)")
+
+
+def test_sweep_radius_window():
+    """Sweeps around each swing match a brute-force scan for every allowed radius"""
+    print("\n" + "=" * 60)
+    print("TEST 6: Sweep Radius Window")
+    print("=" * 60)
+
+    rng = np.random.default_rng(11)
+    for swing_lookback in (1, 2, 5):
+        for sweep_radius in range(1, swing_lookback + 2):
+            df = random_frame(rng, 300)
+            highs, lows = df['high'].to_numpy(), df['low'].to_numpy()
+            incremental = IncrementalSMCEngine(swing_lookback=swing_lookback, fractal_lookback=1,
+                                               sweep_radius=sweep_radius)
+            incremental.extend(df)
+            for swings, sweeps, swept in (
+                (incremental._swing_highs, incremental._high_sweeps, lambda i, p: highs[i] >= p and lows[i] < p),
+                (incremental._swing_lows, incremental._low_sweeps, lambda i, p: lows[i] <= p and highs[i] > p),
+            ):
+                expected = [(i, swing['price']) for swing in swings
+                            for i in range(max(0, swing['index'] - sweep_radius), swing['index'] + sweep_radius)
+                            if swept(i, swing['price'])]
+                assert [(sweep['index'], sweep['price']) for sweep in sweeps] == expected
+
+    try:
+        IncrementalSMCEngine(swing_lookback=2, sweep_radius=4)
+        raise AssertionError("sweep radius past the confirmation bar accepted")
+    except ValueError:
+        pass
+
+    # Bars that fell out of the window are an error, not the newest bar
+    incremental = IncrementalSMCEngine(swing_lookback=2, fractal_lookback=1, sweep_radius=1)
+    incremental.extend(random_frame(rng, 20))
+    try:
+        incremental._bar(incremental._highs, 0)
+        raise AssertionError("bar outside the window returned a price")
+    except IndexError:
+        pass
+
+    print("✅ Sweeps match a brute-force scan up to sweep_radius = swing_lookback + 1")
+
+
+def main():
+    test_incremental_matches_full_analysis()
+    test_sample_data_stream()
+    test_label_history_has_no_lookahead()
+    test_prefix_resume_matches_full_analysis()
+    test_zone_registry_tracks_history()
+    test_sweep_radius_window()
+
+
+if __name__ == "__main__":
+    main()
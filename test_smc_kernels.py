@@ -0,0 +1,864 @@
+#!/usr/bin/env python3
+"""
+Test SMC Kernels
+Checks the vectorized detectors against the original per-candle loops
+"""
+import sys
+import time
+import warnings
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from smc_logic import SMCEngine, IncrementalSMCEngine
+from smc_engine.structure import SwingDetector, MultiScaleSwingDetector
+from smc_engine.orderblock import OrderBlockDetector, InsideBarDetector, MotherBarDetector
+from smc_engine.liquidity import LiquidityDetector, LiquidityPoolDetector, UnusualVolumeDetector, average_true_range
+from smc_engine.fvg import FVGDetector, ImpulsePullbackDetector
+from smc_engine import SMCEngine as SMCAnalyzer
+from smc_engine.backend import KernelBackend, NUMPY_KERNELS, NUMBA_KERNELS, get_backend
+from smc_engine.rmq import CloseCrossingIndex, RangeExtremaIndex
+from smc_engine.columnar import DetectionColumns, materialize
+from smc_engine.zones import ZoneStore
+from smc_engine.graph import DetectorGraph
+
+
+class RecordingBackend(KernelBackend):
+    """Kernel backend that counts the kernel calls made through it"""
+
+    kernel_methods = ('swing_indices', 'fractal_indices', 'nested_swing_indices', 'touched_after',
+                      'prior_overlap_counts', 'trailing_run_lengths')
+
+    def __init__(self, backend):
+        self.__dict__.update(backend.__dict__)
+        self.calls = Counter()
+
+    def __getattribute__(self, name):
+        if name in type(self).kernel_methods:
+            object.__getattribute__(self, 'calls')[name] += 1
+        return object.__getattribute__(self, name)
+
+
+def reference_swings(highs, lows, lookback):
+    """Original nested-loop swing detection"""
+    swing_highs, swing_lows = [], []
+    for i in range(lookback, len(highs) - lookback):
+        if all(not highs[i] < highs[j] for j in range(i - lookback, i + lookback + 1)):
+            swing_highs.append(i)
+        if all(not lows[i] > lows[j] for j in range(i - lookback, i + lookback + 1)):
+            swing_lows.append(i)
+    return swing_highs, swing_lows
+
+
+def reference_fvg_indices(highs, lows, closes):
+    """Original per-gap mitigation scan, returning (index, type) of active zones"""
+    zones = []
+    for i in range(2, len(highs) - 1):
+        if lows[i] > highs[i-2]:
+            zones.append((i-1, 'bullish_fvg', highs[i-2], (lows[i] + highs[i-2]) / 2))
+        if highs[i] < lows[i-2]:
+            zones.append((i-1, 'bearish_fvg', lows[i-2], (lows[i-2] + highs[i]) / 2))
+
+    active = []
+    for index, kind, bound, entry in zones:
+        if kind == 'bullish_fvg':
+            mitigated = closes[-1] < bound or any(lows[k] <= entry for k in range(index + 2, len(lows)))
+        else:
+            mitigated = closes[-1] > bound or any(highs[k] >= entry for k in range(index + 2, len(highs)))
+        if not mitigated:
+            active.append((index, kind))
+    return active[-10:]
+
+
+def reference_order_blocks(highs, lows, swing_highs, swing_lows):
+    """Original per-swing order block loop with its per-swing strength scan"""
+    def strength(s, lookback=10):
+        if s < lookback:
+            return 0.0
+        tests = sum(1 for i in range(s - lookback, s) if highs[i] > lows[s] and lows[i] < highs[s])
+        return min(1.0, tests / 5.0)
+
+    blocks = []
+    for prev, swing in zip(swing_highs, swing_highs[1:]):
+        block_high = max(swing['high'], prev['high'])
+        block_low = min(swing['high'], prev['high']) - (block_high - min(swing['high'], prev['high'])) * 0.3
+        block_low = max(block_low, min(swing['low'], prev['low']))
+        blocks.append({'index': swing['index'], 'type': 'bearish_order_block', 'high': block_high,
+                       'low': block_low, 'mid_price': (block_high + block_low) / 2,
+                       'strength': strength(swing['index'])})
+    for prev, swing in zip(swing_lows, swing_lows[1:]):
+        block_low = min(swing['low'], prev['low'])
+        block_high = max(swing['low'], prev['low']) + (block_low - max(swing['low'], prev['low'])) * 0.3
+        block_high = min(block_high, max(swing['high'], prev['high']))
+        blocks.append({'index': swing['index'], 'type': 'bullish_order_block', 'high': block_high,
+                       'low': block_low, 'mid_price': (block_high + block_low) / 2,
+                       'strength': strength(swing['index'])})
+    return blocks
+
+
+def reference_sweeps(highs, lows, swing_highs, swing_lows):
+    """Original +-5 bar scan, deduplicated to the furthest level per candle and side"""
+    furthest = {}
+    for kind, swings, sign in (('bullish_liquidity_sweep', swing_highs, 1), ('bearish_liquidity_sweep', swing_lows, -1)):
+        for swing in swings:
+            for i in range(max(0, swing['index'] - 5), min(len(highs), swing['index'] + 5)):
+                if highs[i] > swing['price'] and lows[i] < swing['price']:
+                    key = (kind, i)
+                    if key not in furthest or sign * swing['price'] > sign * furthest[key]:
+                        furthest[key] = swing['price']
+    # Bullish events first, each side ordered by candle
+    ordered = sorted(furthest.items(), key=lambda item: (item[0][0] != 'bullish_liquidity_sweep', item[0][1]))
+    return [(kind, i, level) for (kind, i), level in ordered]
+
+
+def reference_unusual_volume(volumes, lookback=20, threshold=1.5):
+    """Original per-bar trailing mean"""
+    found = []
+    for i in range(lookback, len(volumes)):
+        avg_volume = np.mean(volumes[i-lookback:i])
+        if avg_volume > 0 and (volumes[i] / avg_volume) > threshold:
+            found.append((i, avg_volume))
+    return found
+
+
+def reference_gaps(highs, lows):
+    """Original three-candle FVG loop of smc_engine/fvg.py"""
+    gaps = []
+    for i in range(2, len(highs) - 1):
+        if highs[i-2] < lows[i] and highs[i-1] <= lows[i] and lows[i-1] >= highs[i-2]:
+            gaps.append({'index': i-1, 'type': 'bullish_fvg', 'high': lows[i], 'low': highs[i-2],
+                         'entry': (lows[i] + highs[i-2]) / 2, 'gap_size': lows[i] - highs[i-2]})
+        elif lows[i-2] > highs[i] and highs[i-1] <= lows[i-2] and lows[i-1] >= highs[i]:
+            gaps.append({'index': i-1, 'type': 'bearish_fvg', 'high': lows[i-2], 'low': highs[i],
+                         'entry': (lows[i-2] + highs[i]) / 2, 'gap_size': lows[i-2] - highs[i]})
+    return gaps
+
+
+def reference_impulses(closes):
+    """Original impulse/pullback loop, returning (index, type)"""
+    if len(closes) < 10:
+        return []
+    momentum = np.diff(closes)
+    found = []
+    for i in range(5, len(momentum) - 5):
+        if all(m > 0 for m in momentum[i-4:i+1]) and momentum[i-5] < 0:
+            if momentum[i+1] < 0 and momentum[i+2] < 0:
+                found.append((i, 'bullish_impulse_pullback'))
+        elif all(m < 0 for m in momentum[i-4:i+1]) and momentum[i-5] > 0:
+            if momentum[i+1] > 0 and momentum[i+2] > 0:
+                found.append((i, 'bearish_impulse_pullback'))
+    return found
+
+
+def reference_break(closes, start, level, bullish):
+    """First bar at or after start closing strictly beyond the level, by scanning"""
+    for k in range(max(start, 0), len(closes)):
+        if (closes[k] > level) if bullish else (closes[k] < level):
+            return k
+    return -1
+
+
+def reference_pools(highs, lows, atr, swings, bullish, tolerance=0.1, min_touches=2):
+    """Sequential price-sorted chaining of swings into pools, sweeps found by scanning"""
+    points = sorted((price, index) for index, price in swings if np.isfinite(price) and np.isfinite(atr[index]))
+    clusters = []
+    for price, index in points:
+        if clusters:
+            last_price, last_index = clusters[-1][-1]
+            if price - last_price <= tolerance * min(atr[index], atr[last_index]):
+                clusters[-1].append((price, index))
+                continue
+        clusters.append([(price, index)])
+    pools = []
+    for cluster in clusters:
+        if len(cluster) < min_touches:
+            continue
+        prices = [price for price, _ in cluster]
+        last = max(index for _, index in cluster)
+        level = max(prices) if bullish else min(prices)
+        beyond = highs > level if bullish else lows < level
+        sweep = next((k for k in range(last + 1, len(highs)) if beyond[k]), None)
+        pools.append({'index': last, 'level': level, 'touches': len(cluster),
+                      'first_index': min(index for _, index in cluster), 'swept': sweep is not None,
+                      'sweep_index': sweep})
+    return sorted(pools, key=lambda pool: pool['index'])
+
+
+def without_nan(records):
+    """NaN never equals itself; replace it so records can be compared"""
+    return [{key: None if value != value else value for key, value in record.items()} for record in records]
+
+
+def timed(function, *args):
+    """Seconds one call of function(*args) takes"""
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def random_candles(rng, n, with_ties=True):
+    """Random walk candles, rounded so equal highs/lows (plateaus) occur"""
+    closes = 100 + rng.normal(size=n).cumsum()
+    highs = closes + rng.random(n)
+    lows = closes - rng.random(n)
+    if with_ties:
+        highs, lows = np.round(highs, 1), np.round(lows, 1)
+    opens = lows + (highs - lows) * rng.random(n)
+    return opens, highs, lows, closes
+
+
+def test_swing_kernel_matches_loops():
+    """Swings and fractals must match the loops, ties included"""
+    print("=" * 60)
+    print("TEST 1: Swing/Fractal Kernel Parity")
+    print("=" * 60)
+
+    rng = np.random.default_rng(7)
+    engine = SMCEngine()
+    for trial in range(200):
+        n = int(rng.integers(0, 120))
+        lookback = int(rng.integers(0, 8))
+        _, highs, lows, _ = random_candles(rng, n)
+        if trial % 4 == 0 and n:
+            highs[rng.integers(0, n)] = np.nan
+
+        expected_highs, expected_lows = reference_swings(highs, lows, lookback)
+
+        swing_highs, swing_lows = engine.detect_swings(highs.tolist(), lows.tolist(), lookback)
+        assert [s['index'] for s in swing_highs] == expected_highs
+        assert [s['index'] for s in swing_lows] == expected_lows
+
+        swing_highs, swing_lows = SwingDetector(lookback).detect_swings(highs, lows)
+        assert [s['index'] for s in swing_highs] == expected_highs
+        assert [s['index'] for s in swing_lows] == expected_lows
+
+        high_fractals, low_fractals = engine.detect_fractals(highs.tolist(), lows.tolist(), lookback)
+        assert [f['index'] for f in high_fractals] == expected_highs
+        assert [f['index'] for f in low_fractals] == expected_lows
+
+    print("✅ Kernel output identical to the reference loops")
+
+
+def test_fvg_mitigation_matches_scan():
+    """Suffix-extrema mitigation must keep the same active FVG zones"""
+    print("\n" + "=" * 60)
+    print("TEST 2: FVG Mitigation Parity")
+    print("=" * 60)
+
+    rng = np.random.default_rng(11)
+    engine = SMCEngine()
+    for trial in range(300):
+        n = int(rng.integers(0, 150))
+        opens, highs, lows, closes = random_candles(rng, n)
+        # Exaggerate moves so gaps are frequent
+        highs, lows = highs * 1.01 ** np.arange(n), lows * 1.01 ** np.arange(n)
+        if trial % 2 and n:
+            closes[-1] += rng.normal() * 10
+
+        expected = reference_fvg_indices(highs, lows, closes)
+        zones = engine.detect_fvg(opens.tolist(), highs.tolist(), lows.tolist(), closes.tolist())
+        assert [(z['index'], z['type']) for z in zones] == expected
+
+    print("✅ Active FVG zones identical to the reference scan")
+
+
+def test_columnar_result_matches_dicts():
+    """Columnar analysis must materialize to the exact dict result"""
+    print("\n" + "=" * 60)
+    print("TEST 3: Columnar Result Parity")
+    print("=" * 60)
+
+    rng = np.random.default_rng(5)
+    engine = SMCEngine()
+    for trial in range(100):
+        opens, highs, lows, closes = random_candles(rng, int(rng.integers(5, 300)))
+        df = pd.DataFrame({'open': opens, 'high': highs, 'low': lows, 'close': closes})
+
+        expected = engine.analyze_market_structure(df)
+        result = engine.analyze_market_structure(df, columnar=True)
+        assert isinstance(result['swingPoints']['highs'], DetectionColumns)
+        assert materialize(result) == expected
+
+        # Record views read like the old dicts
+        for record, zone in zip(result['fvgZones'], expected['fvgZones']):
+            assert record['entry'] == zone['entry'] and record.type == zone['type']
+
+    print("✅ Columnar result materializes to the dict result")
+
+
+def test_orderblock_kernels_match_loops():
+    """Order blocks, inside bars and mother bars must match the candle loops"""
+    print("\n" + "=" * 60)
+    print("TEST 4: Order Block Kernel Parity")
+    print("=" * 60)
+
+    rng = np.random.default_rng(13)
+    for trial in range(150):
+        n = int(rng.integers(0, 200))
+        _, highs, lows, _ = random_candles(rng, n)
+        if trial % 5 == 0 and n:
+            lows[rng.integers(0, n)] = highs[rng.integers(0, n)] = np.nan
+        swing_highs, swing_lows = SwingDetector(int(rng.integers(1, 6))).detect_swings(highs, lows)
+
+        expected = reference_order_blocks(highs, lows, swing_highs, swing_lows)
+        blocks = OrderBlockDetector().detect_order_blocks(highs, lows, swing_highs, swing_lows)
+        assert without_nan(blocks) == without_nan(expected)
+
+        expected = [i for i in range(1, n) if highs[i] <= highs[i-1] and lows[i] >= lows[i-1]]
+        assert [bar['index'] for bar in InsideBarDetector().detect_inside_bars(highs, lows)] == expected
+
+        ranges = highs - lows
+        expected = [(i - 1, ranges[i] / ranges[i-1]) for i in range(1, n)
+                    if ranges[i-1] > 0 and ranges[i] / ranges[i-1] >= 1.5]
+        mother_bars = MotherBarDetector().detect_mother_bars(highs, lows)
+        assert [(bar['index'], bar['range_ratio']) for bar in mother_bars] == expected
+
+    # Research-sized history
+    _, highs, lows, _ = random_candles(rng, 200_000)
+    start = time.perf_counter()
+    swing_highs, swing_lows = SwingDetector(5).detect_swings(highs, lows, columnar=True)
+    blocks = OrderBlockDetector().detect_order_blocks(highs, lows, swing_highs, swing_lows, columnar=True)
+    inside_bars = InsideBarDetector().detect_inside_bars(highs, lows, columnar=True)
+    mother_bars = MotherBarDetector().detect_mother_bars(highs, lows, columnar=True)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    print(f"✅ Kernels match the loops; 200k bars: {len(blocks)} order blocks, "
+          f"{len(inside_bars)} inside bars, {len(mother_bars)} mother bars in {elapsed:.1f} ms")
+
+
+def test_liquidity_kernels_match_loops():
+    """Sweeps, liquidity zones and unusual volume must match the candle loops"""
+    print("\n" + "=" * 60)
+    print("TEST 5: Liquidity Kernel Parity")
+    print("=" * 60)
+
+    rng = np.random.default_rng(17)
+    detector = LiquidityDetector()
+    for trial in range(150):
+        n = int(rng.integers(0, 200))
+        _, highs, lows, _ = random_candles(rng, n)
+        swing_highs, swing_lows = SwingDetector(int(rng.integers(1, 6))).detect_swings(highs, lows)
+
+        sweeps = detector.detect_liquidity_sweeps(highs, lows, swing_highs, swing_lows)
+        expected = reference_sweeps(highs, lows, swing_highs, swing_lows)
+        assert [(s['type'], s['index'], s['level']) for s in sweeps] == expected
+        assert all(s['candle_index'] == s['index'] for s in sweeps)
+        assert len(set((s['type'], s['index']) for s in sweeps)) == len(sweeps)
+
+        # Zones are measured on the high/low range, which never has wicks
+        assert detector.detect_liquidity_zones(highs, lows) == []
+
+        volumes = rng.gamma(2.0, 100.0, n)
+        if trial % 5 == 0 and n:
+            volumes[rng.integers(0, n)] = np.nan
+        unusual = UnusualVolumeDetector().detect_unusual_volume(volumes)
+        expected = reference_unusual_volume(volumes)
+        assert [v['index'] for v in unusual] == [i for i, _ in expected]
+        assert np.allclose([v['avg_volume'] for v in unusual], [avg for _, avg in expected])
+
+    # Multi-year 1m history in one pass
+    _, highs, lows, _ = random_candles(rng, 1_000_000)
+    volumes = rng.gamma(2.0, 100.0, len(highs))
+    start = time.perf_counter()
+    swing_highs, swing_lows = SwingDetector(2).detect_swings(highs, lows, columnar=True)
+    sweeps = detector.detect_liquidity_sweeps(highs, lows, swing_highs, swing_lows, columnar=True)
+    unusual = UnusualVolumeDetector().detect_unusual_volume(volumes, columnar=True)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    print(f"✅ Kernels match the loops; 1M bars: {len(sweeps)} sweeps, "
+          f"{len(unusual)} unusual volume bars in {elapsed:.1f} ms")
+
+
+def test_fvg_kernels_match_loops():
+    """Shifted-mask gaps and run-length impulses must match the candle loops"""
+    print("\n" + "=" * 60)
+    print("TEST 6: FVG/Impulse Kernel Parity")
+    print("=" * 60)
+
+    rng = np.random.default_rng(19)
+    for trial in range(200):
+        n = int(rng.integers(0, 200))
+        opens, highs, lows, closes = random_candles(rng, n)
+        highs, lows = highs * 1.01 ** np.arange(n), lows * 1.01 ** np.arange(n)
+        if trial % 2:
+            # Rounded closes give flat momentum between runs
+            closes = np.round(closes)
+
+        gaps = FVGDetector().detect_fvg(opens, highs, lows, closes)
+        assert gaps == reference_gaps(highs, lows)
+
+        patterns = ImpulsePullbackDetector().detect_impulse_pullback(highs, lows, closes)
+        assert [(p['index'], p['type']) for p in patterns] == reference_impulses(closes)
+        assert all(p['impulse_start'] == p['index'] - 4 and p['pullback_end'] == p['index'] + 2 for p in patterns)
+
+    # The analyzer used by smc_server gives the same result either way
+    analyzer = SMCAnalyzer()
+    for trial in range(30):
+        opens, highs, lows, closes = random_candles(rng, int(rng.integers(5, 400)))
+        df = pd.DataFrame({'open': opens, 'high': highs, 'low': lows, 'close': closes})
+        assert materialize(analyzer.analyze(df, columnar=True)) == analyzer.analyze(df)
+
+    print("✅ Kernels match the loops; columnar SMCAnalyzer matches the dict path")
+
+
+def test_kernel_backends_agree():
+    """NumPy and Numba loop kernels must give identical results"""
+    print("\n" + "=" * 60)
+    print("TEST 7: Kernel Backend Parity")
+    print("=" * 60)
+
+    rng = np.random.default_rng(23)
+    for trial in range(100):
+        n = int(rng.integers(0, 150))
+        opens, highs, lows, closes = random_candles(rng, n)
+        if trial % 4 == 0 and n:
+            highs[rng.integers(0, n)] = lows[rng.integers(0, n)] = np.nan
+        lookback = int(rng.integers(0, 7))
+
+        for numpy_result, loop_result in (
+            (NUMPY_KERNELS.swing_indices(highs, lows, lookback), NUMBA_KERNELS.swing_indices(highs, lows, lookback)),
+            (NUMPY_KERNELS.fractal_indices(highs, lows, lookback),
+             NUMBA_KERNELS.fractal_indices(highs, lows, lookback)),
+        ):
+            assert all(np.array_equal(a, b) for a, b in zip(numpy_result, loop_result))
+
+        start = rng.integers(0, n + 1, 20)
+        levels = np.round(100 + rng.normal(size=20) * 3, 1)
+        for values, below in ((lows, True), (highs, False)):
+            assert np.array_equal(NUMPY_KERNELS.touched_after(values, start, levels, below),
+                                  NUMBA_KERNELS.touched_after(values, start, levels, below))
+
+        indices = rng.integers(0, max(n, 1), 15) if n else np.zeros(0, dtype=np.int64)
+        assert np.array_equal(NUMPY_KERNELS.prior_overlap_counts(highs, lows, indices, 10),
+                              NUMBA_KERNELS.prior_overlap_counts(highs, lows, indices, 10))
+
+        mask = np.diff(closes) > 0
+        assert np.array_equal(NUMPY_KERNELS.trailing_run_lengths(mask), NUMBA_KERNELS.trailing_run_lengths(mask))
+
+        # Whole analyses through either backend (repr, so NaN levels compare equal)
+        df = pd.DataFrame({'open': opens, 'high': highs, 'low': lows, 'close': closes})
+        if n >= 5:
+            numpy_kernels, loop_kernels = RecordingBackend(NUMPY_KERNELS), RecordingBackend(NUMBA_KERNELS)
+            assert (repr(SMCEngine(backend=numpy_kernels).analyze_market_structure(df)) ==
+                    repr(SMCEngine(backend=loop_kernels).analyze_market_structure(df)))
+            assert (repr(SMCAnalyzer(5, backend=numpy_kernels).analyze_market_structure(df)) ==
+                    repr(SMCAnalyzer(5, backend=loop_kernels).analyze_market_structure(df)))
+            assert (repr(SMCAnalyzer(5, backend=numpy_kernels).detect_swing_hierarchy(highs, lows)) ==
+                    repr(SMCAnalyzer(5, backend=loop_kernels).detect_swing_hierarchy(highs, lows)))
+            # The analyzers' multi-scale passes and SMCEngine's per-lookback
+            # scans all ran through the backend under test; the loop backend
+            # scanned each lookback itself
+            for recording in (numpy_kernels, loop_kernels):
+                assert recording.calls['nested_swing_indices'] == 2
+                assert recording.calls['fractal_indices'] == 1
+            assert numpy_kernels.calls['swing_indices'] == 2
+            assert loop_kernels.calls['swing_indices'] == 6
+
+        # Detectors given a range index still go through the backend; only
+        # range-query backends answer from the index
+        rmq = RangeExtremaIndex(highs, lows)
+        results = []
+        for backend in (NUMPY_KERNELS, NUMBA_KERNELS):
+            recording = RecordingBackend(backend)
+            engine = SMCEngine(backend=recording)
+            swing_detector = SwingDetector(lookback, backend=recording)
+            results.append(repr((engine.detect_swings(highs, lows, lookback, columnar=True, rmq=rmq),
+                                 engine.detect_fractals(highs, lows, lookback, columnar=True, rmq=rmq),
+                                 engine.detect_fvg(opens, highs, lows, closes, columnar=True, rmq=rmq),
+                                 swing_detector.detect_swings(highs, lows, columnar=True, rmq=rmq),
+                                 swing_detector.detect_fractals(highs, lows, lookback, columnar=True, rmq=rmq))))
+            assert recording.calls['swing_indices'] == 4
+            assert recording.calls['touched_after'] == (2 if n >= 4 else 0)
+        assert results[0] == results[1]
+
+    # Touch checks stay linear in bars + levels on either backend, even when
+    # no level is ever reached
+    for backend in (NUMPY_KERNELS, NUMBA_KERNELS):
+        timings = []
+        for n in (2000, 16000):
+            values = np.arange(n, dtype=np.float64)
+            levels = np.full(n, -1.0)
+            start = np.arange(n)
+            backend.touched_after(values, start, levels, True)
+            timings.append(min(timed(backend.touched_after, values, start, levels, True) for _ in range(3)))
+        assert not backend.touched_after(values, start, levels, True).any()
+        assert timings[1] < 30 * timings[0], (backend, timings)
+
+    assert get_backend('numpy') is NUMPY_KERNELS
+    if not NUMBA_KERNELS.compiled:
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            assert get_backend('numba') is NUMPY_KERNELS
+        assert len(caught) == 1 and issubclass(caught[0].category, RuntimeWarning)
+    print(f"✅ Backends agree (default backend: {get_backend()!r})")
+
+
+def test_range_index_queries():
+    """Sparse-table range queries must match slicing, also after appends"""
+    print("\n" + "=" * 60)
+    print("TEST 8: Range Extrema Index")
+    print("=" * 60)
+
+    rng = np.random.default_rng(29)
+    for trial in range(60):
+        n = int(rng.integers(0, 300))
+        opens, highs, lows, closes = random_candles(rng, n)
+        if trial % 3 == 0 and n:
+            highs[rng.integers(0, n)] = np.nan
+
+        # Built at once or streamed in uneven chunks
+        built = RangeExtremaIndex(highs, lows)
+        streamed = RangeExtremaIndex()
+        k = 0
+        while k < n:
+            step = int(rng.integers(1, 40))
+            if step == 1:
+                streamed.append(highs[k], lows[k])
+            else:
+                streamed.extend(highs[k:k + step], lows[k:k + step])
+            k += step
+
+        start = rng.integers(-2, n + 2, 50)
+        stop = rng.integers(-2, n + 2, 50)
+        ranges = [(highs[max(a, 0):max(b, 0)], lows[max(a, 0):max(b, 0)]) for a, b in zip(start, stop)]
+        # NaN highs are skipped unless the whole range is NaN
+        expected_high = [-np.inf if len(h) == 0 else np.nan if np.isnan(h).all() else np.nanmax(h)
+                         for h, _ in ranges]
+        expected_low = [l.min() if len(l) else np.inf for _, l in ranges]
+        for index in (built, streamed):
+            assert np.array_equal(index.max_high(start, stop), expected_high, equal_nan=True)
+            assert np.array_equal(index.min_low(start, stop), expected_low)
+            for lookback in range(0, 6):
+                assert all(np.array_equal(a, b) for a, b in zip(index.swing_indices(lookback),
+                                                                NUMPY_KERNELS.swing_indices(highs, lows, lookback)))
+
+        # An index passed in by the caller gives the same analysis
+        if n >= 5:
+            engine = SMCEngine()
+            assert (repr(engine.analyze_arrays(opens, highs, lows, closes, rmq=streamed)) ==
+                    repr(engine.analyze_arrays(opens, highs, lows, closes)))
+
+    print("✅ Range queries match slicing for built and streamed indices")
+
+
+def test_break_crossings():
+    """Break bars must match a bar-by-bar scan in both engines and streaming"""
+    print("\n" + "=" * 60)
+    print("TEST 9: First-Crossing Break Detection")
+    print("=" * 60)
+
+    rng = np.random.default_rng(31)
+    for trial in range(40):
+        n = int(rng.integers(0, 400))
+        opens, highs, lows, closes = random_candles(rng, n)
+        if trial % 4 == 0 and n:
+            closes[rng.integers(0, n, 3)] = np.nan
+
+        crossings = CloseCrossingIndex()
+        crossings.extend(closes[:n // 2])
+        for close in closes[n // 2:]:
+            crossings.append(close)
+        start = rng.integers(-2, n + 2, 60)
+        levels = np.append(rng.normal(100, 5, 59), np.nan)
+        for bullish in (True, False):
+            expected = [reference_break(closes, a, b, bullish) for a, b in zip(start, levels)]
+            found = crossings.first_close_above(start, levels) if bullish else crossings.first_close_below(start, levels)
+            assert found.tolist() == expected
+
+    # Every BOS/CHOCH carries the bar that first closed through the previous swing
+    opens, highs, lows, closes = random_candles(np.random.default_rng(37), 2000)
+    df = pd.DataFrame({'open': opens, 'high': highs, 'low': lows, 'close': closes})
+    engine = SMCEngine()
+    result = engine.analyze_market_structure(df)
+    swing_highs, swing_lows = engine.detect_swings(highs, lows, 5)
+    swings = {'bullish': swing_highs, 'bearish': swing_lows}
+    checked = broken = 0
+    for direction in ('bullish', 'bearish'):
+        previous = {later['index']: earlier for earlier, later in zip(swings[direction], swings[direction][1:])}
+        for event in result['bos'][direction] + result['choch'][direction]:
+            level = previous[event['index']]
+            k = reference_break(closes, level['index'] + 1, level['price'], direction == 'bullish')
+            assert event['break_index'] == (k if k >= 0 else None)
+            assert event['break_close'] == (closes[k] if k >= 0 else None)
+            checked += 1
+            broken += k >= 0
+    assert checked and broken
+    assert materialize(engine.analyze_market_structure(df, columnar=True)) == result
+
+    analyzer = SMCAnalyzer()
+    assert materialize(analyzer.analyze(df, columnar=True)) == analyzer.analyze(df)
+
+    # Streaming resolves breaks as the crossing closes arrive
+    stream = IncrementalSMCEngine()
+    for k in range(len(df)):
+        stream.update(df.iloc[k])
+        if k % 250 == 0 or k == len(df) - 1:
+            assert stream.current_analysis() == engine.analyze_market_structure(df.iloc[:k + 1])
+
+    print(f"✅ {checked} breaks match the scan ({broken} crossed)")
+
+
+def test_swing_hierarchy():
+    """Every scale must match its own swing pass and link to the right parent"""
+    print("\n" + "=" * 60)
+    print("TEST 10: Multi-Scale Swing Hierarchy")
+    print("=" * 60)
+
+    rng = np.random.default_rng(41)
+    for trial in range(30):
+        n = int(rng.integers(0, 600))
+        _, highs, lows, _ = random_candles(rng, n)
+        if trial % 3 == 0 and n:
+            highs[rng.integers(0, n)] = np.nan
+        lookbacks = (2, 5, 20) if trial % 2 else tuple(rng.choice(np.arange(0, 12), 3, replace=False).tolist())
+        hierarchy = MultiScaleSwingDetector(lookbacks).detect(highs, lows)
+        columnar = MultiScaleSwingDetector(lookbacks).detect(highs, lows, columnar=True)
+        assert list(hierarchy) == sorted(lookbacks)
+
+        scales = sorted(lookbacks)
+        for position, lookback in enumerate(scales):
+            expected = reference_swings(highs, lows, lookback)
+            for side in (0, 1):
+                swings = hierarchy[lookback][side]
+                assert [s['index'] for s in swings] == expected[side]
+                assert repr(materialize(columnar[lookback][side])) == repr(swings)
+                wider = ([s['index'] for s in hierarchy[scales[position + 1]][side]]
+                         if position + 1 < len(scales) else [])
+                for swing in swings:
+                    before = [i for i in wider if i <= swing['index']]
+                    assert swing['lookback'] == lookback
+                    assert swing['parent'] == (before[-1] if before else None)
+
+    # The analyzer exposes its fractal and swing scales together
+    _, highs, lows, _ = random_candles(np.random.default_rng(43), 1000)
+    hierarchy = SMCAnalyzer().detect_swing_hierarchy(highs, lows)
+    assert list(hierarchy) == [2, 20]
+    assert set(s['index'] for s in hierarchy[20][0]) <= set(s['index'] for s in hierarchy[2][0])
+
+    print("✅ Nested scales and parent links match per-scale passes")
+
+
+def test_liquidity_pools():
+    """Equal highs/lows pools must match sequential clustering and scanned sweeps"""
+    print("\n" + "=" * 60)
+    print("TEST 11: Equal Highs/Lows Liquidity Pools")
+    print("=" * 60)
+
+    rng = np.random.default_rng(47)
+    total = 0
+    for trial in range(30):
+        n = int(rng.integers(0, 800))
+        _, highs, lows, closes = random_candles(rng, n)
+        if trial % 4 == 0 and n:
+            highs[rng.integers(0, n, 2)] = np.nan
+
+        atr = average_true_range(highs, lows, closes, 14)
+        if n > 14:
+            true_range = pd.concat([pd.Series(highs - lows), (pd.Series(highs) - pd.Series(closes).shift()).abs(),
+                                    (pd.Series(lows) - pd.Series(closes).shift()).abs()], axis=1).max(axis=1)
+            expected = true_range.rolling(14, min_periods=1).mean().to_numpy()
+            finite = np.isfinite(highs)
+            window_ok = pd.Series(finite).rolling(14, min_periods=1).min().to_numpy().astype(bool)
+            assert np.allclose(atr[window_ok], expected[window_ok])
+
+        swing_highs, swing_lows = SwingDetector(3).detect_swings(highs, lows)
+        pools = LiquidityPoolDetector().detect_liquidity_pools(highs, lows, closes, swing_highs, swing_lows)
+        columnar = LiquidityPoolDetector().detect_liquidity_pools(highs, lows, closes, swing_highs, swing_lows,
+                                                                  columnar=True)
+        assert materialize(columnar) == pools
+        for type_name, swings, bullish in (('equal_highs', swing_highs, True), ('equal_lows', swing_lows, False)):
+            expected = reference_pools(highs, lows, atr, [(s['index'], s['price']) for s in swings], bullish)
+            found = [{key: pool[key] for key in expected[0]} for pool in pools
+                     if pool['type'] == type_name] if expected else [p for p in pools if p['type'] == type_name]
+            assert found == expected
+            total += len(expected)
+
+    assert total
+    print(f"✅ {total} pools match the sequential clustering")
+
+
+def test_zone_store_queries():
+    """Zone store queries must match linear scans while zones get mitigated"""
+    print("\n" + "=" * 60)
+    print("TEST 12: Zone Store Queries")
+    print("=" * 60)
+
+    rng = np.random.default_rng(53)
+    for trial in range(40):
+        count = int(rng.integers(0, 60))
+        low = np.round(rng.normal(100, 5, count), 1)
+        high = low + np.round(rng.random(count) * 3, 1)
+        types = rng.choice(['bullish_fvg', 'bearish_fvg', 'bullish_order_block', 'bearish_order_block'], count)
+        zones = []
+        for k in range(count):
+            zone = {'index': k, 'type': str(types[k]), 'high': float(high[k]), 'low': float(low[k]), 'mitigated': False}
+            if types[k].endswith('fvg'):
+                zone['entry'] = (zone['high'] + zone['low']) / 2
+            zones.append(zone)
+        # Added in batches between candles, like the zone registry does
+        batches = np.array_split(np.arange(count), 4)
+        store = ZoneStore([zones[k] for k in batches[0]])
+
+        def level(zone):
+            if 'entry' in zone:
+                return zone['entry']
+            return zone['low'] if zone['type'].startswith('bullish') else zone['high']
+
+        alive = [dict(zones[k]) for k in batches[0]]
+        for step in range(8):
+            if 0 < step < len(batches):
+                store.add([zones[k] for k in batches[step]])
+                alive += [dict(zones[k]) for k in batches[step]]
+                assert len(store._levels) <= 2 * max(len(store), 1).bit_length()
+            for price in np.round(rng.normal(100, 6, 10), 1):
+                assert [z['index'] for z in store.containing(price)] == \
+                    [z['index'] for z in alive if z['low'] <= price <= z['high']]
+                above = [z for z in alive if z['low'] > price]
+                below = [z for z in alive if z['high'] < price]
+                nearest = store.nearest_above(price)
+                assert (nearest is None) == (not above)
+                if above:
+                    assert nearest['low'] == min(z['low'] for z in above)
+                nearest = store.nearest_below(price)
+                assert (nearest is None) == (not below)
+                if below:
+                    assert nearest['high'] == max(z['high'] for z in below)
+            assert store.count('bullish_fvg') == sum(z['type'] == 'bullish_fvg' for z in alive)
+
+            # A batch of candles mitigates the zones whose level it reaches
+            candle_low = 100 - rng.random(3) * 8
+            candle_high = 100 + rng.random(3) * 8
+            gone = [z for z in alive if (candle_low.min() <= level(z) if z['type'].startswith('bullish')
+                                         else candle_high.max() >= level(z))]
+            mitigated = store.mitigate(candle_high, candle_low)
+            assert [z['index'] for z in mitigated] == [z['index'] for z in gone]
+            assert [z['index'] for z in store.active()] == [z['index'] for z in alive if z not in gone]
+            assert all(z['mitigated'] for z in mitigated)
+            alive = [z for z in alive if z not in gone]
+            assert len(store) == len(alive)
+
+    # The detectors fill a store passed through the analysis
+    opens, highs, lows, closes = random_candles(np.random.default_rng(59), 500)
+    df = pd.DataFrame({'open': opens, 'high': highs, 'low': lows, 'close': closes})
+    zones = ZoneStore()
+    result = SMCAnalyzer().analyze(df, zones=zones)
+    assert len(zones) == len(result['fvg_zones']) + len(result['order_blocks'])
+    zones = ZoneStore()
+    result = SMCEngine().analyze_arrays(opens, highs, lows, closes, zones=zones)
+    assert zones.count('bullish_fvg') + zones.count('bearish_fvg') == len(result['fvgZones'])
+
+    print("✅ Stabbing, nearest-zone and mitigation queries match linear scans")
+
+
+def test_lazy_analysis():
+    """Lazy SMC result matches the eager dict and only runs what is read"""
+    print("=" * 60)
+    print("TEST 13: Lazy SMC Analysis")
+    print("=" * 60)
+
+    engine = SMCEngine()
+    for seed in range(20):
+        opens, highs, lows, closes = random_candles(np.random.default_rng(seed + 70), 400)
+        expected = engine.analyze_arrays(opens, highs, lows, closes)
+
+        # Reading the signal never detects fractals or sweeps
+        lazy = engine.analyze_arrays(opens, highs, lows, closes, lazy=True)
+        assert (lazy['bias'], lazy['entry'], lazy['sl'], lazy['tp']) == tuple(expected[k] for k in ('bias', 'entry', 'sl', 'tp'))
+        assert not {'fractal_points', 'liquidity_sweeps', 'explanation'} & lazy.computed
+        assert 'bos_choch' in lazy.dependencies('signal')
+        assert repr(lazy.to_dict()) == repr(expected)
+        assert list(lazy) == list(expected)
+        # The explanation reads every detector it names, fractals still skipped
+        explained = engine.analyze_arrays(opens, highs, lows, closes, lazy=True)
+        assert explained['explanation'] == expected['explanation']
+        assert 'fractal_points' not in explained.computed
+
+        columnar = engine.analyze_arrays(opens, highs, lows, closes, columnar=True, lazy=True)
+        assert materialize(columnar) == materialize(engine.analyze_arrays(opens, highs, lows, closes, columnar=True))
+
+    # Overriding a field drops everything computed from it
+    lazy = engine.analyze_arrays(opens, highs, lows, closes, lazy=True)
+    lazy['explanation']
+    lazy['fvgZones'] = []
+    assert 'explanation' not in lazy.computed and 'FVG zones' not in lazy['explanation']
+    lazy['activeZones'] = []
+    assert list(lazy)[-1] == 'activeZones' and len(lazy) == len(expected) + 1
+
+    print("✅ Lazy fields match the eager analysis and skip unread detectors")
+
+
+def test_detector_graph():
+    """Detector DAG computes each node once, in order or on a thread pool"""
+    print("=" * 60)
+    print("TEST 14: Detector Graph Scheduling")
+    print("=" * 60)
+
+    sequential, threaded = SMCAnalyzer(5), SMCAnalyzer(5, workers=4)
+    for seed in range(10):
+        opens, highs, lows, closes = random_candles(np.random.default_rng(seed + 90), 600)
+        df = pd.DataFrame({'open': opens, 'high': highs, 'low': lows, 'close': closes})
+        expected = sequential.analyze(df)
+        assert repr(threaded.analyze(df)) == repr(expected)
+
+        # The summary only runs the nodes it reads
+        timings = {}
+        summary = threaded.analyze_arrays(opens, highs, lows, closes, timings=timings)
+        assert summary == sequential.analyze_market_structure(df)
+        assert set(timings) >= set(SMCAnalyzer.market_structure_nodes)
+        assert not {'fractals', 'liquidity_pools', 'market_phase'} & set(timings)
+
+    # Every node of a run is computed once, after its dependencies
+    graph = SMCAnalyzer(5).graph
+    run = graph.run({'opens': opens, 'highs': highs, 'lows': lows, 'closes': closes, 'columnar': True,
+                     'known_extrema': {}})
+    assert set(run.timings) == set(graph.nodes)
+    assert all(stats['calls'] == 1 for stats in graph.stats().values())
+
+    # Analyzers share their detector threads; backends without range
+    # queries never build the range index
+    assert SMCAnalyzer(5, workers=4)._executor is threaded._executor
+    loop_graph = SMCAnalyzer(5, backend=NUMBA_KERNELS).graph
+    loop_run = loop_graph.run({'opens': opens, 'highs': highs, 'lows': lows, 'closes': closes, 'columnar': True,
+                               'known_extrema': {}})
+    assert loop_run['rmq'] is None
+    assert repr(loop_run['liquidity_pools']) == repr(run['liquidity_pools'])
+
+    calls = []
+    diamond = (DetectorGraph()
+               .add('left', lambda x: calls.append('left') or x + 1, 'x')
+               .add('right', lambda x: calls.append('right') or x * 2, 'x')
+               .add('top', lambda a, b: calls.append('top') or a + b, 'left', 'right'))
+    with ThreadPoolExecutor(2) as pool:
+        assert diamond.run({'x': 3}, ['top'], pool)['top'] == 10
+    assert sorted(calls) == ['left', 'right', 'top'] and calls[-1] == 'top'
+    assert diamond.run({'x': 3, 'left': 0}, ['top'])['top'] == 6
+
+    print("✅ Threaded graph matches sequential analysis, unread nodes are skipped")
+
+
+def main():
+    test_swing_kernel_matches_loops()
+    test_fvg_mitigation_matches_scan()
+    test_columnar_result_matches_dicts()
+    test_orderblock_kernels_match_loops()
+    test_liquidity_kernels_match_loops()
+    test_fvg_kernels_match_loops()
+    test_kernel_backends_agree()
+    test_range_index_queries()
+    test_break_crossings()
+    test_swing_hierarchy()
+    test_liquidity_pools()
+    test_zone_store_queries()
+    test_lazy_analysis()
+    test_detector_graph()
+
+
+if __name__ == "__main__":
+    main()